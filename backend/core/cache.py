@@ -1 +1,137 @@
- 
\ No newline at end of file
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+
+from backend.models.user import User
+
+# 认证用户缓存的默认有效期（秒）和容量
+USER_CACHE_TTL = 60
+USER_CACHE_SIZE = 10000
+
+
+def token_fingerprint(token: str) -> str:
+    """令牌指纹，缓存中不保存原始令牌"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class UserIdentityCache:
+    """已认证用户的进程内缓存
+
+    以 (用户ID, 令牌指纹) 为键缓存用户的列值快照，命中时不再查询数据库。
+    条目有效期不超过令牌本身的过期时间；用户资料、角色或密码变更时整体失效。
+    """
+
+    def __init__(self, ttl: int = USER_CACHE_TTL, max_size: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, db: Session, user_id: int, fingerprint: str) -> Optional[User]:
+        """命中时把快照挂到当前会话上返回，不产生SQL"""
+        key = (user_id, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            snapshot = entry[1]
+
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        # load=False：直接以快照状态并入会话，后续修改仍可正常提交
+        return db.merge(user, load=False)
+
+    def set(self, user: User, fingerprint: str, token_exp: Optional[float] = None):
+        expires_at = time.time() + self.ttl
+        if token_exp:
+            expires_at = min(expires_at, token_exp)
+        snapshot = {
+            attr.key: getattr(user, attr.key)
+            for attr in inspect(User).column_attrs
+        }
+        key = (user.id, fingerprint)
+        with self._lock:
+            self._entries[key] = (expires_at, snapshot)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(user.id, set()).add(fingerprint)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+    def _drop(self, key: Tuple[int, str]):
+        self._entries.pop(key, None)
+        fingerprints = self._by_user.get(key[0])
+        if fingerprints is not None:
+            fingerprints.discard(key[1])
+            if not fingerprints:
+                del self._by_user[key[0]]
+
+    def invalidate_user(self, user_id: int):
+        """用户资料、角色、状态或密码变更后调用"""
+        with self._lock:
+            for fingerprint in self._by_user.pop(user_id, set()):
+                self._entries.pop((user_id, fingerprint), None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations
+        }
+
+
+user_cache = UserIdentityCache()
+
+
+# 会话中已修改、待提交后失效缓存的用户ID
+_PENDING_KEY = "user_cache_pending_invalidations"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _record_changed_user(mapper, connection, target):
+    """通过ORM修改或删除用户时先记下用户ID
+
+    此时事务尚未提交，若立即失效，其他请求可能在提交前把旧数据重新写回缓存，
+    因此等会话提交后再失效。
+    """
+    session = object_session(target)
+    if target.id is None or session is None:
+        return
+    session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back_users(session, previous_transaction):
+    """最外层事务回滚后数据库中仍是旧数据，缓存无需失效；回滚保存点时保留记录"""
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
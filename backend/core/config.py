@@ -21,4 +21,24 @@ STATIC_DIR.mkdir(exist_ok=True)
 LOGS_DIR.mkdir(exist_ok=True)
 
 # 靶场配置
-CHALLENGES_DIR = BASE_DIR / "challenges"
\ No newline at end of file
+CHALLENGES_DIR = BASE_DIR / "challenges"
+# 靶场Docker网络
+CHALLENGE_NETWORK = "ctf_network"
+
+# 靶场数据库配置（labs、lab_instances等表）
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'jxp1210',
+    'database': 'cyberlabs'
+}
+
+# Redis配置
+REDIS_CONFIG = {
+    'host': 'localhost',
+    'port': 6379,
+    'db': 0
+}
+
+# 上传文件目录
+UPLOAD_DIR = BASE_DIR / "uploads"
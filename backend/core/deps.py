@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 import logging
 
 from backend.core.database import SessionLocal
+from backend.core.cache import user_cache, token_fingerprint
 from backend.core.config import SECRET_KEY, ALGORITHM
 from backend.models.user import User
 
@@ -39,10 +40,20 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
+    # 令牌已通过签名和过期校验，优先使用缓存的用户信息
+    fingerprint = token_fingerprint(token)
+    user_id = payload.get("id")
+    if user_id is not None:
+        user = user_cache.get(db, user_id, fingerprint)
+        if user is not None and user.username == username:
+            return user
+    
     user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    if user is None or (user_id is not None and user.id != user_id):
         raise credentials_exception
     
+    if user_id is not None:
+        user_cache.set(user, fingerprint, payload.get("exp"))
     return user
 
 async def get_current_user_optional(
@@ -53,4 +64,14 @@ async def get_current_user_optional(
     try:
         return await get_current_user(token, db)
     except HTTPException:
-        return None 
\ No newline at end of file
+        return None 
+async def get_current_admin_user(
+    current_user: User = Depends(get_current_user)
+) -> User:
+    """获取当前用户，非管理员时拒绝访问"""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理员权限"
+        )
+    return current_user
@@ -1,19 +1,320 @@
 import subprocess
 import json
-from typing import Tuple, Optional
-import config
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from backend.core import config
 import traceback
 import platform
 import os
 import time
 import logging
 import asyncio
+import uuid
+from collections import OrderedDict
+
+# 同时执行的docker命令上限，避免大量靶场同时启动时压垮Docker守护进程
+MAX_CONCURRENT_DOCKER_OPS = 16
+# 单条docker命令的默认超时（秒），pull除外
+DOCKER_COMMAND_TIMEOUT = 60
+# 强制删除容器的超时（秒）
+FORCE_REMOVE_TIMEOUT = 15
+
+def normalize_image(image: str) -> str:
+    """补全镜像标签，nginx -> nginx:latest"""
+    if '@' in image:
+        return image
+    name = image.rsplit('/', 1)[-1]
+    return image if ':' in name else f"{image}:latest"
+
+
+class ImageCache:
+    """本地镜像缓存
+
+    记录本地已存在镜像的ID(内容摘要)，镜像已存在且未被标记为过期时直接跳过pull，
+    同一镜像的并发pull只会执行一次。
+    """
+
+    def __init__(self, manager: 'DockerManager'):
+        self.manager = manager
+        self.logger = logging.getLogger(__name__)
+        self.digests: Dict[str, str] = {}
+        self.stale: Set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.pulls = 0
+        self.pull_failures = 0
+
+    def mark_stale(self, image: str):
+        """标记镜像过期，下次使用时重新pull"""
+        self.stale.add(normalize_image(image))
+
+    def invalidate(self, image: str):
+        """从缓存中移除镜像（例如镜像被手动删除后）"""
+        image = normalize_image(image)
+        self.digests.pop(image, None)
+        self.stale.discard(image)
+
+    async def refresh(self):
+        """用一次docker images调用重建整个本地镜像索引"""
+        result = await self.manager._docker(
+            'images', '--no-trunc', '--format', '{{.Repository}}:{{.Tag}} {{.ID}}'
+        )
+        if result.returncode != 0:
+            raise Exception(f"获取本地镜像列表失败: {result.stderr}")
+        digests = {}
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) == 2 and '<none>' not in parts[0]:
+                digests[parts[0]] = parts[1]
+        self.digests = digests
+
+    async def _local_digest(self, image: str) -> Optional[str]:
+        result = await self.manager._docker('image', 'inspect', '--format', '{{.Id}}', image)
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip() or None
+
+    async def ensure(self, image: str) -> bool:
+        """确保镜像在本地可用，只在缺失或过期时pull
+
+        Returns:
+            镜像是否可用
+        """
+        image = normalize_image(image)
+        if image in self.digests and image not in self.stale:
+            self.hits += 1
+            return True
+
+        lock = self._locks.setdefault(image, asyncio.Lock())
+        async with lock:
+            # 等锁期间可能已被其他请求拉取
+            if image in self.digests and image not in self.stale:
+                self.hits += 1
+                return True
+
+            if image not in self.stale:
+                digest = await self._local_digest(image)
+                if digest:
+                    self.digests[image] = digest
+                    self.hits += 1
+                    return True
+
+            self.logger.info(f"拉取镜像: {image}")
+            self.pulls += 1
+            result = await self.manager._docker('pull', image, timeout=None)
+            if result.returncode != 0:
+                self.pull_failures += 1
+                self.logger.warning(f"拉取镜像失败: {result.stderr}")
+            digest = await self._local_digest(image)
+            if not digest:
+                self.digests.pop(image, None)
+                return False
+            old = self.digests.get(image)
+            if old and old != digest:
+                self.logger.info(f"镜像 {image} 已更新: {old[:19]} -> {digest[:19]}")
+            self.digests[image] = digest
+            self.stale.discard(image)
+            return True
+
+    def get_metrics(self) -> Dict:
+        return {
+            'cached_images': len(self.digests),
+            'stale_images': len(self.stale),
+            'hits': self.hits,
+            'pulls': self.pulls,
+            'pull_failures': self.pull_failures
+        }
+
+
+class HealthWatcher:
+    """基于Docker事件流的容器就绪检测
+
+    全局只运行一个 docker events 进程，所有等待中的容器共享它：
+    收到 health_status: healthy 事件即判定就绪，收到 die 事件即判定失败。
+    对映射了宿主机端口的容器同时做TCP端口探测，两者先到者为准。
+    """
+
+    # 缓存最近的容器事件，覆盖docker run返回前就已产生事件的情况
+    RECENT_EVENTS = 1024
+    # 两次启动事件监听的最小间隔（秒），事件流反复中断时期间退化为定时inspect
+    RESTART_INTERVAL = 1.0
+
+    def __init__(self, manager: 'DockerManager'):
+        self.manager = manager
+        self.logger = logging.getLogger(__name__)
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._recent: 'OrderedDict[str, str]' = OrderedDict()
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._reader is not None and not self._reader.done()
+
+    async def start(self):
+        """启动事件监听（已在运行时或距上次启动不足RESTART_INTERVAL时直接返回）"""
+        if self.running:
+            return
+        now = time.monotonic()
+        if self._started_at is not None and now - self._started_at < self.RESTART_INTERVAL:
+            return
+        self._started_at = now
+        self._process = await asyncio.create_subprocess_exec(
+            'docker', 'events',
+            '--filter', 'type=container',
+            '--filter', 'event=start',
+            '--filter', 'event=health_status',
+            '--filter', 'event=die',
+            '--format', '{{json .}}',
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        self._reader = asyncio.create_task(self._read_events(self._process))
+
+    async def stop(self):
+        if self._process and self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
+        if self._reader:
+            self._reader.cancel()
+        self._process = None
+        self._reader = None
+
+    async def _read_events(self, process: asyncio.subprocess.Process):
+        try:
+            async for line in process.stdout:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                container_id = event.get('id') or event.get('Actor', {}).get('ID')
+                action = event.get('Action') or event.get('status', '')
+                if container_id:
+                    self._dispatch(container_id, action)
+        finally:
+            # 先清除对当前监听的引用，等待者收到通知后调用start()才会真正重启
+            if self._process is process:
+                self._process = None
+                self._reader = None
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+            # 事件流中断时让等待者回退到inspect检查
+            for futures in self._waiters.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_result('stream_closed')
+
+    def _dispatch(self, container_id: str, action: str):
+        self._recent[container_id] = action
+        self._recent.move_to_end(container_id)
+        while len(self._recent) > self.RECENT_EVENTS:
+            self._recent.popitem(last=False)
+        for future in self._waiters.get(container_id, ()):
+            if future.done():
+                continue
+            if action == 'health_status: healthy':
+                future.set_result('healthy')
+            elif action == 'die':
+                future.set_exception(Exception("容器启动后退出"))
+
+    async def _probe_port(self, host_port: str, interval: float = 0.05, max_interval: float = 1.0):
+        """探测宿主机端口直到有服务接受连接
+
+        docker-proxy 会先接受连接、后端未监听时立即关闭，
+        所以连接后短暂读取：立即EOF视为未就绪。
+        """
+        while True:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection('127.0.0.1', int(host_port)), 1
+                )
+                try:
+                    data = await asyncio.wait_for(reader.read(1), 0.1)
+                    ready = data != b''
+                except asyncio.TimeoutError:
+                    ready = True
+                finally:
+                    writer.close()
+                if ready:
+                    return 'port_open'
+            except (OSError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, max_interval)
+
+    async def _inspect_status(self, container_id: str) -> Optional[str]:
+        result = await self.manager._docker(
+            'inspect', '--format', '{{.State.Status}} {{if .State.Health}}{{.State.Health.Status}}{{end}}',
+            container_id
+        )
+        if result.returncode != 0:
+            raise Exception(f"获取容器健康状态失败: {result.stderr}")
+        parts = result.stdout.split()
+        if parts and parts[0] in ('exited', 'dead'):
+            raise Exception("容器启动后退出")
+        return parts[1] if len(parts) > 1 else None
+
+    async def wait_ready(self, container_id: str, host_port: Optional[str] = None, timeout: float = 60) -> str:
+        """等待容器就绪，返回判定依据（healthy / port_open）"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        future = loop.create_future()
+        self._waiters.setdefault(container_id, set()).add(future)
+        probe = asyncio.create_task(self._probe_port(host_port)) if host_port else None
+        try:
+            while True:
+                # 注册后补查一次，避免漏掉注册前已发生的事件
+                recent = self._recent.get(container_id)
+                if recent == 'health_status: healthy' or await self._inspect_status(container_id) == 'healthy':
+                    return 'healthy'
+                if recent == 'die':
+                    raise Exception("容器启动后退出")
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise Exception("容器健康检查超时")
+                # 事件流不可用时退化为定时inspect
+                wait_for = remaining if self.running else min(remaining, 2)
+                pending = [future] + ([probe] if probe else [])
+                done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if probe in done:
+                    return probe.result()
+                if future in done:
+                    result = future.result()
+                    if result == 'healthy':
+                        return result
+                    # 事件流中断，重新注册并尝试重启监听
+                    self._waiters[container_id].discard(future)
+                    future = loop.create_future()
+                    self._waiters[container_id].add(future)
+                    try:
+                        await self.start()
+                    except Exception as e:
+                        self.logger.warning(f"重启Docker事件监听失败: {str(e)}")
+        finally:
+            if probe:
+                probe.cancel()
+            if future.done() and not future.cancelled():
+                future.exception()
+            futures = self._waiters.get(container_id)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self._waiters[container_id]
+
 
 class DockerManager:
-    def __init__(self):
+    def __init__(self, max_concurrent_ops: int = MAX_CONCURRENT_DOCKER_OPS):
         """初始化Docker管理器"""
         self.logger = logging.getLogger(__name__)
         self.docker_available = False
+        # 限制并发的docker CLI调用；等待健康检查时不占用名额
+        self._ops_semaphore = asyncio.Semaphore(max_concurrent_ops)
+        self.image_cache = ImageCache(self)
+        self.health_watcher = HealthWatcher(self)
         try:
             # 测试Docker连接
             result = subprocess.run(['docker', 'info'], capture_output=True, text=True)
@@ -55,13 +356,39 @@ class DockerManager:
             print(f"确保Docker网络失败: {str(e)}")
             print(f"错误详情: {traceback.format_exc()}")
 
+    async def _docker(self, *args: str, timeout: Optional[float] = DOCKER_COMMAND_TIMEOUT) -> subprocess.CompletedProcess:
+        """异步执行docker命令，不阻塞事件循环
+
+        返回与subprocess.run相同结构的CompletedProcess，超时则杀掉子进程并抛出异常
+        """
+        cmd = ['docker', *args]
+        async with self._ops_semaphore:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise Exception(f"docker命令超时({timeout}s): {' '.join(cmd)}")
+        return subprocess.CompletedProcess(
+            cmd,
+            proc.returncode,
+            stdout.decode(errors='replace'),
+            stderr.decode(errors='replace')
+        )
+
     async def create_container(
         self,
         image: str,
         port_mapping: Optional[str] = None,
         max_memory: str = "512m",
         cpu_limit: float = 0.5,
-        timeout: int = 300
+        timeout: int = 300,
+        labels: Optional[Dict[str, str]] = None
     ) -> Tuple[str, str]:
         """创建并启动容器，增加资源限制和超时控制"""
         if not self.docker_available:
@@ -72,31 +399,25 @@ class DockerManager:
             print(f"开始创建容器: {image}")
             print(f"端口映射: {port_mapping}")
 
-            # 拉取镜像
+            # 确保镜像可用，本地已存在且未过期时不再pull
             try:
-
-
-                print(f"拉取镜像: {image}")
-                result = subprocess.run(['docker', 'pull', image], capture_output=True, text=True)
-                if result.returncode == 0:
-                    print("镜像拉取成功")
-                else:
-                    print(f"拉取镜像失败: {result.stderr}")
-                    print("尝试使用本地镜像")
+                if not await self.image_cache.ensure(image):
+                    raise Exception(f"镜像不可用: {image}")
             except Exception as e:
-                print(f"拉取镜像失败: {str(e)}")
+                print(f"准备镜像失败: {str(e)}")
                 print("尝试使用本地镜像")
 
-            # 生成容器名称
-            container_name = f"challenge_{int(time.time())}"
+            # 生成容器名称，并发启动时时间戳会重复，追加随机后缀
+            container_name = f"challenge_{int(time.time())}_{uuid.uuid4().hex[:8]}"
 
             # 构建运行命令
-            run_cmd = [
-                'docker', 'run', '-d',
+            run_args = [
+                'run', '-d',
                 '--name', container_name,
                 '--network', config.CHALLENGE_NETWORK,
                 '--memory', max_memory,
                 '--cpus', str(cpu_limit),
+                '--stop-timeout', str(timeout),
                 '--health-cmd', 'curl -f http://localhost:8080/ || exit 1',
                 '--health-interval', '10s',
                 '--health-timeout', '5s',
@@ -104,52 +425,67 @@ class DockerManager:
                 '--health-start-period', '30s'
             ]
             
+            for key, value in (labels or {}).items():
+                run_args.extend(['--label', f'{key}={value}'])
+
             # 添加端口映射
+            host_port = None
             if port_mapping:
-                host_port, container_port = port_mapping.split(':')  # 格式: 8080:80
-                run_cmd.extend(['-p', f'{host_port}:{container_port}'])
+                port_mapping = str(port_mapping)
+                if ':' in port_mapping:
+                    host_port, container_port = port_mapping.split(':')  # 格式: 8080:80
+                    run_args.extend(['-p', f'{host_port}:{container_port}'])
+                else:
+                    # 只给出容器端口时由Docker分配空闲的宿主机端口
+                    container_port = port_mapping
+                    run_args.extend(['-p', container_port])
             
             # 添加环境变量
             if 'webgoat' in image.lower():
-                run_cmd.extend([
+                run_args.extend([
                     '-e', 'WEBGOAT_HOST=0.0.0.0',
                     '-e', 'WEBGOAT_PORT=8080',
                     '-e', 'WEBWOLF_HOST=0.0.0.0',
                     '-e', 'WEBWOLF_PORT=9090'
                 ])
             
-            # 添加镜像名
-            run_cmd.append(image)
-            
-            # 添加超时停止
-            run_cmd.extend(['--stop-timeout', str(timeout)])
+            # 添加镜像名（docker run的选项必须在镜像名之前）
+            run_args.append(image)
             
+            # 在docker run之前启动事件监听，保证不漏掉启动事件
+            try:
+                await self.health_watcher.start()
+            except Exception as e:
+                self.logger.warning(f"启动Docker事件监听失败，退化为轮询: {str(e)}")
+
             # 创建并启动容器
             print("开始创建并启动容器")
-            print(f"运行命令: {' '.join(run_cmd)}")
-            result = subprocess.run(run_cmd, capture_output=True, text=True)
+            print(f"运行命令: docker {' '.join(run_args)}")
+            result = await self._docker(*run_args)
             if result.returncode != 0:
                 raise Exception(f"创建容器失败: {result.stderr}")
             
             container_id = result.stdout.strip()
             print(f"容器创建成功: {container_id}")
 
-            # 等待容器启动
-            time.sleep(10)  # 等待10秒让容器完全启动
-
             # 获取容器信息
             print("获取容器网络信息")
-            result = subprocess.run(
-                ['docker', 'inspect', container_id],
-                capture_output=True,
-                text=True
-            )
+            result = await self._docker('inspect', container_id)
             if result.returncode != 0:
                 raise Exception(f"获取容器信息失败: {result.stderr}")
             
             container_info = json.loads(result.stdout)[0]
             container_ip = container_info['NetworkSettings']['Networks'][config.CHALLENGE_NETWORK]['IPAddress']
             print(f"容器IP: {container_ip}")
+            if port_mapping and host_port is None:
+                bindings = container_info['NetworkSettings']['Ports'].get(f"{container_port}/tcp") or []
+                if not bindings:
+                    raise Exception(f"未找到容器端口 {container_port} 的宿主机映射")
+                host_port = bindings[0]['HostPort']
+
+            # 等待容器就绪：健康事件或端口可连接
+            ready_by = await self.health_watcher.wait_ready(container_id, host_port, timeout=60)
+            self.logger.info(f"容器 {container_id} 已就绪 ({ready_by})")
 
             # 构建访问URL
             if port_mapping:
@@ -161,21 +497,6 @@ class DockerManager:
                 instance_url = f"http://{container_ip}"
             print(f"实例访问URL: {instance_url}")
 
-            # 等待容器健康检查
-            start_time = time.time()
-            while time.time() - start_time < 60:  # 60秒超时
-                result = subprocess.run(
-                    ['docker', 'inspect', '--format', '{{.State.Health.Status}}', container_id],
-                    capture_output=True,
-                    text=True
-                )
-                if result.stdout.strip() == 'healthy':
-                    self.logger.info(f"容器 {container_id} 健康检查通过")
-                    break
-                await asyncio.sleep(2)
-            else:
-                raise Exception("容器健康检查超时")
-
             return container_id, instance_url
 
         except Exception as e:
@@ -185,6 +506,55 @@ class DockerManager:
                 await self.stop_container(container_id)
             raise
 
+    async def prepull_images(self, images: Iterable[str]) -> Dict[str, bool]:
+        """预拉取镜像，返回每个镜像是否可用"""
+        if not self.docker_available:
+            self.logger.warning("Docker服务不可用，跳过镜像预拉取")
+            return {}
+        images = sorted({normalize_image(image) for image in images if image})
+        try:
+            await self.image_cache.refresh()
+        except Exception as e:
+            self.logger.warning(f"刷新本地镜像索引失败: {str(e)}")
+        results = await asyncio.gather(
+            *(self.image_cache.ensure(image) for image in images),
+            return_exceptions=True
+        )
+        status = {
+            image: result is True
+            for image, result in zip(images, results)
+        }
+        missing = [image for image, ok in status.items() if not ok]
+        self.logger.info(f"镜像预拉取完成: {len(images) - len(missing)}/{len(images)} 可用")
+        if missing:
+            self.logger.warning(f"以下镜像不可用: {', '.join(missing)}")
+        return status
+
+    async def force_remove(self, container_id: str, timeout: float = FORCE_REMOVE_TIMEOUT):
+        """强制删除容器（docker rm -f），容器已不存在视为成功；Docker不可用时抛出异常"""
+        if not self.docker_available:
+            raise Exception("Docker服务不可用，无法删除容器")
+        result = await self._docker('rm', '-f', container_id, timeout=timeout)
+        if result.returncode != 0 and 'No such container' not in result.stderr:
+            raise Exception(f"强制删除容器失败: {result.stderr}")
+
+    async def list_containers(self, label: str, *filters: str) -> List[str]:
+        """列出带有指定标签的全部容器（含已停止的），返回完整容器ID
+
+        Args:
+            label: 标签过滤条件，如 ctf.pool=warm
+            filters: 其他 docker ps 过滤条件，如 status=running
+        """
+        if not self.docker_available:
+            return []
+        args = ['ps', '-a', '-q', '--no-trunc', '--filter', f'label={label}']
+        for item in filters:
+            args.extend(['--filter', item])
+        result = await self._docker(*args)
+        if result.returncode != 0:
+            raise Exception(f"列出容器失败: {result.stderr}")
+        return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
     async def stop_container(self, container_id: str):
         """停止并删除容器，增加强制删除选项"""
         if not self.docker_available:
@@ -194,24 +564,22 @@ class DockerManager:
             self.logger.info(f"开始停止容器: {container_id}")
             
             # 停止容器，10秒超时
-            result = subprocess.run(
-                ['docker', 'stop', '-t', '10', container_id], 
-                capture_output=True, 
-                text=True
-            )
-            if result.returncode != 0:
-                self.logger.warning(f"正常停止容器失败，尝试强制停止: {result.stderr}")
-                result = subprocess.run(['docker', 'kill', container_id], capture_output=True, text=True)
+            try:
+                result = await self._docker('stop', '-t', '10', container_id, timeout=30)
+                stopped = result.returncode == 0
+                if not stopped:
+                    self.logger.warning(f"正常停止容器失败，尝试强制停止: {result.stderr}")
+            except Exception as e:
+                self.logger.warning(f"正常停止容器失败，尝试强制停止: {str(e)}")
+                stopped = False
+            if not stopped:
+                await self._docker('kill', container_id)
             
             self.logger.info("容器已停止")
 
             # 删除容器
             self.logger.info("开始删除容器")
-            result = subprocess.run(
-                ['docker', 'rm', '-f', container_id], 
-                capture_output=True, 
-                text=True
-            )
+            result = await self._docker('rm', '-f', container_id)
             if result.returncode != 0:
                 raise Exception(f"删除容器失败: {result.stderr}")
             self.logger.info("容器已删除")
@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+from backend.core.config import DB_CONFIG
+from backend.core.logger import system_logger
+
+
+class PooledConnection:
+    """连接池中的连接
+
+    除close外的调用全部转发给底层连接；close不会断开连接，而是归还到连接池，
+    因此原有的 conn.close() 写法无需修改。
+    """
+
+    def __init__(self, pool: 'LabConnectionPool', raw, created_at: float):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool._release(self._raw, self._created_at)
+
+
+class LabConnectionPool:
+    """靶场子系统共享的MySQL连接池
+
+    Args:
+        pool_size: 常驻连接数
+        max_overflow: 常驻连接用尽后允许额外创建的连接数，归还时直接关闭
+        timeout: 获取连接的最长等待时间（秒），超时抛出PoolError
+        pre_ping: 取出连接前检测连接是否可用
+        recycle: 连接最长存活时间（秒），超过后重建，避免被MySQL wait_timeout断开
+    """
+
+    def __init__(
+        self,
+        db_config: Dict,
+        pool_size: int = 10,
+        max_overflow: int = 10,
+        timeout: float = 30,
+        pre_ping: bool = True,
+        recycle: int = 3600
+    ):
+        self.db_config = db_config
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.recycle = recycle
+
+        self._idle: Deque[Tuple[object, float]] = deque()
+        self._cond = threading.Condition()
+        self._total = 0
+        self._in_use = 0
+
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._ping_failures = 0
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self.db_config)
+        self._created += 1
+        return raw, time.time()
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def get_connection(self, timeout: float = None) -> PooledConnection:
+        """从连接池取出一个连接，用完后调用close()归还
+
+        连接用尽时会阻塞等待，异步代码中需通过 run_in_executor 调用
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                    break
+                if self._total < self.pool_size + self.max_overflow:
+                    raw, created_at = None, None
+                    self._total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolError(f"获取数据库连接超时({timeout}s)，使用中: {self._in_use}")
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if raw is not None and time.time() - created_at > self.recycle:
+                self._recycled += 1
+                self._discard(raw)
+                raw = None
+            if raw is not None and self.pre_ping:
+                try:
+                    raw.ping(reconnect=False)
+                except Exception:
+                    self._ping_failures += 1
+                    self._discard(raw)
+                    raw = None
+            if raw is None:
+                raw, created_at = self._connect()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return PooledConnection(self, raw, created_at)
+
+    def _release(self, raw, created_at: float):
+        keep = True
+        try:
+            # 结束未提交的事务，避免下一个使用者读到旧快照
+            raw.rollback()
+        except Exception:
+            keep = False
+        with self._cond:
+            self._in_use -= 1
+            if keep and len(self._idle) < self.pool_size:
+                self._idle.append((raw, created_at))
+            else:
+                self._total -= 1
+                keep = False
+            self._cond.notify()
+        if not keep:
+            self._discard(raw)
+
+    def dispose(self):
+        """关闭所有空闲连接"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def get_metrics(self) -> Dict:
+        with self._cond:
+            return {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'total': self._total,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'avg_wait_ms': round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                'max_wait_ms': round(self._wait_max * 1000, 3),
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'recycled': self._recycled,
+                'ping_failures': self._ping_failures
+            }
+
+
+# 创建连接池实例
+lab_db_pool = LabConnectionPool(
+    DB_CONFIG,
+    pool_size=int(os.getenv("LAB_DB_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("LAB_DB_MAX_OVERFLOW", "10")),
+    timeout=float(os.getenv("LAB_DB_POOL_TIMEOUT", "30")),
+    pre_ping=os.getenv("LAB_DB_PRE_PING", "true").lower() == "true",
+    recycle=int(os.getenv("LAB_DB_POOL_RECYCLE", "3600"))
+)
+system_logger.info("靶场数据库连接池初始化成功", "lab", lab_db_pool.get_metrics())
@@ -1,12 +1,14 @@
+import asyncio
 import docker
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
-import mysql.connector
 import json
 
-from config import DB_CONFIG
-from core.logger import system_logger
-from core.docker import docker_manager
+from backend.core.logger import system_logger
+from backend.core.lab.db import lab_db_pool
+from backend.core.docker import docker_manager
+from backend.core.lab.pool import container_pool
+from backend.core.lab.reaper import lab_reaper
 
 class LabManager:
     """靶场管理器"""
@@ -15,11 +17,90 @@ class LabManager:
         """初始化靶场管理器"""
         self.docker_client = docker.from_env()
         system_logger.info("靶场管理器初始化成功", "lab")
+
+    async def _run_db(self, func: Callable, *args):
+        """在线程池中执行数据库操作
+
+        连接池取连接时可能阻塞等待，查询本身也是同步I/O，都不能放在事件循环上执行
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def _find_running_instance(self, user_id: int, lab_id: Optional[int] = None) -> Optional[Dict]:
+        """查询用户运行中的实例，指定lab_id时只查该靶场"""
+        conn = lab_db_pool.get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            if lab_id is None:
+                cursor.execute(
+                    "SELECT * FROM lab_instances WHERE user_id = %s AND status = 'running'",
+                    (user_id,)
+                )
+            else:
+                cursor.execute(
+                    """
+                    SELECT * FROM lab_instances 
+                    WHERE lab_id = %s AND user_id = %s AND status = 'running'
+                    """,
+                    (lab_id, user_id)
+                )
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _record_instance(self, lab_id: int, user_id: int, container_id: str, port) -> None:
+        conn = lab_db_pool.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                INSERT INTO lab_instances 
+                (lab_id, user_id, container_id, status, port, start_time)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                (lab_id, user_id, container_id, 'running', port, datetime.now())
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _mark_stopped(self, instance_id: int) -> None:
+        conn = lab_db_pool.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                UPDATE lab_instances 
+                SET status = 'stopped', end_time = %s
+                WHERE id = %s
+                """,
+                (datetime.now(), instance_id)
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _running_container_ids(self) -> List[str]:
+        conn = lab_db_pool.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT container_id FROM lab_instances WHERE status = 'running'"
+            )
+            return [row[0] for row in cursor.fetchall() if row[0]]
+        finally:
+            cursor.close()
+            conn.close()
     
     def get_lab_info(self, lab_id: int) -> Optional[Dict]:
         """获取靶场信息"""
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             cursor.execute(
@@ -39,50 +120,103 @@ class LabManager:
             })
             return None
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+    
+    def get_lab_images(self) -> List[str]:
+        """获取所有靶场使用的镜像"""
+        conn = None
+        cursor = None
+        try:
+            conn = lab_db_pool.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            
+            cursor.execute(
+                "SELECT DISTINCT docker_image FROM labs WHERE docker_image IS NOT NULL"
+            )
+            return [row['docker_image'] for row in cursor.fetchall() if row['docker_image']]
+            
+        except Exception as e:
+            system_logger.error(f"获取靶场镜像失败: {str(e)}", "lab")
+            return []
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
     
+    async def prepull_images(self) -> Dict[str, bool]:
+        """启动时预拉取靶场表和题目容器配置中引用的全部镜像"""
+        images = self.get_lab_images()
+        try:
+            from challenges.web_security.container_config import CONTAINER_CONFIG
+            images.extend(item['image'] for item in CONTAINER_CONFIG.values())
+        except ImportError as e:
+            system_logger.warning(f"加载题目容器配置失败: {str(e)}", "lab")
+        return await docker_manager.prepull_images(images)
+    
+    async def remove_orphan_containers(self) -> int:
+        """清理上次进程遗留的预热容器，保留已分配给运行中实例的容器"""
+        try:
+            keep_ids = await self._run_db(self._running_container_ids)
+            return await container_pool.remove_orphans(keep_ids)
+        except Exception as e:
+            system_logger.error(f"清理遗留预热容器失败: {str(e)}", "lab")
+            return 0
+
     async def start_lab(self, lab_id: int, user_id: int) -> Dict:
-        """启动靶场"""
+        """启动靶场
+
+        创建容器耗时较长，期间不占用数据库连接：查询和写入各自取连接、用完即归还
+        """
         try:
             # 获取靶场信息
-            lab_info = self.get_lab_info(lab_id)
+            lab_info = await self._run_db(self.get_lab_info, lab_id)
             if not lab_info:
                 return {"status": "error", "message": "靶场不存在"}
             
             # 检查是否有运行中的实例
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute(
-                "SELECT * FROM lab_instances WHERE user_id = %s AND status = 'running'",
-                (user_id,)
-            )
-            running_instance = cursor.fetchone()
-            
+            running_instance = await self._run_db(self._find_running_instance, user_id)
             if running_instance:
                 return {"status": "error", "message": "已有运行中的实例"}
             
-            # 创建Docker容器
-            container_id, instance_url = await docker_manager.create_container(
-                image=lab_info['docker_image'],
-                port_mapping=lab_info['internal_port'],
-                max_memory="512m",
-                cpu_limit=0.5,
-                timeout=3600  # 1小时超时
-            )
+            # 优先从预热池分配容器；固定宿主机端口的映射无法预热，直接创建
+            container_options = {
+                'max_memory': "512m",
+                'cpu_limit': 0.5,
+                'timeout': 3600  # 1小时超时
+            }
+            pooled = None
+            if ':' not in str(lab_info['internal_port']):
+                pooled = await container_pool.acquire(
+                    lab_info['docker_image'],
+                    lab_info['internal_port'],
+                    **container_options
+                )
+            if pooled:
+                container_id, instance_url = pooled
+            else:
+                container_id, instance_url = await docker_manager.create_container(
+                    image=lab_info['docker_image'],
+                    port_mapping=lab_info['internal_port'],
+                    **container_options
+                )
             
-            # 记录实例信息
-            cursor.execute(
-                """
-                INSERT INTO lab_instances 
-                (lab_id, user_id, container_id, status, port, start_time)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
-                (lab_id, user_id, container_id, 'running', 
-                 lab_info['internal_port'], datetime.now())
-            )
-            conn.commit()
+            # 记录实例信息，失败时删除容器，避免留下无人管理的容器
+            try:
+                await self._run_db(
+                    self._record_instance, lab_id, user_id, container_id, lab_info['internal_port']
+                )
+            except Exception:
+                try:
+                    await docker_manager.force_remove(container_id)
+                except Exception as e:
+                    system_logger.warning(f"删除未登记的容器失败: {str(e)}", "lab", {
+                        'container_id': container_id
+                    })
+                raise
             
             return {
                 "status": "success",
@@ -97,26 +231,12 @@ class LabManager:
                 'user_id': user_id
             })
             return {"status": "error", "message": str(e)}
-        finally:
-            cursor.close()
-            conn.close()
     
     async def stop_lab(self, lab_id: int, user_id: int) -> Dict:
         """停止靶场"""
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
             # 获取运行中的实例
-            cursor.execute(
-                """
-                SELECT * FROM lab_instances 
-                WHERE lab_id = %s AND user_id = %s AND status = 'running'
-                """,
-                (lab_id, user_id)
-            )
-            instance = cursor.fetchone()
-            
+            instance = await self._run_db(self._find_running_instance, user_id, lab_id)
             if not instance:
                 return {"status": "error", "message": "没有运行中的实例"}
             
@@ -124,15 +244,7 @@ class LabManager:
             await docker_manager.stop_container(instance['container_id'])
             
             # 更新实例状态
-            cursor.execute(
-                """
-                UPDATE lab_instances 
-                SET status = 'stopped', end_time = %s
-                WHERE id = %s
-                """,
-                (datetime.now(), instance['id'])
-            )
-            conn.commit()
+            await self._run_db(self._mark_stopped, instance['id'])
             
             return {"status": "success", "message": "靶场已停止"}
             
@@ -142,14 +254,13 @@ class LabManager:
                 'user_id': user_id
             })
             return {"status": "error", "message": str(e)}
-        finally:
-            cursor.close()
-            conn.close()
     
     def get_lab_status(self, lab_id: int, user_id: int) -> Dict:
         """获取靶场状态"""
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             # 获取实例信息
@@ -213,55 +324,53 @@ class LabManager:
             })
             return {"status": "error", "message": str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
     
-    def cleanup_expired_instances(self):
-        """清理过期的实例"""
+    async def cleanup_expired_instances(self) -> Dict:
+        """并发回收运行超过1小时的实例"""
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
-            # 获取所有运行超过1小时的实例
+            expired_instances = await self._run_db(self._find_expired_instances)
+            return await lab_reaper.reap(expired_instances, self._mark_expired, "lab_instances")
+
+        except Exception as e:
+            system_logger.error(f"清理过期实例失败: {str(e)}", "lab")
+            return {"status": "error", "message": str(e)}
+
+    def _find_expired_instances(self) -> List:
+        conn = lab_db_pool.get_connection()
+        cursor = conn.cursor()
+        try:
+            # 只取回收需要的字段；start_time上的条件可以使用索引
             cursor.execute(
                 """
-                SELECT * FROM lab_instances 
-                WHERE status = 'running' 
-                AND TIMESTAMPDIFF(HOUR, start_time, NOW()) >= 1
+                SELECT id, container_id FROM lab_instances
+                WHERE status = 'running'
+                AND start_time <= NOW() - INTERVAL 1 HOUR
                 """
             )
-            expired_instances = cursor.fetchall()
-            
-            for instance in expired_instances:
-                try:
-                    # 停止容器
-                    container = self.docker_client.containers.get(instance['container_id'])
-                    container.stop(timeout=10)
-                    container.remove(force=True)
-                    
-                    # 更新实例状态
-                    cursor.execute(
-                        """
-                        UPDATE lab_instances 
-                        SET status = 'expired', end_time = NOW()
-                        WHERE id = %s
-                        """,
-                        (instance['id'],)
-                    )
-                    conn.commit()
-                    
-                    system_logger.info(f"清理过期实例成功", "lab", {
-                        'instance_id': instance['id'],
-                        'container_id': instance['container_id']
-                    })
-                except Exception as e:
-                    system_logger.error(f"清理过期实例失败: {str(e)}", "lab", {
-                        'instance_id': instance['id'],
-                        'container_id': instance['container_id']
-                    })
-            
-        except Exception as e:
-            system_logger.error(f"清理过期实例失败: {str(e)}", "lab")
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _mark_expired(self, instance_ids) -> None:
+        """批量把实例标记为已过期，由回收器在线程池中调用"""
+        conn = lab_db_pool.get_connection()
+        cursor = conn.cursor()
+        try:
+            placeholders = ", ".join(["%s"] * len(instance_ids))
+            cursor.execute(
+                f"""
+                UPDATE lab_instances
+                SET status = 'expired', end_time = NOW()
+                WHERE id IN ({placeholders}) AND status = 'running'
+                """,
+                tuple(instance_ids)
+            )
+            conn.commit()
         finally:
             cursor.close()
             conn.close()
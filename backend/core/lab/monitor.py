@@ -1,12 +1,212 @@
 import asyncio
-from typing import Dict, List
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 import docker
 import psutil
 from datetime import datetime
 
-from core.logger import system_logger
-from config import DB_CONFIG
-import mysql.connector
+from backend.core.logger import system_logger
+from backend.core.lab.db import lab_db_pool
+
+# 采样间隔（秒），docker stats流约每秒推送一次，按此间隔降采样
+SAMPLE_INTERVAL = 5
+# 每个实例保留的样本数（1小时）
+RING_CAPACITY = 3600 // SAMPLE_INTERVAL
+# 同时消费的stats流上限
+MAX_STREAMS = 512
+
+_FIELDS = ('timestamp', 'cpu_usage', 'memory_usage', 'memory_percent', 'network_rx', 'network_tx')
+
+
+class MetricRing:
+    """定长环形缓冲区
+
+    每个字段一段预分配的double数组，写满后覆盖最旧样本；
+    同时维护CPU和内存占用的累加和，读取平均值为O(1)。
+    """
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.capacity = capacity
+        self.columns = {field: array('d', bytes(8 * capacity)) for field in _FIELDS}
+        self.size = 0
+        self.head = 0  # 下一个写入位置
+        self.cpu_sum = 0.0
+        self.memory_percent_sum = 0.0
+        self.lock = threading.Lock()
+
+    def append(self, metric: Dict):
+        with self.lock:
+            cpu = self.columns['cpu_usage']
+            mem = self.columns['memory_percent']
+            if self.size == self.capacity:
+                self.cpu_sum -= cpu[self.head]
+                self.memory_percent_sum -= mem[self.head]
+            else:
+                self.size += 1
+            for field in _FIELDS:
+                self.columns[field][self.head] = metric[field]
+            self.cpu_sum += metric['cpu_usage']
+            self.memory_percent_sum += metric['memory_percent']
+            self.head = (self.head + 1) % self.capacity
+
+    def _row(self, index: int) -> Dict:
+        row = {field: self.columns[field][index] for field in _FIELDS}
+        row['timestamp'] = datetime.fromtimestamp(row['timestamp']).isoformat()
+        for field in ('memory_usage', 'network_rx', 'network_tx'):
+            row[field] = int(row[field])
+        return row
+
+    def latest(self) -> Optional[Dict]:
+        with self.lock:
+            if not self.size:
+                return None
+            return self._row((self.head - 1) % self.capacity)
+
+    def averages(self) -> Dict:
+        with self.lock:
+            if not self.size:
+                return {'cpu_usage': 0.0, 'memory_percent': 0.0}
+            return {
+                'cpu_usage': self.cpu_sum / self.size,
+                'memory_percent': self.memory_percent_sum / self.size
+            }
+
+    def tail(self, count: int) -> List[Dict]:
+        """按时间顺序返回最近count个样本"""
+        with self.lock:
+            count = max(0, min(count, self.size))
+            start = self.head - count
+            return [self._row(i % self.capacity) for i in range(start, self.head)]
+
+
+def _parse_stats(stats: Dict) -> Optional[Dict]:
+    """把docker stats原始数据转换为监控指标"""
+    try:
+        cpu_delta = stats['cpu_stats']['cpu_usage']['total_usage'] - \
+                  stats['precpu_stats']['cpu_usage']['total_usage']
+        system_cpu_delta = stats['cpu_stats'].get('system_cpu_usage', 0) - \
+                         stats['precpu_stats'].get('system_cpu_usage', 0)
+        cpu_usage = (cpu_delta / system_cpu_delta) * 100.0 if system_cpu_delta > 0 else 0.0
+
+        memory_usage = stats['memory_stats']['usage']
+        memory_limit = stats['memory_stats']['limit']
+        memory_percent = (memory_usage / memory_limit) * 100.0 if memory_limit else 0.0
+
+        networks = stats.get('networks') or {}
+        network_rx = sum(n['rx_bytes'] for n in networks.values())
+        network_tx = sum(n['tx_bytes'] for n in networks.values())
+    except (KeyError, TypeError):
+        return None
+
+    return {
+        'timestamp': time.time(),
+        'cpu_usage': round(cpu_usage, 2),
+        'memory_usage': memory_usage,
+        'memory_percent': round(memory_percent, 2),
+        'network_rx': network_rx,
+        'network_tx': network_tx
+    }
+
+
+class StatsCollector:
+    """共享的容器stats流采集器
+
+    每个被监控的容器在共享线程池中占用一个线程消费 stats(stream=True)，
+    按采样间隔降采样后写入该实例的环形缓冲区，不占用事件循环。
+    同时消费的流数达到max_streams时拒绝新的监控请求并记录日志，
+    不会在线程池队列中无限期等待。unwatch后线程要等下一条stats才退出，期间仍占用名额。
+    """
+
+    def __init__(self, docker_client, sample_interval: int = SAMPLE_INTERVAL, max_streams: int = MAX_STREAMS):
+        self.docker_client = docker_client
+        self.sample_interval = sample_interval
+        self.max_streams = max_streams
+        self.executor = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix='lab-stats')
+        self.stop_events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._active = 0
+        self.rejected = 0
+
+    def watch(self, instance_id: str, container_id: str, ring: MetricRing) -> bool:
+        """开始消费容器的stats流，已在监控时直接返回True，超出容量时返回False"""
+        with self._lock:
+            if instance_id in self.stop_events:
+                return True
+            if self._active >= self.max_streams:
+                self.rejected += 1
+                system_logger.warning("监控流数量已达上限，拒绝监控请求", "monitor", {
+                    'instance_id': instance_id,
+                    'max_streams': self.max_streams,
+                    'rejected': self.rejected
+                })
+                return False
+            stop_event = threading.Event()
+            self.stop_events[instance_id] = stop_event
+            self._active += 1
+        self.executor.submit(self._consume, instance_id, container_id, ring, stop_event)
+        return True
+
+    def unwatch(self, instance_id: str):
+        with self._lock:
+            stop_event = self.stop_events.pop(instance_id, None)
+        if stop_event:
+            stop_event.set()
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            return {
+                'watched': len(self.stop_events),
+                'active_streams': self._active,
+                'max_streams': self.max_streams,
+                'rejected': self.rejected
+            }
+
+    def _consume(self, instance_id: str, container_id: str, ring: MetricRing, stop_event: threading.Event):
+        last_sample = 0.0
+        stream = None
+        try:
+            container = self.docker_client.containers.get(container_id)
+            stream = container.stats(stream=True, decode=True)
+            for stats in stream:
+                if stop_event.is_set():
+                    break
+                now = time.monotonic()
+                if now - last_sample < self.sample_interval:
+                    continue
+                metric = _parse_stats(stats)
+                if metric is None:
+                    continue
+                last_sample = now
+                ring.append(metric)
+
+                # 检查资源使用是否超限
+                if metric['cpu_usage'] > 90 or metric['memory_percent'] > 90:
+                    system_logger.warning(f"实例资源使用超限", "monitor", {
+                        'instance_id': instance_id,
+                        'cpu_usage': metric['cpu_usage'],
+                        'memory_percent': metric['memory_percent']
+                    })
+        except docker.errors.NotFound:
+            system_logger.error(f"容器不存在", "monitor", {
+                'instance_id': instance_id,
+                'container_id': container_id
+            })
+        except Exception as e:
+            system_logger.error(f"监控数据收集失败: {str(e)}", "monitor", {
+                'instance_id': instance_id
+            })
+        finally:
+            if stream is not None and hasattr(stream, 'close'):
+                stream.close()
+            # 流结束（容器退出等）后释放名额，并允许重新watch
+            with self._lock:
+                self._active -= 1
+                if self.stop_events.get(instance_id) is stop_event:
+                    del self.stop_events[instance_id]
+
 
 class LabMonitor:
     """实验环境监控器"""
@@ -15,102 +215,55 @@ class LabMonitor:
         """初始化监控器"""
         self.docker_client = docker.from_env()
         self.monitoring_data = {}
+        self.collector = StatsCollector(self.docker_client)
         system_logger.info("实验环境监控器初始化成功", "monitor")
     
-    async def start_monitoring(self, instance_id: str):
-        """开始监控实例"""
+    def _get_instance(self, instance_id: str) -> Optional[Dict]:
+        conn = lab_db_pool.get_connection()
+        cursor = conn.cursor(dictionary=True)
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
             cursor.execute(
                 "SELECT * FROM lab_instances WHERE id = %s",
                 (instance_id,)
             )
-            instance = cursor.fetchone()
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+    
+    async def start_monitoring(self, instance_id: str):
+        """开始监控实例，由共享采集器在后台持续收集指标
+
+        取连接可能阻塞等待，查询在线程池中执行，不占用事件循环
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            instance = await loop.run_in_executor(None, self._get_instance, instance_id)
             
             if not instance or instance['status'] != 'running':
                 return
             
             # 初始化监控数据
-            self.monitoring_data[instance_id] = {
-                'start_time': datetime.now(),
-                'container_id': instance['container_id'],
-                'metrics': []
-            }
+            if instance_id not in self.monitoring_data:
+                self.monitoring_data[instance_id] = {
+                    'start_time': datetime.now(),
+                    'container_id': instance['container_id'],
+                    'metrics': MetricRing()
+                }
             
-            # 开始收集指标
-            while True:
-                try:
-                    container = self.docker_client.containers.get(instance['container_id'])
-                    stats = container.stats(stream=False)
-                    
-                    # 计算CPU使用率
-                    cpu_delta = stats['cpu_stats']['cpu_usage']['total_usage'] - \
-                              stats['precpu_stats']['cpu_usage']['total_usage']
-                    system_cpu_delta = stats['cpu_stats']['system_cpu_usage'] - \
-                                     stats['precpu_stats']['system_cpu_usage']
-                    cpu_usage = (cpu_delta / system_cpu_delta) * 100.0
-                    
-                    # 计算内存使用率
-                    memory_usage = stats['memory_stats']['usage']
-                    memory_limit = stats['memory_stats']['limit']
-                    memory_percent = (memory_usage / memory_limit) * 100.0
-                    
-                    # 计算网络使用情况
-                    network_rx = stats['networks']['eth0']['rx_bytes']
-                    network_tx = stats['networks']['eth0']['tx_bytes']
-                    
-                    # 记录指标
-                    metric = {
-                        'timestamp': datetime.now().isoformat(),
-                        'cpu_usage': round(cpu_usage, 2),
-                        'memory_usage': memory_usage,
-                        'memory_percent': round(memory_percent, 2),
-                        'network_rx': network_rx,
-                        'network_tx': network_tx
-                    }
-                    
-                    self.monitoring_data[instance_id]['metrics'].append(metric)
-                    
-                    # 只保留最近1小时的数据
-                    if len(self.monitoring_data[instance_id]['metrics']) > 3600:
-                        self.monitoring_data[instance_id]['metrics'].pop(0)
-                    
-                    # 检查资源使用是否超限
-                    if cpu_usage > 90 or memory_percent > 90:
-                        system_logger.warning(f"实例资源使用超限", "monitor", {
-                            'instance_id': instance_id,
-                            'cpu_usage': cpu_usage,
-                            'memory_percent': memory_percent
-                        })
-                    
-                    # 每5秒收集一次数据
-                    await asyncio.sleep(5)
-                    
-                except docker.errors.NotFound:
-                    system_logger.error(f"容器不存在", "monitor", {
-                        'instance_id': instance_id,
-                        'container_id': instance['container_id']
-                    })
-                    break
-                except Exception as e:
-                    system_logger.error(f"监控数据收集失败: {str(e)}", "monitor", {
-                        'instance_id': instance_id
-                    })
-                    await asyncio.sleep(5)
-                    continue
+            # 开始收集指标，采集器已满时不保留监控数据，查询时返回未监控
+            data = self.monitoring_data[instance_id]
+            if not self.collector.watch(instance_id, data['container_id'], data['metrics']):
+                del self.monitoring_data[instance_id]
                 
         except Exception as e:
             system_logger.error(f"启动监控失败: {str(e)}", "monitor", {
                 'instance_id': instance_id
             })
-        finally:
-            cursor.close()
-            conn.close()
     
     def stop_monitoring(self, instance_id: str):
         """停止监控实例"""
+        self.collector.unwatch(instance_id)
         if instance_id in self.monitoring_data:
             del self.monitoring_data[instance_id]
     
@@ -128,32 +281,29 @@ class LabMonitor:
             }
         
         data = self.monitoring_data[instance_id]
-        metrics = data['metrics']
+        ring = data['metrics']
+        latest = ring.latest()
         
-        if not metrics:
+        if latest is None:
             return {
                 'status': 'no_data',
                 'message': '暂无监控数据'
             }
         
-        # 计算平均值
-        cpu_usage = sum(m['cpu_usage'] for m in metrics) / len(metrics)
-        memory_percent = sum(m['memory_percent'] for m in metrics) / len(metrics)
-        
-        # 获取最新值
-        latest = metrics[-1]
+        # 平均值由环形缓冲区的累加和直接得到
+        averages = ring.averages()
         
         return {
             'status': 'success',
             'start_time': data['start_time'].isoformat(),
             'latest': latest,
             'summary': {
-                'avg_cpu_usage': round(cpu_usage, 2),
-                'avg_memory_percent': round(memory_percent, 2),
+                'avg_cpu_usage': round(averages['cpu_usage'], 2),
+                'avg_memory_percent': round(averages['memory_percent'], 2),
                 'total_network_rx': latest['network_rx'],
                 'total_network_tx': latest['network_tx']
             },
-            'metrics': metrics[-duration:]  # 只返回指定时间段的数据
+            'metrics': ring.tail(duration // self.collector.sample_interval)  # 只返回指定时间段的数据
         }
     
     def get_system_metrics(self) -> Dict:
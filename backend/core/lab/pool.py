@@ -0,0 +1,316 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from backend.core.logger import system_logger
+from backend.core.docker import docker_manager
+
+# 统计需求的时间窗口（秒）
+DEMAND_WINDOW = 600
+# 每个镜像最少/最多保留的空闲容器数
+MIN_IDLE = 0
+MAX_IDLE = 5
+# 后台维护间隔（秒）
+MAINTAIN_INTERVAL = 30
+# 还没有补充耗时样本时使用的估计值（秒）
+DEFAULT_REFILL_SECONDS = 30
+# 空闲容器最长保留时间（秒），超过后回收重建，避免长期运行的容器状态漂移
+MAX_IDLE_AGE = 3600
+# 预热容器的标签，进程异常退出后据此找回并清理遗留的空闲容器
+POOL_LABEL = 'ctf.pool'
+POOL_LABEL_VALUE = 'warm'
+
+_UNITS = {
+    'b': 1, 'kb': 1000, 'mb': 1000 ** 2, 'gb': 1000 ** 3,
+    'kib': 1024, 'mib': 1024 ** 2, 'gib': 1024 ** 3
+}
+
+
+def _parse_memory(value: str) -> int:
+    """解析docker stats输出的内存用量，如 '12.5MiB / 512MiB'"""
+    usage = value.split('/')[0].strip().lower()
+    number = usage.rstrip('abcdefghijklmnopqrstuvwxyz')
+    unit = usage[len(number):] or 'b'
+    try:
+        return int(float(number) * _UNITS.get(unit, 1))
+    except ValueError:
+        return 0
+
+
+class ContainerPool:
+    """预热容器池
+
+    为每个(镜像, 容器端口)维护一组已通过健康检查、尚未分配的容器。
+    分配时直接从队列取出，耗时为毫秒级；取出后在后台补充。
+    池的目标大小按最近的需求速率估算：覆盖一次补充耗时内预计到来的启动请求。
+    预热容器带有 ctf.pool 标签，启动时用 remove_orphans 清理上次进程遗留的容器，
+    关闭时需调用 stop 销毁空闲容器。
+    """
+
+    def __init__(
+        self,
+        min_idle: int = MIN_IDLE,
+        max_idle: int = MAX_IDLE,
+        demand_window: int = DEMAND_WINDOW,
+        maintain_interval: int = MAINTAIN_INTERVAL
+    ):
+        self.min_idle = min_idle
+        self.max_idle = max_idle
+        self.demand_window = demand_window
+        self.maintain_interval = maintain_interval
+
+        # key -> [(container_id, instance_url, created_at)]
+        self.idle: Dict[Tuple[str, str], Deque[Tuple[str, str, float]]] = {}
+        self.demand: Dict[Tuple[str, str], Deque[float]] = {}
+        self.refilling: Dict[Tuple[str, str], int] = {}
+        self.container_options: Dict[Tuple[str, str], Dict] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.refill_count = 0
+        self.refill_failures = 0
+        self.refill_seconds: Deque[float] = deque(maxlen=100)
+        self.dead_discarded = 0
+        self.orphans_removed = 0
+
+        self._maintain_task: Optional[asyncio.Task] = None
+        self._refill_tasks: Set[asyncio.Task] = set()
+
+    def _key(self, image: str, container_port) -> Tuple[str, str]:
+        return image, str(container_port or '')
+
+    def _record_demand(self, key: Tuple[str, str]):
+        now = time.monotonic()
+        history = self.demand.setdefault(key, deque())
+        history.append(now)
+        while history and now - history[0] > self.demand_window:
+            history.popleft()
+
+    def _avg_refill_seconds(self) -> float:
+        if not self.refill_seconds:
+            return DEFAULT_REFILL_SECONDS
+        return sum(self.refill_seconds) / len(self.refill_seconds)
+
+    def target_size(self, key: Tuple[str, str]) -> int:
+        """按需求速率 × 补充耗时估算需要保留的空闲容器数"""
+        now = time.monotonic()
+        history = self.demand.get(key, ())
+        recent = sum(1 for t in history if now - t <= self.demand_window)
+        if not recent:
+            return self.min_idle
+        rate = recent / self.demand_window
+        target = math.ceil(rate * self._avg_refill_seconds()) + 1
+        return max(self.min_idle, min(self.max_idle, target))
+
+    def start(self):
+        """启动后台维护任务（需在事件循环中调用）"""
+        if self._maintain_task is None or self._maintain_task.done():
+            self._maintain_task = asyncio.create_task(self._maintain_loop())
+            system_logger.info("预热容器池已启动", "lab")
+
+    async def stop(self):
+        """停止维护和补充任务并销毁所有空闲容器
+
+        被取消的补充任务可能留下刚创建的容器，由下次启动时的 remove_orphans 清理
+        """
+        if self._maintain_task:
+            self._maintain_task.cancel()
+            self._maintain_task = None
+        for task in list(self._refill_tasks):
+            task.cancel()
+        containers = [item[0] for pool in self.idle.values() for item in pool]
+        self.idle.clear()
+        await asyncio.gather(
+            *(self._discard(cid) for cid in containers),
+            return_exceptions=True
+        )
+        system_logger.info("预热容器池已停止", "lab", {'removed': len(containers)})
+
+    async def remove_orphans(self, keep_ids: Iterable[str] = ()) -> int:
+        """删除带预热标签、但不在本进程池中的容器
+
+        Args:
+            keep_ids: 已分配给用户、仍需保留的容器ID（完整ID）
+
+        Returns:
+            删除的容器数
+        """
+        keep = set(keep_ids)
+        keep.update(item[0] for pool in self.idle.values() for item in pool)
+        labelled = await docker_manager.list_containers(f"{POOL_LABEL}={POOL_LABEL_VALUE}")
+        orphans = [cid for cid in labelled if cid not in keep]
+        results = await asyncio.gather(
+            *(docker_manager.force_remove(cid) for cid in orphans),
+            return_exceptions=True
+        )
+        removed = sum(1 for result in results if not isinstance(result, Exception))
+        self.orphans_removed += removed
+        if orphans:
+            system_logger.info("已清理遗留的预热容器", "lab", {
+                'found': len(orphans),
+                'removed': removed
+            })
+        return removed
+
+    async def _discard(self, container_id: str):
+        try:
+            await docker_manager.force_remove(container_id)
+        except Exception as e:
+            system_logger.warning(f"删除预热容器失败: {str(e)}", "lab", {'container_id': container_id})
+
+    async def acquire(
+        self,
+        image: str,
+        container_port=None,
+        max_memory: str = "512m",
+        cpu_limit: float = 0.5,
+        timeout: int = 300
+    ) -> Optional[Tuple[str, str]]:
+        """从池中取出一个就绪容器
+
+        Returns:
+            (container_id, instance_url)，池为空时返回None，由调用方走正常创建流程
+        """
+        self.start()
+        key = self._key(image, container_port)
+        self.container_options[key] = {
+            'max_memory': max_memory,
+            'cpu_limit': cpu_limit,
+            'timeout': timeout
+        }
+        self._record_demand(key)
+
+        # 失效的空闲容器由 maintain 定期剔除，分配时直接信任空闲队列
+        pool = self.idle.get(key)
+        item = pool.popleft() if pool else None
+        if item:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self._schedule_refill(key)
+
+        if item:
+            return item[0], item[1]
+        return None
+
+    def _schedule_refill(self, key: Tuple[str, str]):
+        missing = self.target_size(key) - len(self.idle.get(key, ())) - self.refilling.get(key, 0)
+        for _ in range(max(0, missing)):
+            self.refilling[key] = self.refilling.get(key, 0) + 1
+            self._track(asyncio.create_task(self._refill_one(key)))
+
+    def _track(self, task: asyncio.Task):
+        self._refill_tasks.add(task)
+        task.add_done_callback(self._refill_tasks.discard)
+
+    async def _refill_one(self, key: Tuple[str, str]):
+        image, container_port = key
+        options = self.container_options.get(key, {})
+        begin = time.monotonic()
+        try:
+            container_id, instance_url = await docker_manager.create_container(
+                image=image,
+                port_mapping=container_port or None,
+                labels={POOL_LABEL: POOL_LABEL_VALUE},
+                **options
+            )
+            self.refill_seconds.append(time.monotonic() - begin)
+            self.refill_count += 1
+            self.idle.setdefault(key, deque()).append((container_id, instance_url, time.time()))
+        except Exception as e:
+            self.refill_failures += 1
+            system_logger.error(f"预热容器创建失败: {str(e)}", "lab", {'image': image})
+        finally:
+            self.refilling[key] -= 1
+
+    async def _maintain_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.maintain_interval)
+                await self.maintain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                system_logger.error(f"预热容器池维护失败: {str(e)}", "lab")
+
+    async def _drop_dead(self):
+        """剔除已退出或健康检查失败的空闲容器
+
+        一次 docker ps 取回全部预热容器的状态；检查期间新补充的容器不在结果中，保留不动
+        """
+        checked_at = time.time()
+        label = f"{POOL_LABEL}={POOL_LABEL_VALUE}"
+        running = set(await docker_manager.list_containers(label, 'status=running'))
+        running -= set(await docker_manager.list_containers(label, 'health=unhealthy'))
+        dead: List[str] = []
+        for key, pool in self.idle.items():
+            alive = deque()
+            for item in pool:
+                if item[0] in running or item[2] > checked_at:
+                    alive.append(item)
+                else:
+                    dead.append(item[0])
+            self.idle[key] = alive
+        if dead:
+            self.dead_discarded += len(dead)
+            system_logger.warning("预热容器已失效，丢弃", "lab", {'container_ids': dead})
+            await asyncio.gather(*(self._discard(cid) for cid in dead))
+
+    async def maintain(self):
+        """剔除失效的空闲容器，按当前需求补充或收缩各个池，并回收闲置过久的容器"""
+        await self._drop_dead()
+        surplus: List[str] = []
+        now = time.time()
+        for key in list(set(self.idle) | set(self.demand)):
+            pool = self.idle.setdefault(key, deque())
+            while pool and now - pool[0][2] > MAX_IDLE_AGE:
+                surplus.append(pool.popleft()[0])
+            target = self.target_size(key)
+            while len(pool) > target:
+                surplus.append(pool.pop()[0])
+            self._schedule_refill(key)
+        if surplus:
+            await asyncio.gather(
+                *(docker_manager.stop_container(cid) for cid in surplus),
+                return_exceptions=True
+            )
+
+    async def get_metrics(self) -> Dict:
+        """池命中率、补充耗时及空闲容器内存占用"""
+        total = self.hits + self.misses
+        idle_ids = [item[0] for pool in self.idle.values() for item in pool]
+        idle_memory = 0
+        if idle_ids:
+            try:
+                result = await docker_manager._docker(
+                    'stats', '--no-stream', '--format', '{{.MemUsage}}', *idle_ids
+                )
+                idle_memory = sum(_parse_memory(line) for line in result.stdout.splitlines() if line)
+            except Exception as e:
+                system_logger.warning(f"获取空闲容器内存失败: {str(e)}", "lab")
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'refill_count': self.refill_count,
+            'refill_failures': self.refill_failures,
+            'avg_refill_seconds': round(self._avg_refill_seconds(), 2) if self.refill_seconds else None,
+            'last_refill_seconds': round(self.refill_seconds[-1], 2) if self.refill_seconds else None,
+            'idle_containers': len(idle_ids),
+            'dead_discarded': self.dead_discarded,
+            'orphans_removed': self.orphans_removed,
+            'idle_memory_bytes': idle_memory,
+            'pools': {
+                f"{image}:{port}" if port else image: {
+                    'idle': len(self.idle.get((image, port), ())),
+                    'refilling': self.refilling.get((image, port), 0),
+                    'target': self.target_size((image, port))
+                }
+                for image, port in set(self.idle) | set(self.demand)
+            }
+        }
+
+# 创建预热容器池实例
+container_pool = ContainerPool()
@@ -1,10 +1,9 @@
 from typing import Dict, List, Optional
 from datetime import datetime
-import mysql.connector
 import json
 
-from config import DB_CONFIG
-from core.logger import system_logger
+from backend.core.logger import system_logger
+from backend.core.lab.db import lab_db_pool
 
 class LabProgress:
     """实验进度追踪器"""
@@ -15,8 +14,10 @@ class LabProgress:
     
     def get_user_progress(self, user_id: int) -> Dict:
         """获取用户的整体实验进度"""
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             # 获取用户完成的实验数量
@@ -81,13 +82,17 @@ class LabProgress:
             })
             return {'status': 'error', 'message': str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
     
     def get_lab_progress(self, lab_id: int, user_id: int) -> Dict:
         """获取用户在特定实验中的进度"""
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             # 获取实验实例信息
@@ -151,13 +156,17 @@ class LabProgress:
             })
             return {'status': 'error', 'message': str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
     
     def update_step_progress(self, instance_id: int, step_number: int, status: str) -> Dict:
         """更新实验步骤进度"""
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             # 更新步骤状态
@@ -217,13 +226,17 @@ class LabProgress:
             })
             return {'status': 'error', 'message': str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
     
     def submit_lab_report(self, instance_id: int, report_data: Dict) -> Dict:
         """提交实验报告"""
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             # 检查是否已提交过报告
@@ -272,8 +285,10 @@ class LabProgress:
             })
             return {'status': 'error', 'message': str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
 
 # 创建进度追踪器实例
 lab_progress = LabProgress() 
\ No newline at end of file
@@ -1,45 +1,143 @@
-from typing import Dict, List, Optional
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-import mysql.connector
 import json
 import redis
 
-from config import DB_CONFIG, REDIS_CONFIG
-from core.logger import system_logger
+from backend.core.config import REDIS_CONFIG
+from backend.core.logger import system_logger
+from backend.core.lab.db import lab_db_pool
+
+# 用户资料缓存时间（秒）
+PROFILE_CACHE_TTL = 300
+# 用户资料缓存条目上限
+PROFILE_CACHE_SIZE = 10000
+# 靶场分类缓存时间（秒）
+CATEGORY_CACHE_TTL = 600
+# 重建排行榜时的批量参数
+SCAN_COUNT = 1000
+FETCH_BATCH = 10000
+ZADD_BATCH = 1000
+PIPELINE_BATCH = 50
 
 class LabRanking:
-    """实验排行榜管理器"""
+    """实验排行榜管理器
+
+    分数更新和用户排名查询各只需一次Redis往返（pipeline）；
+    靶场分类和用户资料缓存在本地，排行榜读取不再访问MySQL热路径。
+    """
     
     def __init__(self):
         """初始化排行榜管理器"""
         self.redis = redis.Redis(**REDIS_CONFIG)
+        self.lab_categories: Dict[int, str] = {}
+        self.categories_loaded_at = 0.0
+        self.profiles: "OrderedDict[int, Tuple[float, Dict]]" = OrderedDict()
+        self.profile_hits = 0
+        self.profile_misses = 0
+        # 资料缓存会被多个线程同时读写，OrderedDict的move_to_end/popitem不是线程安全的
+        self._profiles_lock = threading.Lock()
+        # 每次失效加一，查询期间发生过失效时不回写缓存，避免旧资料覆盖
+        self._profile_generation = 0
         system_logger.info("实验排行榜管理器初始化成功", "ranking")
     
+    def _load_categories(self, force: bool = False):
+        """加载靶场ID到分类的映射"""
+        if not force and self.lab_categories and time.time() - self.categories_loaded_at < CATEGORY_CACHE_TTL:
+            return
+        conn = lab_db_pool.get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT id, category FROM labs")
+            self.lab_categories = {row['id']: row['category'] for row in cursor.fetchall()}
+            self.categories_loaded_at = time.time()
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_lab_category(self, lab_id: int) -> Optional[str]:
+        """获取靶场分类，新靶场未命中缓存时强制刷新一次"""
+        self._load_categories()
+        if lab_id not in self.lab_categories:
+            self._load_categories(force=True)
+        return self.lab_categories.get(lab_id)
+    
+    def get_categories(self) -> List[str]:
+        self._load_categories()
+        return sorted(set(self.lab_categories.values()))
+    
+    def get_user_profiles(self, user_ids: List[int]) -> Dict[int, Dict]:
+        """批量获取用户资料，只对缓存未命中的用户查询一次数据库"""
+        now = time.time()
+        profiles = {}
+        missing = []
+        with self._profiles_lock:
+            for user_id in user_ids:
+                cached = self.profiles.get(user_id)
+                if cached and now - cached[0] < PROFILE_CACHE_TTL:
+                    self.profiles.move_to_end(user_id)
+                    profiles[user_id] = cached[1]
+                else:
+                    missing.append(user_id)
+            self.profile_hits += len(profiles)
+            self.profile_misses += len(missing)
+            generation = self._profile_generation
+        
+        if missing:
+            loaded = {}
+            conn = lab_db_pool.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            try:
+                placeholders = ','.join(['%s'] * len(missing))
+                cursor.execute(
+                    f"""
+                    SELECT id, username, avatar
+                    FROM users
+                    WHERE id IN ({placeholders})
+                    """,
+                    missing
+                )
+                for user in cursor.fetchall():
+                    loaded[user['id']] = {'username': user['username'], 'avatar': user['avatar']}
+            finally:
+                cursor.close()
+                conn.close()
+            profiles.update(loaded)
+            with self._profiles_lock:
+                if generation == self._profile_generation:
+                    for user_id, profile in loaded.items():
+                        self.profiles[user_id] = (now, profile)
+                        self.profiles.move_to_end(user_id)
+                    while len(self.profiles) > PROFILE_CACHE_SIZE:
+                        self.profiles.popitem(last=False)
+        
+        return profiles
+    
+    def invalidate_user_profile(self, user_id: int):
+        """用户修改用户名或头像后调用"""
+        with self._profiles_lock:
+            self.profiles.pop(user_id, None)
+            self._profile_generation += 1
+    
     def update_user_score(self, user_id: int, lab_id: int, score: int):
         """更新用户分数"""
         try:
-            # 更新总分
-            self.redis.zincrby('lab:total_score', score, user_id)
-            
-            # 更新实验分类分数
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute(
-                "SELECT category FROM labs WHERE id = %s",
-                (lab_id,)
-            )
-            lab = cursor.fetchone()
-            
-            if lab:
-                self.redis.zincrby(f'lab:category_score:{lab["category"]}', score, user_id)
-            
-            # 更新月度分数
+            category = self.get_lab_category(lab_id)
             month_key = f'lab:monthly_score:{datetime.now().strftime("%Y%m")}'
-            self.redis.zincrby(month_key, score, user_id)
             
-            # 设置月度分数的过期时间（3个月后）
-            self.redis.expire(month_key, 90 * 24 * 3600)
+            pipe = self.redis.pipeline(transaction=False)
+            # 更新总分
+            pipe.zincrby('lab:total_score', score, user_id)
+            # 更新实验分类分数
+            if category:
+                pipe.zincrby(f'lab:category_score:{category}', score, user_id)
+            # 更新月度分数，并设置过期时间（3个月后）
+            pipe.zincrby(month_key, score, user_id)
+            pipe.expire(month_key, 90 * 24 * 3600)
+            pipe.execute()
             
         except Exception as e:
             system_logger.error(f"更新用户分数失败: {str(e)}", "ranking", {
@@ -48,119 +146,53 @@ class LabRanking:
                 'score': score
             })
     
+    def _get_ranking(self, key: str, start: int, limit: int) -> Tuple[int, List[Dict]]:
+        """一次往返读取排名区间和总人数，并补全用户资料"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrevrange(key, start, start + limit - 1, withscores=True)
+        pipe.zcard(key)
+        ranking_data, total = pipe.execute()
+        
+        if not ranking_data:
+            return 0, []
+        
+        users = self.get_user_profiles([int(uid) for uid, _ in ranking_data])
+        
+        # 构建排名列表
+        ranking = []
+        for rank, (user_id, score) in enumerate(ranking_data, start=start+1):
+            user = users.get(int(user_id), {})
+            ranking.append({
+                'rank': rank,
+                'user_id': int(user_id),
+                'username': user.get('username', 'Unknown'),
+                'avatar': user.get('avatar', ''),
+                'score': int(score)
+            })
+        return total, ranking
+    
     def get_total_ranking(self, start: int = 0, limit: int = 10) -> Dict:
         """获取总分排行榜"""
         try:
-            # 获取排名数据
-            ranking_data = self.redis.zrevrange(
-                'lab:total_score',
-                start,
-                start + limit - 1,
-                withscores=True
-            )
-            
-            # 获取用户信息
-            user_ids = [int(uid) for uid, _ in ranking_data]
-            if not user_ids:
-                return {
-                    'status': 'success',
-                    'total': 0,
-                    'ranking': []
-                }
-            
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
-            # 获取用户信息
-            placeholders = ','.join(['%s'] * len(user_ids))
-            cursor.execute(
-                f"""
-                SELECT id, username, avatar
-                FROM users
-                WHERE id IN ({placeholders})
-                """,
-                user_ids
-            )
-            users = {user['id']: user for user in cursor.fetchall()}
-            
-            # 构建排名列表
-            ranking = []
-            for rank, (user_id, score) in enumerate(ranking_data, start=start+1):
-                user = users.get(int(user_id), {})
-                ranking.append({
-                    'rank': rank,
-                    'user_id': int(user_id),
-                    'username': user.get('username', 'Unknown'),
-                    'avatar': user.get('avatar', ''),
-                    'score': int(score)
-                })
-            
+            total, ranking = self._get_ranking('lab:total_score', start, limit)
             return {
                 'status': 'success',
-                'total': self.redis.zcard('lab:total_score'),
+                'total': total,
                 'ranking': ranking
             }
             
         except Exception as e:
             system_logger.error(f"获取总分排行榜失败: {str(e)}", "ranking")
             return {'status': 'error', 'message': str(e)}
-        finally:
-            if 'conn' in locals():
-                cursor.close()
-                conn.close()
     
     def get_category_ranking(self, category: str, start: int = 0, limit: int = 10) -> Dict:
         """获取分类排行榜"""
         try:
-            # 获取排名数据
-            ranking_data = self.redis.zrevrange(
-                f'lab:category_score:{category}',
-                start,
-                start + limit - 1,
-                withscores=True
-            )
-            
-            # 获取用户信息
-            user_ids = [int(uid) for uid, _ in ranking_data]
-            if not user_ids:
-                return {
-                    'status': 'success',
-                    'category': category,
-                    'total': 0,
-                    'ranking': []
-                }
-            
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
-            # 获取用户信息
-            placeholders = ','.join(['%s'] * len(user_ids))
-            cursor.execute(
-                f"""
-                SELECT id, username, avatar
-                FROM users
-                WHERE id IN ({placeholders})
-                """,
-                user_ids
-            )
-            users = {user['id']: user for user in cursor.fetchall()}
-            
-            # 构建排名列表
-            ranking = []
-            for rank, (user_id, score) in enumerate(ranking_data, start=start+1):
-                user = users.get(int(user_id), {})
-                ranking.append({
-                    'rank': rank,
-                    'user_id': int(user_id),
-                    'username': user.get('username', 'Unknown'),
-                    'avatar': user.get('avatar', ''),
-                    'score': int(score)
-                })
-            
+            total, ranking = self._get_ranking(f'lab:category_score:{category}', start, limit)
             return {
                 'status': 'success',
                 'category': category,
-                'total': self.redis.zcard(f'lab:category_score:{category}'),
+                'total': total,
                 'ranking': ranking
             }
             
@@ -169,10 +201,6 @@ class LabRanking:
                 'category': category
             })
             return {'status': 'error', 'message': str(e)}
-        finally:
-            if 'conn' in locals():
-                cursor.close()
-                conn.close()
     
     def get_monthly_ranking(self, year_month: str = None, start: int = 0, limit: int = 10) -> Dict:
         """获取月度排行榜"""
@@ -180,55 +208,11 @@ class LabRanking:
             if not year_month:
                 year_month = datetime.now().strftime("%Y%m")
             
-            # 获取排名数据
-            ranking_data = self.redis.zrevrange(
-                f'lab:monthly_score:{year_month}',
-                start,
-                start + limit - 1,
-                withscores=True
-            )
-            
-            # 获取用户信息
-            user_ids = [int(uid) for uid, _ in ranking_data]
-            if not user_ids:
-                return {
-                    'status': 'success',
-                    'year_month': year_month,
-                    'total': 0,
-                    'ranking': []
-                }
-            
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
-            # 获取用户信息
-            placeholders = ','.join(['%s'] * len(user_ids))
-            cursor.execute(
-                f"""
-                SELECT id, username, avatar
-                FROM users
-                WHERE id IN ({placeholders})
-                """,
-                user_ids
-            )
-            users = {user['id']: user for user in cursor.fetchall()}
-            
-            # 构建排名列表
-            ranking = []
-            for rank, (user_id, score) in enumerate(ranking_data, start=start+1):
-                user = users.get(int(user_id), {})
-                ranking.append({
-                    'rank': rank,
-                    'user_id': int(user_id),
-                    'username': user.get('username', 'Unknown'),
-                    'avatar': user.get('avatar', ''),
-                    'score': int(score)
-                })
-            
+            total, ranking = self._get_ranking(f'lab:monthly_score:{year_month}', start, limit)
             return {
                 'status': 'success',
                 'year_month': year_month,
-                'total': self.redis.zcard(f'lab:monthly_score:{year_month}'),
+                'total': total,
                 'ranking': ranking
             }
             
@@ -237,54 +221,39 @@ class LabRanking:
                 'year_month': year_month
             })
             return {'status': 'error', 'message': str(e)}
-        finally:
-            if 'conn' in locals():
-                cursor.close()
-                conn.close()
     
     def get_user_ranking(self, user_id: int) -> Dict:
-        """获取用户的排名信息"""
+        """获取用户的排名信息（总分、各分类、月度排名一次往返取回）"""
         try:
             result = {
                 'status': 'success',
                 'rankings': {}
             }
             
-            # 获取总分排名
-            total_score = self.redis.zscore('lab:total_score', user_id)
-            if total_score is not None:
-                total_rank = self.redis.zrevrank('lab:total_score', user_id)
-                result['rankings']['total'] = {
-                    'score': int(total_score),
-                    'rank': int(total_rank) + 1 if total_rank is not None else None
-                }
-            
-            # 获取分类排名
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
-            cursor.execute("SELECT DISTINCT category FROM labs")
-            categories = [row['category'] for row in cursor.fetchall()]
-            
-            for category in categories:
-                score = self.redis.zscore(f'lab:category_score:{category}', user_id)
-                if score is not None:
-                    rank = self.redis.zrevrank(f'lab:category_score:{category}', user_id)
-                    result['rankings'][category] = {
-                        'score': int(score),
-                        'rank': int(rank) + 1 if rank is not None else None
-                    }
-            
-            # 获取月度排名
             year_month = datetime.now().strftime("%Y%m")
-            monthly_score = self.redis.zscore(f'lab:monthly_score:{year_month}', user_id)
-            if monthly_score is not None:
-                monthly_rank = self.redis.zrevrank(f'lab:monthly_score:{year_month}', user_id)
-                result['rankings']['monthly'] = {
-                    'year_month': year_month,
-                    'score': int(monthly_score),
-                    'rank': int(monthly_rank) + 1 if monthly_rank is not None else None
+            boards = [('total', 'lab:total_score')]
+            boards.extend(
+                (category, f'lab:category_score:{category}')
+                for category in self.get_categories()
+            )
+            boards.append(('monthly', f'lab:monthly_score:{year_month}'))
+            
+            pipe = self.redis.pipeline(transaction=False)
+            for _, key in boards:
+                pipe.zscore(key, user_id)
+                pipe.zrevrank(key, user_id)
+            replies = pipe.execute()
+            
+            for index, (name, _) in enumerate(boards):
+                score, rank = replies[2 * index], replies[2 * index + 1]
+                if score is None:
+                    continue
+                result['rankings'][name] = {
+                    'score': int(score),
+                    'rank': int(rank) + 1 if rank is not None else None
                 }
+            if 'monthly' in result['rankings']:
+                result['rankings']['monthly']['year_month'] = year_month
             
             return result
             
@@ -293,65 +262,116 @@ class LabRanking:
                 'user_id': user_id
             })
             return {'status': 'error', 'message': str(e)}
-        finally:
-            if 'conn' in locals():
-                cursor.close()
-                conn.close()
+    
+    def _scan_ranking_keys(self) -> List[str]:
+        """用SCAN增量发现现有排行榜键，避免KEYS阻塞Redis"""
+        keys = set()
+        for pattern in ('lab:total_score', 'lab:category_score:*', 'lab:monthly_score:*'):
+            for key in self.redis.scan_iter(match=pattern, count=SCAN_COUNT):
+                keys.add(key.decode() if isinstance(key, bytes) else key)
+        return sorted(keys)
+    
+    def _bulk_load(self, key: str, scores: Dict[int, float]):
+        """分批ZADD写入有序集合，每批作为一个pipeline发送"""
+        items = list(scores.items())
+        pipe = self.redis.pipeline(transaction=False)
+        queued = 0
+        for i in range(0, len(items), ZADD_BATCH):
+            pipe.zadd(key, dict(items[i:i + ZADD_BATCH]))
+            queued += 1
+            if queued >= PIPELINE_BATCH:
+                pipe.execute()
+                queued = 0
+        if queued:
+            pipe.execute()
     
     def sync_rankings(self):
-        """同步排行榜数据（从数据库同步到Redis）"""
+        """同步排行榜数据（从数据库同步到Redis）
+        
+        新数据先写入临时键，全部构建完成后在一个MULTI/EXEC里RENAME覆盖正式键，
+        读取方只会看到旧榜或新榜，不会看到重建中的半成品。
+        """
+        build_id = uuid.uuid4().hex[:12]
+        tmp_prefix = f'lab:resync:{build_id}:'
+        boards: Dict[str, Dict[int, float]] = {}
+        started = time.time()
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
-            # 清空现有排行榜数据
-            for key in self.redis.keys('lab:*_score:*'):
-                self.redis.delete(key)
-            
-            # 获取所有完成的实验实例
+            # 在数据库端按用户/分类/月份聚合，传输量与提交数无关
+            cutoff = datetime.now() - timedelta(days=90)
             cursor.execute(
                 """
                 SELECT 
                     li.user_id,
                     l.category,
-                    li.score,
-                    li.end_time
+                    DATE_FORMAT(li.end_time, '%%Y%%m') AS ym,
+                    SUM(li.score) AS score,
+                    SUM(CASE WHEN li.end_time > %s THEN li.score ELSE 0 END) AS recent_score
                 FROM lab_instances li
                 JOIN labs l ON li.lab_id = l.id
                 WHERE li.status = 'completed' AND li.score > 0
-                """
+                GROUP BY li.user_id, l.category, ym
+                """,
+                (cutoff,)
             )
-            instances = cursor.fetchall()
-            
-            # 更新排行榜数据
-            for instance in instances:
-                # 更新总分
-                self.redis.zincrby('lab:total_score', instance['score'], instance['user_id'])
-                
-                # 更新分类分数
-                self.redis.zincrby(
-                    f'lab:category_score:{instance["category"]}',
-                    instance['score'],
-                    instance['user_id']
-                )
-                
-                # 更新月度分数
-                year_month = instance['end_time'].strftime("%Y%m")
-                if (datetime.now() - instance['end_time']) < timedelta(days=90):
-                    self.redis.zincrby(
-                        f'lab:monthly_score:{year_month}',
-                        instance['score'],
-                        instance['user_id']
-                    )
             
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH)
+                if not rows:
+                    break
+                for row in rows:
+                    user_id, score = row['user_id'], float(row['score'])
+                    total = boards.setdefault('lab:total_score', {})
+                    total[user_id] = total.get(user_id, 0) + score
+                    category = boards.setdefault(f'lab:category_score:{row["category"]}', {})
+                    category[user_id] = category.get(user_id, 0) + score
+                    # 只保留最近90天的月度分数
+                    if row['recent_score']:
+                        monthly = boards.setdefault(f'lab:monthly_score:{row["ym"]}', {})
+                        monthly[user_id] = monthly.get(user_id, 0) + float(row['recent_score'])
+            
+            # 写入临时键
+            for key, scores in boards.items():
+                self._bulk_load(tmp_prefix + key, scores)
+            
+            # 原子切换：覆盖新键，删除已不存在的旧键
+            stale_keys = [key for key in self._scan_ranking_keys() if key not in boards]
+            pipe = self.redis.pipeline(transaction=True)
+            for key in boards:
+                pipe.rename(tmp_prefix + key, key)
+                if key.startswith('lab:monthly_score:'):
+                    pipe.expire(key, 90 * 24 * 3600)
+            if stale_keys:
+                pipe.unlink(*stale_keys)
+            pipe.execute()
+            
+            system_logger.info("排行榜数据同步成功", "ranking", {
+                'boards': len(boards),
+                'members': sum(len(scores) for scores in boards.values()),
+                'removed': len(stale_keys),
+                'seconds': round(time.time() - started, 2)
+            })
             return {'status': 'success', 'message': '排行榜数据同步成功'}
             
         except Exception as e:
             system_logger.error(f"同步排行榜数据失败: {str(e)}", "ranking")
+            # 清理未切换的临时键
+            try:
+                leftovers = list(self.redis.scan_iter(match=f'{tmp_prefix}*', count=SCAN_COUNT))
+                if leftovers:
+                    self.redis.unlink(*leftovers)
+            except Exception:
+                pass
             return {'status': 'error', 'message': str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
 
 # 创建排行榜管理器实例
 lab_ranking = LabRanking() 
\ No newline at end of file
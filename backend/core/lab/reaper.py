@@ -0,0 +1,170 @@
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from backend.core.logger import system_logger
+from backend.core.docker import docker_manager
+
+# 同时回收的容器数
+REAP_CONCURRENCY = 8
+# 单个容器停止+删除的最长时间（秒），超时后直接强制删除
+CONTAINER_TIMEOUT = 45
+# 每回收这么多个实例批量更新一次数据库
+UPDATE_BATCH_SIZE = 50
+
+
+class LabReaper:
+    """过期靶场实例回收器
+
+    并发停止并删除过期实例的容器，并发数受 concurrency 限制，每个容器有独立超时；
+    回收成功的实例按批在线程池中调用 mark_reaped(instance_ids) 一次性更新数据库，
+    各批依次执行；中途出错时已回收的实例也已落库，下次不会重复处理。
+    Docker不可用时容器无法删除，实例计为失败，留待下次回收。
+    同一容器正在回收时再次提交会被跳过，定时任务重叠执行也不会重复停止容器。
+    """
+
+    def __init__(
+        self,
+        concurrency: int = REAP_CONCURRENCY,
+        container_timeout: float = CONTAINER_TIMEOUT,
+        update_batch_size: int = UPDATE_BATCH_SIZE
+    ):
+        self.concurrency = concurrency
+        self.container_timeout = container_timeout
+        self.update_batch_size = update_batch_size
+        self._in_flight = set()
+        self.backlog = 0
+        self.last_run: Optional[Dict] = None
+        self.totals = {
+            'runs': 0,
+            'reaped': 0,
+            'failed': 0,
+            'timed_out': 0,
+            'skipped': 0
+        }
+
+    async def _teardown(self, container_id: Optional[str]) -> bool:
+        """停止并删除容器，超时后强制删除；返回是否超时"""
+        if not container_id:
+            return False
+        if not docker_manager.docker_available:
+            # stop_container此时会直接返回，不能当作已回收
+            raise Exception("Docker服务不可用，无法删除容器")
+        try:
+            await asyncio.wait_for(docker_manager.stop_container(container_id), self.container_timeout)
+            return False
+        except asyncio.TimeoutError:
+            await docker_manager.force_remove(container_id)
+            return True
+
+    async def reap(
+        self,
+        instances: Iterable[Tuple[int, Optional[str]]],
+        mark_reaped: Callable[[Sequence[int]], None],
+        source: str = "lab"
+    ) -> Dict:
+        """回收一批过期实例
+
+        Args:
+            instances: (实例ID, 容器ID) 列表
+            mark_reaped: 批量更新实例状态的回调，参数为回收成功的实例ID列表
+            source: 日志中标识调用方
+
+        Returns:
+            本次回收统计
+        """
+        pending = []
+        skipped = 0
+        for instance_id, container_id in instances:
+            if container_id and container_id in self._in_flight:
+                skipped += 1
+                continue
+            if container_id:
+                self._in_flight.add(container_id)
+            pending.append((instance_id, container_id))
+
+        stats = {
+            'source': source,
+            'found': len(pending) + skipped,
+            'reaped': 0,
+            'failed': 0,
+            'timed_out': 0,
+            'skipped': skipped,
+            'duration': 0.0,
+            'throughput': 0.0
+        }
+        if not pending:
+            return stats
+
+        begin = time.monotonic()
+        self.backlog += len(pending)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        flush_lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        reaped: List[int] = []
+
+        async def flush():
+            if not reaped:
+                return
+            batch = list(reaped)
+            reaped.clear()
+            try:
+                # mark_reaped是同步的数据库操作；加锁保证同一时刻只有一批在执行
+                async with flush_lock:
+                    await loop.run_in_executor(None, mark_reaped, batch)
+            except Exception as e:
+                stats['failed'] += len(batch)
+                stats['reaped'] -= len(batch)
+                system_logger.error(f"批量更新过期实例状态失败: {str(e)}", "lab", {
+                    'source': source,
+                    'instance_ids': batch
+                })
+
+        async def reap_one(instance_id: int, container_id: Optional[str]):
+            try:
+                async with semaphore:
+                    if await self._teardown(container_id):
+                        stats['timed_out'] += 1
+                stats['reaped'] += 1
+                reaped.append(instance_id)
+                if len(reaped) >= self.update_batch_size:
+                    await flush()
+            except Exception as e:
+                stats['failed'] += 1
+                system_logger.error(f"清理过期实例失败: {str(e)}", "lab", {
+                    'instance_id': instance_id,
+                    'container_id': container_id
+                })
+            finally:
+                self.backlog -= 1
+                self._in_flight.discard(container_id)
+
+        try:
+            await asyncio.gather(*(reap_one(*item) for item in pending))
+        finally:
+            await flush()
+
+        duration = time.monotonic() - begin
+        stats['duration'] = round(duration, 2)
+        stats['throughput'] = round(stats['reaped'] / duration, 2) if duration > 0 else 0.0
+        self.last_run = stats
+        self.totals['runs'] += 1
+        for key in ('reaped', 'failed', 'timed_out', 'skipped'):
+            self.totals[key] += stats[key]
+
+        system_logger.info("过期实例回收完成", "lab", dict(stats, backlog=self.backlog))
+        return stats
+
+    def get_metrics(self) -> Dict:
+        """当前积压数、最近一次回收的吞吐以及累计统计"""
+        return {
+            'backlog': self.backlog,
+            'in_flight': len(self._in_flight),
+            'concurrency': self.concurrency,
+            'last_run': self.last_run,
+            **self.totals
+        }
+
+
+# 创建过期实例回收器实例
+lab_reaper = LabReaper()
@@ -1,12 +1,12 @@
 from typing import Dict, List, Optional
 from datetime import datetime
-import mysql.connector
 import json
 import os
 from pathlib import Path
 
-from config import DB_CONFIG, UPLOAD_DIR
-from core.logger import system_logger
+from backend.core.config import UPLOAD_DIR
+from backend.core.logger import system_logger
+from backend.core.lab.db import lab_db_pool
 
 class LabReport:
     """实验报告管理器"""
@@ -19,8 +19,10 @@ class LabReport:
     
     def get_report(self, report_id: int) -> Dict:
         """获取实验报告详情"""
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             # 获取报告基本信息
@@ -100,13 +102,17 @@ class LabReport:
             })
             return {'status': 'error', 'message': str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
     
     def get_user_reports(self, user_id: int, page: int = 1, per_page: int = 10) -> Dict:
         """获取用户的实验报告列表"""
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             # 获取总数
@@ -164,11 +170,15 @@ class LabReport:
             })
             return {'status': 'error', 'message': str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
     
     async def save_attachment(self, report_id: int, file: Dict) -> Dict:
         """保存报告附件"""
+        conn = None
+        cursor = None
         try:
             # 生成文件名
             filename = f"{report_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file['filename']}"
@@ -179,7 +189,7 @@ class LabReport:
                 f.write(file['content'])
             
             # 更新数据库
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             cursor.execute(
@@ -229,13 +239,17 @@ class LabReport:
             })
             return {'status': 'error', 'message': str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
     
     def add_comment(self, report_id: int, user_id: int, content: str) -> Dict:
         """添加报告评论"""
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             cursor.execute(
@@ -278,13 +292,17 @@ class LabReport:
             })
             return {'status': 'error', 'message': str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
     
     def update_score(self, report_id: int, score: int, feedback: str = None) -> Dict:
         """更新报告评分"""
+        conn = None
+        cursor = None
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
+            conn = lab_db_pool.get_connection()
             cursor = conn.cursor(dictionary=True)
             
             cursor.execute(
@@ -320,8 +338,10 @@ class LabReport:
             })
             return {'status': 'error', 'message': str(e)}
         finally:
-            cursor.close()
-            conn.close()
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
 
 # 创建报告管理器实例
 lab_report = LabReport() 
\ No newline at end of file
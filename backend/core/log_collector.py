@@ -3,43 +3,340 @@
 """
 
 import os
+import re
+import glob
+import gzip
+import shutil
 import asyncio
 import logging
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 from collections import deque
+from itertools import islice
 
 logger = logging.getLogger(__name__)
 
+# 缓冲区达到该字节数或距上次写盘超过该秒数时写入文件
+FLUSH_BYTES = 64 * 1024
+FLUSH_INTERVAL = 1.0
+# 单个日志文件超过该大小时轮转，轮转出的文件压缩保存，最多保留BACKUP_COUNT个
+MAX_LOG_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+# 从文件末尾向前读取时每次读取的块大小
+TAIL_BLOCK_SIZE = 8192
+# 实时日志流单批最多推送的行数，以及没有新日志时发送心跳的间隔（秒）
+STREAM_BATCH_LINES = 500
+STREAM_HEARTBEAT = 15.0
+
+# 日志级别，数值越大越严重；日志行中没有级别关键字时视为 INFO
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+_LEVEL_ALIASES = {"WARN": "WARNING", "FATAL": "CRITICAL"}
+_LEVEL_PATTERN = re.compile(r"\b(DEBUG|INFO|WARN|WARNING|ERROR|CRITICAL|FATAL)\b")
+
+
+def tail_lines(path: str, lines: int, block_size: int = TAIL_BLOCK_SIZE) -> List[str]:
+    """从文件末尾向前按块读取，返回最后lines行
+
+    只读取包含这些行的末尾部分，耗时与文件总大小无关
+    """
+    if lines <= 0:
+        return []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        blocks = []
+        newlines = 0
+        # 多读一个换行符，保证第一行是完整的
+        while position > 0 and newlines <= lines:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+    data = b"".join(reversed(blocks))
+    result = data.decode("utf-8", errors="replace").splitlines(keepends=True)
+    return result[-lines:]
+
+
+def line_level(line: str) -> str:
+    """根据日志行中的级别关键字判断级别"""
+    match = _LEVEL_PATTERN.search(line)
+    if not match:
+        return "INFO"
+    level = match.group(1)
+    return _LEVEL_ALIASES.get(level, level)
+
+
+class LogFilter:
+    """实时日志的过滤条件：最低级别、输出流（stdout/stderr）和关键字
+
+    关键字按不区分大小写的子串匹配。过滤在事件循环上逐行执行，不接受用户提供的
+    正则表达式，避免回溯严重的表达式卡住整个服务（ReDoS）
+    """
+
+    MAX_PATTERN_LENGTH = 200
+
+    def __init__(
+        self,
+        level: Optional[str] = None,
+        stream: Optional[str] = None,
+        pattern: Optional[str] = None
+    ):
+        self.min_level = 0
+        if level:
+            level = _LEVEL_ALIASES.get(level.upper(), level.upper())
+            if level not in LOG_LEVELS:
+                raise ValueError(f"Unsupported log level: {level}")
+            self.min_level = LOG_LEVELS[level]
+
+        self.stream_tag = None
+        if stream:
+            if stream.lower() not in ("stdout", "stderr"):
+                raise ValueError(f"Unsupported output stream: {stream}")
+            self.stream_tag = f"] [{stream.upper()}] "
+
+        self.keyword = None
+        if pattern:
+            if len(pattern) > self.MAX_PATTERN_LENGTH:
+                raise ValueError("Filter pattern is too long")
+            self.keyword = pattern.casefold()
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.min_level or self.stream_tag or self.keyword)
+
+    def match(self, line: str) -> bool:
+        if self.stream_tag and self.stream_tag not in line:
+            return False
+        if self.min_level and LOG_LEVELS[line_level(line)] < self.min_level:
+            return False
+        if self.keyword and self.keyword not in line.casefold():
+            return False
+        return True
+
+
+class BufferedLogWriter:
+    """单个靶场的日志写入器
+
+    保持一个文件句柄，日志行先进入内存缓冲区，按大小或时间阈值批量写盘；
+    文件超过max_bytes时轮转，轮转出的文件在后台线程中压缩为 .gz
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_bytes: int = FLUSH_BYTES,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_bytes: int = MAX_LOG_BYTES,
+        backup_count: int = BACKUP_COUNT,
+        compress: bool = True
+    ):
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self._handle = None
+        self._buffer: List[bytes] = []
+        self._pending = 0
+        self._size = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.stats = {
+            'lines': 0,
+            'flushes': 0,
+            'rotations': 0
+        }
+
+    def _open(self):
+        if self._handle is None:
+            self._handle = open(self.path, "ab")
+            self._size = self._handle.tell()
+
+    def write(self, line: str):
+        """写入一行日志，缓冲区满时写盘"""
+        data = (line + "\n").encode("utf-8", errors="replace")
+        with self._lock:
+            self._buffer.append(data)
+            self._pending += len(data)
+            self.stats['lines'] += 1
+            if self._pending >= self.flush_bytes:
+                self._flush_locked()
+
+    def flush_if_due(self, now: Optional[float] = None):
+        """距上次写盘超过时间阈值时写盘"""
+        now = time.monotonic() if now is None else now
+        if self._buffer and now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._pending = 0
+        self._open()
+        self._handle.write(data)
+        self._handle.flush()
+        self._size += len(data)
+        self.stats['flushes'] += 1
+        if self.max_bytes and self._size >= self.max_bytes:
+            self._rotate_locked()
+
+    def rotate(self):
+        """立即轮转当前日志文件"""
+        with self._lock:
+            self._flush_locked()
+            self._rotate_locked()
+
+    def _rotate_locked(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        rotated = f"{self.path}.{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        os.replace(self.path, rotated)
+        self._size = 0
+        self.stats['rotations'] += 1
+        if self.compress:
+            threading.Thread(
+                target=self._compress,
+                args=(rotated,),
+                name="log-compress",
+                daemon=True
+            ).start()
+        else:
+            self._prune_backups()
+
+    def _compress(self, rotated: str):
+        """压缩轮转出的日志文件，并删除超出保留数量的旧文件"""
+        try:
+            tmp_path = rotated + ".gz.tmp"
+            with open(rotated, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, rotated + ".gz")
+            os.remove(rotated)
+        except Exception as e:
+            logger.error(f"Error compressing log file {rotated}: {str(e)}")
+        self._prune_backups()
+
+    def backups(self) -> List[str]:
+        """按时间顺序返回已轮转的日志文件"""
+        pattern = glob.escape(self.path) + ".*"
+        return sorted(
+            path for path in glob.glob(pattern)
+            if not path.endswith(".tmp")
+        )
+
+    def _prune_backups(self):
+        backups = self.backups()
+        for path in backups[:max(0, len(backups) - self.backup_count)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.error(f"Error removing rotated log {path}: {str(e)}")
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
 class LogCollector:
-    def __init__(self, max_lines: int = 1000, log_dir: str = "logs"):
+    def __init__(
+        self,
+        max_lines: int = 1000,
+        log_dir: str = "logs",
+        flush_bytes: int = FLUSH_BYTES,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_bytes: int = MAX_LOG_BYTES,
+        backup_count: int = BACKUP_COUNT
+    ):
         self.max_lines = max_lines
         self.log_dir = log_dir
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
         self.log_buffers: Dict[int, deque] = {}  # challenge_id -> log lines
         self.log_files: Dict[int, str] = {}      # challenge_id -> log file path
-        
+        self.writers: Dict[int, BufferedLogWriter] = {}  # challenge_id -> writer
+        # challenge_id -> 下一行日志的偏移量，重启后继续递增，旧游标仍然有效
+        self.log_offsets: Dict[int, int] = {}
+        # challenge_id -> 新日志事件，所有实时查看者共享同一个缓冲区和事件
+        self._log_events: Dict[int, asyncio.Event] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
         # 创建日志目录
         os.makedirs(log_dir, exist_ok=True)
-    
+
     def start_logging(self, challenge_id: int) -> str:
         """开始收集日志"""
+        # 同一靶场重新开始时先关闭旧的写入器
+        old_writer = self.writers.pop(challenge_id, None)
+        if old_writer:
+            old_writer.close()
+
         # 创建日志缓冲区
         self.log_buffers[challenge_id] = deque(maxlen=self.max_lines)
-        
+        self.log_offsets.setdefault(challenge_id, 0)
+
         # 创建日志文件
         log_file = os.path.join(
             self.log_dir,
             f"challenge_{challenge_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
         )
         self.log_files[challenge_id] = log_file
-        
+        self.writers[challenge_id] = BufferedLogWriter(
+            log_file,
+            flush_bytes=self.flush_bytes,
+            flush_interval=self.flush_interval,
+            max_bytes=self.max_bytes,
+            backup_count=self.backup_count
+        )
+
         return log_file
-    
+
     def stop_logging(self, challenge_id: int):
         """停止收集日志"""
+        writer = self.writers.pop(challenge_id, None)
+        if writer:
+            try:
+                writer.close()
+            except Exception as e:
+                logger.error(f"Error closing log file: {str(e)}")
         self.log_buffers.pop(challenge_id, None)
         self.log_files.pop(challenge_id, None)
-    
+        # 唤醒正在等待的实时日志流，让它们结束
+        self._notify_new_logs(challenge_id)
+
+    def _ensure_flush_task(self):
+        """启动定时写盘任务，空闲进程的缓冲日志也能按时落盘"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while self.writers:
+            await asyncio.sleep(self.flush_interval)
+            now = time.monotonic()
+            for challenge_id, writer in list(self.writers.items()):
+                try:
+                    writer.flush_if_due(now)
+                except Exception as e:
+                    logger.error(f"Error flushing log for challenge {challenge_id}: {str(e)}")
+
     async def collect_output(
         self,
         challenge_id: int,
@@ -47,75 +344,186 @@ class LogCollector:
         output_type: str = "stdout"
     ):
         """收集进程输出"""
+        self._ensure_flush_task()
         try:
             stream = process.stdout if output_type == "stdout" else process.stderr
             while True:
                 line = await stream.readline()
                 if not line:
                     break
-                    
+
                 # 解码并处理日志行
-                log_line = line.decode().strip()
+                log_line = line.decode(errors="replace").strip()
                 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 formatted_line = f"[{timestamp}] [{output_type.upper()}] {log_line}"
-                
+
                 # 添加到缓冲区
-                if challenge_id in self.log_buffers:
-                    self.log_buffers[challenge_id].append(formatted_line)
-                
-                # 写入文件
-                if challenge_id in self.log_files:
+                buffer = self.log_buffers.get(challenge_id)
+                if buffer is not None:
+                    buffer.append(formatted_line)
+                    self.log_offsets[challenge_id] += 1
+                    self._notify_new_logs(challenge_id)
+
+                # 写入文件缓冲区
+                writer = self.writers.get(challenge_id)
+                if writer:
                     try:
-                        with open(self.log_files[challenge_id], "a") as f:
-                            f.write(formatted_line + "\n")
+                        writer.write(formatted_line)
                     except Exception as e:
                         logger.error(f"Error writing to log file: {str(e)}")
-                        
+
         except Exception as e:
             logger.error(f"Error collecting {output_type} for challenge {challenge_id}: {str(e)}")
-    
+
     def get_recent_logs(self, challenge_id: int, lines: int = 100) -> List[str]:
         """获取最近的日志"""
         buffer = self.log_buffers.get(challenge_id)
         if not buffer:
             return []
-            
+
         return list(buffer)[-lines:]
-    
+
+    def _notify_new_logs(self, challenge_id: int):
+        event = self._log_events.pop(challenge_id, None)
+        if event:
+            event.set()
+
+    def read_logs(
+        self,
+        challenge_id: int,
+        cursor: Optional[int] = None,
+        limit: int = STREAM_BATCH_LINES,
+        log_filter: Optional[LogFilter] = None
+    ) -> Optional[Dict]:
+        """从内存缓冲区按游标读取日志
+
+        游标是日志行的偏移量，返回的cursor为下次读取的起点；
+        游标早于缓冲区中最早的一行时，skipped为已被覆盖而无法返回的行数。
+        cursor为None时从最后limit行开始。靶场未在收集日志时返回None
+        """
+        buffer = self.log_buffers.get(challenge_id)
+        if buffer is None:
+            return None
+
+        end = self.log_offsets.get(challenge_id, 0)
+        first = end - len(buffer)
+        if cursor is None:
+            cursor = max(first, end - limit)
+        cursor = min(max(cursor, 0), end)
+        skipped = max(0, first - cursor)
+        start = max(cursor, first)
+
+        lines = []
+        offset = start
+        for line in islice(buffer, start - first, None):
+            if len(lines) >= limit:
+                break
+            if log_filter is None or log_filter.match(line):
+                lines.append({"offset": offset, "line": line})
+            offset += 1
+
+        return {"lines": lines, "cursor": offset, "skipped": skipped}
+
+    async def wait_for_logs(self, challenge_id: int, cursor: int, timeout: float) -> bool:
+        """等待游标之后出现新日志，超时返回False"""
+        if self.log_offsets.get(challenge_id, 0) > cursor or challenge_id not in self.log_buffers:
+            return True
+        event = self._log_events.get(challenge_id)
+        if event is None:
+            event = self._log_events[challenge_id] = asyncio.Event()
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def follow_logs(
+        self,
+        challenge_id: int,
+        cursor: Optional[int] = None,
+        backlog: int = 100,
+        log_filter: Optional[LogFilter] = None,
+        heartbeat: float = STREAM_HEARTBEAT
+    ) -> AsyncIterator[Dict]:
+        """实时跟踪日志
+
+        先返回游标之后（或最后backlog行）的日志，之后每有新日志返回一批；
+        超过heartbeat秒没有新日志时返回一个空批次，调用方可借此发送心跳、检查连接。
+        停止收集日志后结束。所有查看者读取同一个内存缓冲区，不会重复读取日志文件
+        """
+        if cursor is None:
+            end = self.log_offsets.get(challenge_id, 0)
+            buffered = len(self.log_buffers.get(challenge_id) or ())
+            cursor = end - min(backlog, buffered)
+
+        while True:
+            batch = self.read_logs(challenge_id, cursor, STREAM_BATCH_LINES, log_filter)
+            if batch is None:
+                return
+            cursor = batch["cursor"]
+            if batch["lines"] or batch["skipped"]:
+                yield batch
+            # 已读到最新一行时等待新日志；整批被过滤掉时直接读取下一批
+            if cursor >= self.log_offsets.get(challenge_id, 0):
+                if not await self.wait_for_logs(challenge_id, cursor, heartbeat):
+                    yield {"lines": [], "cursor": cursor, "skipped": 0}
+
     def get_log_file(self, challenge_id: int) -> Optional[str]:
         """获取日志文件路径"""
+        writer = self.writers.get(challenge_id)
+        if writer:
+            # 下载或读取前把缓冲区中的日志写入文件
+            writer.flush()
         return self.log_files.get(challenge_id)
-    
+
     def read_log_file(
         self,
         challenge_id: int,
         start_line: int = 0,
         max_lines: int = 1000
     ) -> List[str]:
-        """读取日志文件"""
+        """读取日志文件
+
+        start_line为负数时返回文件末尾的 -start_line 行
+        """
         log_file = self.get_log_file(challenge_id)
         if not log_file or not os.path.exists(log_file):
             return []
-            
+
         try:
-            with open(log_file, "r") as f:
-                lines = f.readlines()
-                return lines[start_line:start_line + max_lines]
+            if start_line < 0:
+                return tail_lines(log_file, -start_line)[:max_lines]
+            with open(log_file, "r", errors="replace") as f:
+                return list(islice(f, start_line, start_line + max_lines))
         except Exception as e:
             logger.error(f"Error reading log file: {str(e)}")
             return []
-    
+
+    def tail_log_file(self, challenge_id: int, lines: int = 100) -> List[str]:
+        """读取日志文件的最后几行"""
+        return self.read_log_file(challenge_id, start_line=-lines, max_lines=lines)
+
+    def get_stats(self) -> Dict[int, Dict]:
+        """各靶场日志写入统计"""
+        return {
+            challenge_id: dict(writer.stats, path=writer.path)
+            for challenge_id, writer in self.writers.items()
+        }
+
     def cleanup_old_logs(self, days: int = 7):
-        """清理旧日志文件"""
+        """清理旧日志文件（包括轮转压缩的日志）"""
         try:
             current_time = datetime.now()
+            active_files = set(self.log_files.values())
             for filename in os.listdir(self.log_dir):
-                if not filename.endswith(".log"):
+                if not (filename.endswith(".log") or ".log." in filename):
                     continue
-                    
+
                 file_path = os.path.join(self.log_dir, filename)
+                if file_path in active_files:
+                    continue
                 file_time = datetime.fromtimestamp(os.path.getctime(file_path))
-                
+
                 # 删除超过指定天数的日志
                 if (current_time - file_time).days > days:
                     try:
@@ -123,26 +531,21 @@ class LogCollector:
                         logger.info(f"Removed old log file: {filename}")
                     except Exception as e:
                         logger.error(f"Error removing log file {filename}: {str(e)}")
-                        
+
         except Exception as e:
             logger.error(f"Error cleaning up old logs: {str(e)}")
-    
+
     def rotate_logs(self, challenge_id: int):
-        """轮转日志文件"""
-        old_file = self.get_log_file(challenge_id)
-        if not old_file:
+        """轮转日志文件
+
+        写入器在文件超过大小限制时会自动轮转，这里用于手动触发
+        """
+        writer = self.writers.get(challenge_id)
+        if not writer:
             return
-            
-        # 创建新的日志文件
-        new_file = os.path.join(
-            self.log_dir,
-            f"challenge_{challenge_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-        )
-        
+
         try:
-            # 如果旧文件存在且大小超过限制，进行轮转
-            if os.path.exists(old_file) and os.path.getsize(old_file) > 10 * 1024 * 1024:  # 10MB
-                self.log_files[challenge_id] = new_file
-                logger.info(f"Rotated log file for challenge {challenge_id}")
+            writer.rotate()
+            logger.info(f"Rotated log file for challenge {challenge_id}")
         except Exception as e:
-            logger.error(f"Error rotating log file: {str(e)}") 
\ No newline at end of file
+            logger.error(f"Error rotating log file: {str(e)}")
@@ -1,6 +1,7 @@
 import logging
 import os
 from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Optional
 from ..config import settings
 
 def get_logger(name: str) -> logging.Logger:
@@ -49,4 +50,29 @@ def get_logger(name: str) -> logging.Logger:
     logger.addHandler(file_handler)
     logger.addHandler(console_handler)
     
-    return logger
\ No newline at end of file
+    return logger
+
+class SystemLogger:
+    """按分类记录系统日志，每个分类写入独立的日志文件"""
+
+    def _log(self, level: int, message: str, category: str, extra: Optional[Dict[str, Any]] = None):
+        logger = get_logger(f"system.{category}")
+        if extra:
+            message = f"{message} | {extra}"
+        logger.log(level, message)
+
+    def debug(self, message: str, category: str, extra: Optional[Dict[str, Any]] = None):
+        self._log(logging.DEBUG, message, category, extra)
+
+    def info(self, message: str, category: str, extra: Optional[Dict[str, Any]] = None):
+        self._log(logging.INFO, message, category, extra)
+
+    def warning(self, message: str, category: str, extra: Optional[Dict[str, Any]] = None):
+        self._log(logging.WARNING, message, category, extra)
+
+    def error(self, message: str, category: str, extra: Optional[Dict[str, Any]] = None):
+        self._log(logging.ERROR, message, category, extra)
+
+
+# 创建系统日志实例
+system_logger = SystemLogger()
@@ -1,38 +1,79 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from core.database import SessionLocal
-from core.docker import docker_manager
-from models import ChallengeInstance
+from backend.core.database import SessionLocal
+from backend.core.lab.reaper import lab_reaper
+from backend.models.lab import LabInstance
 
 scheduler = AsyncIOScheduler()
 
+# 练习实例的最长运行时间，与靶场实例一致
+INSTANCE_TIMEOUT = timedelta(hours=1)
+
 async def cleanup_expired_instances():
-    """清理过期的Docker容器"""
+    """并发清理超时未结束的练习实例"""
     db = SessionLocal()
     try:
-        # 获取所有过期的实例
-        expired_instances = db.query(ChallengeInstance).filter(
-            ChallengeInstance.expires_at <= datetime.utcnow(),
-            ChallengeInstance.is_active == True
-        ).all()
-        
-        for instance in expired_instances:
+        def find_expired():
+            # 只取回收需要的字段，不加载整行实例
+            return db.query(LabInstance.id, LabInstance.container_id).filter(
+                LabInstance.start_time <= datetime.now() - INSTANCE_TIMEOUT,
+                LabInstance.end_time.is_(None)
+            ).all()
+
+        def mark_inactive(instance_ids):
+            # 一条UPDATE批量更新实例状态，由回收器在线程池中调用
             try:
-                # 停止并删除容器
-                await docker_manager.stop_container(instance.container_id)
-                # 更新实例状态
-                instance.is_active = False
+                db.query(LabInstance).filter(
+                    LabInstance.id.in_(instance_ids),
+                    LabInstance.end_time.is_(None)
+                ).update(
+                    {"status": "expired", "end_time": datetime.now()},
+                    synchronize_session=False
+                )
                 db.commit()
-            except Exception as e:
-                print(f"Failed to cleanup instance {instance.id}: {str(e)}")
+            except Exception:
                 db.rollback()
+                raise
+
+        loop = asyncio.get_running_loop()
+        expired_instances = await loop.run_in_executor(None, find_expired)
+        await lab_reaper.reap(expired_instances, mark_inactive, "practice_instances")
     finally:
         db.close()
 
+async def cleanup_expired_labs():
+    """并发清理运行超时的靶场实例"""
+    from backend.core.lab.manager import lab_manager
+    await lab_manager.cleanup_expired_instances()
+
+async def prepull_lab_images():
+    """预拉取靶场镜像"""
+    from backend.core.lab.manager import lab_manager
+    await lab_manager.prepull_images()
+
+async def remove_orphan_containers():
+    """清理上次进程遗留的预热容器"""
+    from backend.core.lab.manager import lab_manager
+    await lab_manager.remove_orphan_containers()
+
 def start():
     """启动调度器"""
+    scheduler.add_job(
+        remove_orphan_containers,
+        next_run_time=datetime.now(),
+        id='remove_orphan_containers',
+        replace_existing=True
+    )
+    # 启动时预拉取靶场镜像，避免首次启动靶场时等待pull
+    scheduler.add_job(
+        prepull_lab_images,
+        next_run_time=datetime.now(),
+        id='prepull_lab_images',
+        replace_existing=True
+    )
     # 每5分钟检查一次过期的容器
     scheduler.add_job(
         cleanup_expired_instances,
@@ -40,8 +81,16 @@ def start():
         id='cleanup_expired_instances',
         replace_existing=True
     )
+    scheduler.add_job(
+        cleanup_expired_labs,
+        trigger=IntervalTrigger(minutes=5),
+        id='cleanup_expired_labs',
+        replace_existing=True
+    )
     scheduler.start()
 
-def shutdown():
-    """关闭调度器"""
-    scheduler.shutdown()
\ No newline at end of file
+async def shutdown():
+    """关闭调度器并销毁预热容器池中的空闲容器"""
+    scheduler.shutdown()
+    from backend.core.lab.pool import container_pool
+    await container_pool.stop()
\ No newline at end of file
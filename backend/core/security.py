@@ -1,5 +1,8 @@
 from typing import Optional, Dict
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from backend.core.config import JWT_SECRET_KEY, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
@@ -10,6 +13,49 @@ logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# 密码哈希线程数与排队上限
+PASSWORD_HASH_WORKERS = min(4, os.cpu_count() or 1)
+PASSWORD_HASH_MAX_PENDING = 64
+
+class PasswordHasherBusy(Exception):
+    """密码哈希队列已满"""
+
+class PasswordHashExecutor:
+    """专用的密码哈希线程池
+
+    bcrypt计算会释放GIL，放到独立线程池中执行不会阻塞事件循环；
+    排队任务超过上限时直接拒绝，避免登录洪峰无限堆积。
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, func, *args):
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy("密码校验请求过多")
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+            self.completed += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+password_hasher = PasswordHashExecutor()
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
     try:
@@ -32,6 +78,14 @@ def get_password_hash(password: str) -> str:
         logger.error(f"Password hash generation error: {str(e)}")
         raise
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在密码哈希线程池中验证密码，队列已满时抛出PasswordHasherBusy"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """在密码哈希线程池中生成密码哈希，队列已满时抛出PasswordHasherBusy"""
+    return await password_hasher.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """创建访问令牌"""
     try:
@@ -15,6 +15,7 @@ from ..schemas.entities import (
 )
 from ..core.deps import get_current_user
 from ..core.logger import logger
+from ..services.graph import relationship_index
 
 router = APIRouter(prefix="/entities", tags=["entities"])
 
@@ -157,6 +158,7 @@ async def delete_entity(
         # 删除实体
         db.delete(db_entity)
         db.commit()
+        relationship_index.remove_entity(entity_id)
         return {"message": "实体已删除"}
     except Exception as e:
         db.rollback()
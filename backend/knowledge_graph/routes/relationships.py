@@ -14,6 +14,7 @@ from ..schemas.relationships import (
 )
 from ..core.deps import get_current_user
 from ..core.logger import logger
+from ..services.graph import relationship_index
 
 router = APIRouter(prefix="/relationships", tags=["relationships"])
 
@@ -34,6 +35,7 @@ async def create_relationship(
         db.add(db_relationship)
         db.commit()
         db.refresh(db_relationship)
+        relationship_index.upsert(db_relationship)
         return db_relationship
     except IntegrityError:
         db.rollback()
@@ -113,6 +115,7 @@ async def update_relationship(
             
         db.commit()
         db.refresh(db_relationship)
+        relationship_index.upsert(db_relationship)
         return db_relationship
     except Exception as e:
         db.rollback()
@@ -142,6 +145,7 @@ async def delete_relationship(
     try:
         db.delete(db_relationship)
         db.commit()
+        relationship_index.remove(relationship_id)
         return {"message": "关系已删除"}
     except Exception as e:
         db.rollback()
@@ -167,6 +171,7 @@ async def create_prerequisite(
         )
         db.add(db_relationship)
         db.commit()
+        relationship_index.upsert(db_relationship)
         return {"message": "前置知识关系创建成功"}
     except IntegrityError:
         db.rollback()
@@ -207,6 +212,8 @@ async def create_related(
         db.add(db_reverse_relationship)
         
         db.commit()
+        relationship_index.upsert(db_relationship)
+        relationship_index.upsert(db_reverse_relationship)
         return {"message": "相关知识关系创建成功"}
     except IntegrityError:
         db.rollback()
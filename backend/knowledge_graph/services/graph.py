@@ -1,11 +1,114 @@
-from typing import List, Dict, Any, Optional, Set
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Set, Tuple
 from sqlalchemy.orm import Session
 from ..models.relationships import Entity, EntityRelationship
 from ..core.logger import logger
 
+# 邻接索引的最长有效期（秒），兜底其他进程写入的关系变更
+INDEX_MAX_AGE = 300
+
+
+class RelationshipIndex:
+    """kg_entity_relationships 的内存邻接索引
+
+    关系增删改时由路由调用 upsert/remove 保持同步，
+    路径、关系网络和子图查询直接在内存中遍历，不再逐节点查询数据库。
+    遍历需在 locked() 内进行，避免其他请求线程同时增删关系导致字典在迭代中被修改。
+    """
+
+    def __init__(self, max_age: int = INDEX_MAX_AGE):
+        self.max_age = max_age
+        self.edges: Dict[int, Tuple[int, int, Any, Any]] = {}
+        self.adjacency: Dict[int, Dict[int, int]] = {}  # entity_id -> {rel_id: 相邻实体ID}
+        self.loaded_at = 0.0
+        self._lock = threading.RLock()
+
+    def ensure_loaded(self, db: Session):
+        if self.loaded_at and time.time() - self.loaded_at < self.max_age:
+            return
+        with self._lock:
+            if self.loaded_at and time.time() - self.loaded_at < self.max_age:
+                return
+            rows = db.query(
+                EntityRelationship.id,
+                EntityRelationship.source_id,
+                EntityRelationship.target_id,
+                EntityRelationship.relationship_type,
+                EntityRelationship.properties
+            ).all()
+            self.edges = {}
+            self.adjacency = {}
+            for row in rows:
+                self._add(row.id, row.source_id, row.target_id, row.relationship_type, row.properties)
+            self.loaded_at = time.time()
+            logger.info(f"关系邻接索引已加载: {len(self.edges)} 条关系")
+
+    def _add(self, rel_id: int, source_id: int, target_id: int, rel_type, properties):
+        self.edges[rel_id] = (source_id, target_id, rel_type, properties)
+        self.adjacency.setdefault(source_id, {})[rel_id] = target_id
+        self.adjacency.setdefault(target_id, {})[rel_id] = source_id
+
+    def upsert(self, rel: EntityRelationship):
+        """新增或更新关系后调用"""
+        with self._lock:
+            if not self.loaded_at:
+                return
+            self._remove(rel.id)
+            self._add(rel.id, rel.source_id, rel.target_id, rel.relationship_type, rel.properties)
+
+    def remove(self, rel_id: int):
+        """删除关系后调用"""
+        with self._lock:
+            self._remove(rel_id)
+
+    def remove_entity(self, entity_id: int):
+        """删除实体后调用（数据库中关系会级联删除）"""
+        with self._lock:
+            for rel_id in list(self.adjacency.get(entity_id, {})):
+                self._remove(rel_id)
+            self.adjacency.pop(entity_id, None)
+
+    def _remove(self, rel_id: int):
+        edge = self.edges.pop(rel_id, None)
+        if not edge:
+            return
+        source_id, target_id = edge[0], edge[1]
+        for entity_id in (source_id, target_id):
+            neighbors = self.adjacency.get(entity_id)
+            if neighbors is not None:
+                neighbors.pop(rel_id, None)
+                if not neighbors:
+                    del self.adjacency[entity_id]
+
+    @contextmanager
+    def locked(self):
+        """持有索引锁，期间读取的邻接关系保持一致"""
+        with self._lock:
+            yield self
+
+    def neighbors(self, entity_id: int) -> Dict[int, int]:
+        return self.adjacency.get(entity_id, {})
+
+    def link(self, rel_id: int) -> Dict[str, Any]:
+        source_id, target_id, rel_type, properties = self.edges[rel_id]
+        return {
+            "source": source_id,
+            "target": target_id,
+            "type": rel_type,
+            "properties": properties
+        }
+
+
+# 进程内共享的关系索引
+relationship_index = RelationshipIndex()
+
+
 class GraphService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, index: RelationshipIndex = relationship_index):
         self.db = db
+        self.index = index
         
     def get_entity_with_relations(self, entity_id: int, depth: int = 1) -> Dict[str, Any]:
         """获取实体及其关系网络"""
@@ -13,60 +116,42 @@ class GraphService:
             entity = self.db.query(Entity).filter(Entity.id == entity_id).first()
             if not entity:
                 return None
-                
+            
+            self.index.ensure_loaded(self.db)
+            
+            # 在内存中按层遍历，收集节点和关系
+            order = [entity_id]
             visited = {entity_id}  # 已访问的节点
-            graph = {
-                "nodes": [self._entity_to_dict(entity)],
-                "links": []
-            }
+            seen_links = set()
+            links = []
+            frontier = [entity_id]
+            with self.index.locked():
+                for _ in range(max(depth, 0)):
+                    next_frontier = []
+                    for current_id in frontier:
+                        for rel_id, next_id in self.index.neighbors(current_id).items():
+                            if rel_id not in seen_links:
+                                seen_links.add(rel_id)
+                                links.append(self.index.link(rel_id))
+                            if next_id not in visited:
+                                visited.add(next_id)
+                                order.append(next_id)
+                                next_frontier.append(next_id)
+                    frontier = next_frontier
             
-            if depth > 0:
-                self._get_related_entities(entity_id, depth, visited, graph)
-                
-            return graph
+            # 一次查询取回所有相关实体
+            entities = {entity.id: entity}
+            if len(order) > 1:
+                for related in self.db.query(Entity).filter(Entity.id.in_(order[1:])).all():
+                    entities[related.id] = related
+            
+            return {
+                "nodes": [self._entity_to_dict(entities[i]) for i in order if i in entities],
+                "links": links
+            }
         except Exception as e:
             logger.error(f"获取实体关系网络失败: {str(e)}")
             raise
-            
-    def _get_related_entities(
-        self, 
-        entity_id: int, 
-        depth: int, 
-        visited: Set[int], 
-        graph: Dict[str, List]
-    ) -> None:
-        """递归获取相关实体"""
-        if depth <= 0:
-            return
-            
-        # 获取所有相关关系
-        relationships = self.db.query(EntityRelationship).filter(
-            (EntityRelationship.source_id == entity_id) |
-            (EntityRelationship.target_id == entity_id)
-        ).all()
-        
-        for rel in relationships:
-            # 确定目标实体
-            target_id = rel.target_id if rel.source_id == entity_id else rel.source_id
-            
-            # 如果目标实体未访问过
-            if target_id not in visited:
-                visited.add(target_id)
-                target_entity = self.db.query(Entity).filter(Entity.id == target_id).first()
-                
-                if target_entity:
-                    # 添加节点
-                    graph["nodes"].append(self._entity_to_dict(target_entity))
-                    # 递归获取更深层的关系
-                    self._get_related_entities(target_id, depth - 1, visited, graph)
-            
-            # 添加关系
-            graph["links"].append({
-                "source": rel.source_id,
-                "target": rel.target_id,
-                "type": rel.relationship_type,
-                "properties": rel.properties
-            })
     
     def get_shortest_path(
         self, 
@@ -74,51 +159,89 @@ class GraphService:
         target_id: int, 
         max_depth: int = 5
     ) -> Optional[List[Dict[str, Any]]]:
-        """查找两个实体之间的最短路径"""
+        """查找两个实体之间的最短路径（内存中双向广度优先搜索）"""
         try:
-            # 使用广度优先搜索
-            queue = [(source_id, [{"id": source_id}])]
-            visited = {source_id}
+            if source_id == target_id:
+                return [{"id": source_id}]
             
-            while queue and len(visited) < max_depth * 100:  # 限制搜索范围
-                current_id, path = queue.pop(0)
+            self.index.ensure_loaded(self.db)
+            
+            # 节点 -> (上一个节点, 关系ID)
+            parents = {source_id: None}
+            children = {target_id: None}
+            forward, backward = [source_id], [target_id]
+            depth = 0
+            
+            with self.index.locked():
+                while forward and backward and depth < max_depth:
+                    # 总是扩展较小的一侧
+                    expand_forward = len(forward) <= len(backward)
+                    frontier = forward if expand_forward else backward
+                    own, other = (parents, children) if expand_forward else (children, parents)
                 
-                # 获取当前节点的所有关系
-                relationships = self.db.query(EntityRelationship).filter(
-                    (EntityRelationship.source_id == current_id) |
-                    (EntityRelationship.target_id == current_id)
-                ).all()
+                    best = None
+                    next_frontier = []
+                    for current_id in frontier:
+                        for rel_id, next_id in self.index.neighbors(current_id).items():
+                            if next_id in own:
+                                continue
+                            own[next_id] = (current_id, rel_id)
+                            next_frontier.append(next_id)
+                            if next_id in other:
+                                length = self._path_length(parents, next_id) + self._path_length(children, next_id)
+                                if best is None or length < best[0]:
+                                    best = (length, next_id)
+                    depth += 1
+                    if best:
+                        return self._build_path(parents, children, best[1])
                 
-                for rel in relationships:
-                    next_id = rel.target_id if rel.source_id == current_id else rel.source_id
-                    
-                    if next_id == target_id:
-                        # 找到目标节点，返回路径
-                        return path + [
-                            {
-                                "relationship": rel.relationship_type,
-                                "properties": rel.properties
-                            },
-                            {"id": next_id}
-                        ]
-                    
-                    if next_id not in visited and len(path) < max_depth * 2:
-                        visited.add(next_id)
-                        new_path = path + [
-                            {
-                                "relationship": rel.relationship_type,
-                                "properties": rel.properties
-                            },
-                            {"id": next_id}
-                        ]
-                        queue.append((next_id, new_path))
+                    if expand_forward:
+                        forward = next_frontier
+                    else:
+                        backward = next_frontier
             
-            return None  # 未找到路径
+                return None  # 未找到路径
             
         except Exception as e:
             logger.error(f"查找最短路径失败: {str(e)}")
             raise
     
+    @staticmethod
+    def _path_length(parents: Dict[int, Optional[Tuple[int, int]]], node_id: int) -> int:
+        length = 0
+        while parents[node_id] is not None:
+            node_id = parents[node_id][0]
+            length += 1
+        return length
+    
+    def _build_path(
+        self,
+        parents: Dict[int, Optional[Tuple[int, int]]],
+        children: Dict[int, Optional[Tuple[int, int]]],
+        meet_id: int
+    ) -> List[Dict[str, Any]]:
+        """由相遇节点拼接出 起点 -> 相遇节点 -> 终点 的路径"""
+        def step(rel_id: int) -> Dict[str, Any]:
+            link = self.index.link(rel_id)
+            return {"relationship": link["type"], "properties": link["properties"]}
+        
+        head = []
+        node_id = meet_id
+        while parents[node_id] is not None:
+            prev_id, rel_id = parents[node_id]
+            head.append([step(rel_id), {"id": node_id}])
+            node_id = prev_id
+        path = [{"id": node_id}]
+        for items in reversed(head):
+            path.extend(items)
+        
+        node_id = meet_id
+        while children[node_id] is not None:
+            next_id, rel_id = children[node_id]
+            path.extend([step(rel_id), {"id": next_id}])
+            node_id = next_id
+        return path
+    
     def get_subgraph(
         self, 
         entity_ids: List[int], 
@@ -134,21 +257,17 @@ class GraphService:
             }
             
             if include_relations:
-                # 获取这些实体之间的所有关系
-                relationships = self.db.query(EntityRelationship).filter(
-                    (EntityRelationship.source_id.in_(entity_ids)) &
-                    (EntityRelationship.target_id.in_(entity_ids))
-                ).all()
-                
-                graph["links"] = [
-                    {
-                        "source": rel.source_id,
-                        "target": rel.target_id,
-                        "type": rel.relationship_type,
-                        "properties": rel.properties
+                # 从邻接索引中取出这些实体之间的所有关系
+                self.index.ensure_loaded(self.db)
+                id_set = set(entity_ids)
+                with self.index.locked():
+                    rel_ids = {
+                        rel_id
+                        for entity_id in id_set
+                        for rel_id, next_id in self.index.neighbors(entity_id).items()
+                        if next_id in id_set
                     }
-                    for rel in relationships
-                ]
+                    graph["links"] = [self.index.link(rel_id) for rel_id in sorted(rel_ids)]
             
             return graph
             
@@ -17,6 +17,7 @@ from backend.routers.knowledge import router as knowledge_router
 from backend.routers.challenge_router import router as challenge_router
 from backend.routers.monitor import router as monitor_router
 from backend.core.database import init_db
+from backend.core import scheduler
 from backend.core.logger import get_logger
 
 # 初始化日志系统
@@ -106,9 +107,14 @@ async def startup_event():
     logger.info("Starting up application...")
     init_db()
     logger.info("Database initialized")
+    # 启动定时任务：清理遗留的预热容器、预拉取靶场镜像、回收过期实例等
+    scheduler.start()
+    logger.info("Scheduler started")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    # 停止定时任务并销毁预热容器池中的空闲容器
+    await scheduler.shutdown()
     logger.info("应用关闭")
 
 if __name__ == "__main__":
@@ -1,16 +1,254 @@
 import logging
-from typing import Dict, List
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import ipaddress
 import re
 
+# 被视为登录服务的端口，新建连接计入暴力破解窗口
+AUTH_PORTS = {21, 22, 23, 3306, 3389, 5432, 5900}
+# 每种模式最多跟踪的键（源IP/目标IP）数量，超出时淘汰最久未活动的键
+MAX_TRACKED_KEYS = 100000
+# 警报历史保留时长（小时）
+ALERT_HISTORY_HOURS = 24
+
+
+class SlidingWindowSum:
+    """按秒分桶的滑动窗口求和，每次更新摊还O(1)"""
+
+    __slots__ = ('window', 'buckets', 'total')
+
+    def __init__(self, window: float):
+        self.window = window
+        self.buckets: Deque[List] = deque()
+        self.total = 0
+
+    def add(self, ts: float, value: float = 1) -> float:
+        second = int(ts)
+        if self.buckets and self.buckets[-1][0] == second:
+            self.buckets[-1][1] += value
+        else:
+            self.buckets.append([second, value])
+        self.total += value
+        return self.expire(ts)
+
+    def expire(self, now: float) -> float:
+        cutoff = now - self.window
+        while self.buckets and self.buckets[0][0] <= cutoff:
+            self.total -= self.buckets.popleft()[1]
+        return self.total
+
+
+class SlidingWindowDistinct:
+    """滑动窗口内不同取值的个数，每次更新摊还O(1)
+
+    每个取值只保留最近出现的秒，同一秒内重复出现不会增加队列长度。
+    """
+
+    __slots__ = ('window', 'events', 'last_seen')
+
+    def __init__(self, window: float):
+        self.window = window
+        self.events: Deque[Tuple[int, object]] = deque()
+        self.last_seen: Dict[object, int] = {}
+
+    def add(self, ts: float, key) -> int:
+        second = int(ts)
+        if self.last_seen.get(key) != second:
+            self.last_seen[key] = second
+            self.events.append((second, key))
+        return self.expire(ts)
+
+    def expire(self, now: float) -> int:
+        cutoff = now - self.window
+        while self.events and self.events[0][0] <= cutoff:
+            second, key = self.events.popleft()
+            if self.last_seen.get(key) == second:
+                del self.last_seen[key]
+        return len(self.last_seen)
+
+
+class WindowTracker:
+    """一种检测模式下按键（如源IP）划分的滑动窗口集合
+
+    键按最近活动时间排序，每次更新顺带淘汰窗口外不再活动的键，内存随活跃键数量增长。
+    同一个键在一个窗口内只告警一次。
+    """
+
+    def __init__(self, window: float, threshold: float, factory: Callable,
+                 max_keys: int = MAX_TRACKED_KEYS):
+        self.window = window
+        self.threshold = threshold
+        self.factory = factory
+        self.max_keys = max_keys
+        # key -> [窗口, 最近活动时间, 上次告警时间]
+        self.states: "OrderedDict[object, List]" = OrderedDict()
+
+    def add(self, key, ts: float, value) -> Optional[float]:
+        """更新窗口，达到阈值且不在冷却期内时返回当前窗口值"""
+        state = self.states.get(key)
+        if state is None:
+            state = [self.factory(self.window), ts, None]
+            self.states[key] = state
+        else:
+            state[1] = ts
+            self.states.move_to_end(key)
+        current = state[0].add(ts, value)
+        self._evict(ts)
+
+        if current >= self.threshold and (state[2] is None or ts - state[2] >= self.window):
+            state[2] = ts
+            return current
+        return None
+
+    def _evict(self, now: float):
+        # 每次最多淘汰两个键，摊还O(1)
+        for _ in range(2):
+            if not self.states:
+                return
+            key, state = next(iter(self.states.items()))
+            if len(self.states) > self.max_keys or now - state[1] > self.window:
+                self.states.popitem(last=False)
+            else:
+                return
+
+
+class StreamingDetector:
+    """流式威胁检测
+
+    在抓包线程中逐个处理数据包/连接事件，为每个源（或目标）维护滑动窗口计数：
+    - port_scan: 源IP在窗口内访问的不同目标端口数
+    - brute_force: 源IP在窗口内对登录服务的连接次数或登录失败次数
+    - ddos: 目标IP在窗口内收到的数据包数
+    - data_exfiltration: 内网源IP在窗口内发往外网的字节数
+    检测到的威胁放入待处理队列，由监控循环取走。
+    """
+
+    def __init__(self, patterns: Dict, host_ip: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.patterns = patterns
+        self.host_ip = host_ip
+        self.trackers = {
+            'port_scan': WindowTracker(
+                patterns['port_scan']['time_window'], patterns['port_scan']['threshold'],
+                SlidingWindowDistinct
+            ),
+            'brute_force': WindowTracker(
+                patterns['brute_force']['time_window'], patterns['brute_force']['threshold'],
+                SlidingWindowSum
+            ),
+            'ddos': WindowTracker(
+                patterns['ddos']['time_window'], patterns['ddos']['threshold'],
+                SlidingWindowSum
+            ),
+            'data_exfiltration': WindowTracker(
+                patterns['data_exfiltration']['time_window'], patterns['data_exfiltration']['threshold'],
+                SlidingWindowSum
+            )
+        }
+        self.pending: Deque[Dict] = deque(maxlen=10000)
+        self.events_processed = 0
+        self._private_cache: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def _is_private(self, ip: str) -> bool:
+        result = self._private_cache.get(ip)
+        if result is None:
+            try:
+                result = ipaddress.ip_address(ip).is_private
+            except ValueError:
+                result = False
+            if len(self._private_cache) > MAX_TRACKED_KEYS:
+                self._private_cache.clear()
+            self._private_cache[ip] = result
+        return result
+
+    def _emit(self, pattern: str, level: str, value: float, ts: float, **fields):
+        threat = {
+            'type': pattern,
+            'level': level,
+            'description': f"{self.patterns[pattern]['description']}: "
+                           f"{value:.0f} in {self.patterns[pattern]['time_window']}s",
+            'count': value,
+            'time_window': self.patterns[pattern]['time_window'],
+            'timestamp': datetime.fromtimestamp(ts).isoformat()
+        }
+        threat.update(fields)
+        self.pending.append(threat)
+
+    def observe_packet(self, src: str, dst: str, dst_port: Optional[int] = None,
+                       size: int = 0, ts: Optional[float] = None, new_connection: bool = False):
+        """处理一个数据包
+
+        Args:
+            src/dst: 源、目标IP
+            dst_port: 目标端口（TCP/UDP）
+            size: 数据包字节数
+            ts: 抓包时间（epoch秒）
+            new_connection: 是否为新建连接（TCP SYN）
+        """
+        ts = ts or time.time()
+        with self._lock:
+            self.events_processed += 1
+
+            if dst_port is not None:
+                value = self.trackers['port_scan'].add(src, ts, dst_port)
+                if value is not None:
+                    self._emit('port_scan', 'medium', value, ts, source_ip=src, target_ip=dst)
+
+                if new_connection and dst_port in AUTH_PORTS:
+                    value = self.trackers['brute_force'].add(src, ts, 1)
+                    if value is not None:
+                        self._emit('brute_force', 'high', value, ts, source_ip=src, port=dst_port)
+
+            value = self.trackers['ddos'].add(dst, ts, 1)
+            if value is not None:
+                self._emit('ddos', 'high', value, ts, target_ip=dst)
+
+            if size and (src == self.host_ip or self._is_private(src)) and not self._is_private(dst):
+                value = self.trackers['data_exfiltration'].add(src, ts, size)
+                if value is not None:
+                    self._emit('data_exfiltration', 'high', value, ts, source_ip=src, target_ip=dst)
+
+    def observe_failed_login(self, src: str, ts: Optional[float] = None, port: Optional[int] = None):
+        """记录一次登录失败（来自认证日志等）"""
+        ts = ts or time.time()
+        with self._lock:
+            self.events_processed += 1
+            value = self.trackers['brute_force'].add(src, ts, 1)
+            if value is not None:
+                self._emit('brute_force', 'high', value, ts, source_ip=src, port=port)
+
+    def drain(self) -> List[Dict]:
+        """取走所有待处理的威胁"""
+        with self._lock:
+            threats = list(self.pending)
+            self.pending.clear()
+        return threats
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'events_processed': self.events_processed,
+                'pending_threats': len(self.pending),
+                'tracked_keys': {name: len(tracker.states) for name, tracker in self.trackers.items()}
+            }
+
+
 class ThreatAnalyzer:
-    def __init__(self):
+    def __init__(self, host_ip: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
         self.threat_patterns = self._load_threat_patterns()
         self.known_malicious_ips = set()
         self.suspicious_patterns = {}
-        self.alert_history = []
+        self.stream_detector = StreamingDetector(self.threat_patterns, host_ip)
+        # 警报历史按时间顺序追加，统计计数随追加/过期增量维护
+        self.alert_history: Deque[Dict] = deque()
+        self._level_counts: Dict[str, int] = {}
+        self._type_counts: Dict[str, int] = {}
+        self._recent_high: Deque[Dict] = deque(maxlen=5)
         
     def _load_threat_patterns(self) -> Dict:
         """加载威胁模式"""
@@ -57,6 +295,9 @@ class ThreatAnalyzer:
             if 'suspicious_activity' in network_data:
                 threats.extend(self._analyze_suspicious_activity(network_data['suspicious_activity']))
             
+            # 流式检测器在两次分析之间发现的威胁
+            threats.extend(self.stream_detector.drain())
+            
             # 更新警报历史
             self._update_alert_history(threats)
             
@@ -195,18 +436,36 @@ class ThreatAnalyzer:
             self.logger.error(f"Failed to analyze suspicious activity: {str(e)}")
         return threats
 
+    def observe_packet(self, src: str, dst: str, dst_port: Optional[int] = None,
+                       size: int = 0, ts: Optional[float] = None, new_connection: bool = False):
+        """抓包回调：交给流式检测器处理"""
+        self.stream_detector.observe_packet(src, dst, dst_port, size, ts, new_connection)
+
+    def observe_failed_login(self, src: str, ts: Optional[float] = None, port: Optional[int] = None):
+        """登录失败事件：计入暴力破解窗口"""
+        self.stream_detector.observe_failed_login(src, ts, port)
+
     def _update_alert_history(self, threats: List[Dict]):
         """更新警报历史"""
         try:
             # 添加新的警报
-            self.alert_history.extend(threats)
+            for alert in threats:
+                self.alert_history.append(alert)
+                level = alert['level']
+                alert_type = alert['type']
+                self._level_counts[level] = self._level_counts.get(level, 0) + 1
+                self._type_counts[alert_type] = self._type_counts.get(alert_type, 0) + 1
+                if level == 'high':
+                    self._recent_high.append(alert)
             
-            # 移除超过24小时的警报
-            cutoff_time = datetime.now() - timedelta(hours=24)
-            self.alert_history = [
-                alert for alert in self.alert_history
-                if datetime.fromisoformat(alert['timestamp']) > cutoff_time
-            ]
+            # 移除超过24小时的警报（历史按时间顺序排列，只需检查队首）
+            cutoff_time = (datetime.now() - timedelta(hours=ALERT_HISTORY_HOURS)).isoformat()
+            while self.alert_history and self.alert_history[0]['timestamp'] <= cutoff_time:
+                alert = self.alert_history.popleft()
+                self._level_counts[alert['level']] -= 1
+                self._type_counts[alert['type']] -= 1
+                if not self._type_counts[alert['type']]:
+                    del self._type_counts[alert['type']]
         except Exception as e:
             self.logger.error(f"Failed to update alert history: {str(e)}")
 
@@ -220,37 +479,24 @@ class ThreatAnalyzer:
                 'low': 0,
                 'warning': 0
             }
+            level_counts.update(self._level_counts)
             
-            # 按类型统计警报
-            type_counts = {}
-            
-            # 最近的高危警报
-            recent_high_threats = []
-            
-            for alert in self.alert_history:
-                # 统计级别
-                level_counts[alert['level']] = level_counts.get(alert['level'], 0) + 1
-                
-                # 统计类型
-                alert_type = alert['type']
-                type_counts[alert_type] = type_counts.get(alert_type, 0) + 1
-                
-                # 收集最近的高危警报
-                if alert['level'] == 'high':
-                    recent_high_threats.append(alert)
-            
-            # 只保留最近的5个高危警报
-            recent_high_threats.sort(key=lambda x: x['timestamp'], reverse=True)
-            recent_high_threats = recent_high_threats[:5]
+            # 最近的高危警报（排除已过期的）
+            cutoff_time = (datetime.now() - timedelta(hours=ALERT_HISTORY_HOURS)).isoformat()
+            recent_high_threats = [
+                alert for alert in reversed(self._recent_high)
+                if alert['timestamp'] > cutoff_time
+            ]
             
             return {
                 'total_alerts': len(self.alert_history),
                 'alerts_by_level': level_counts,
-                'alerts_by_type': type_counts,
+                'alerts_by_type': dict(self._type_counts),
                 'recent_high_threats': recent_high_threats,
                 'known_malicious_ips': len(self.known_malicious_ips),
+                'detector': self.stream_detector.get_stats(),
                 'timestamp': datetime.now().isoformat()
             }
         except Exception as e:
             self.logger.error(f"Failed to get threat summary: {str(e)}")
-            return {} 
\ No newline at end of file
+            return {}
@@ -1,19 +1,22 @@
 import psutil
 import logging
-from typing import Dict, List
+from collections import deque
+from typing import Callable, Dict, List, Optional
 import socket
 from datetime import datetime
 import netifaces
 import struct
-from scapy.all import sniff, IP
+from scapy.all import sniff, IP, TCP, UDP
 
 class NetworkCollector:
-    def __init__(self):
+    def __init__(self, packet_observer: Optional[Callable] = None):
         self.logger = logging.getLogger(__name__)
         self._initialize()
         self.connection_history = {}
-        self.packet_buffer = []
+        self.packet_buffer = deque(maxlen=1000)
         self.suspicious_ips = set()
+        # 每个数据包的回调，签名 (src, dst, dst_port, size, ts, new_connection)
+        self.packet_observer = packet_observer
 
     def _initialize(self):
         """初始化网络收集器"""
@@ -182,17 +185,27 @@ class NetworkCollector:
         """数据包回调函数"""
         try:
             if IP in packet:
+                src = packet[IP].src
+                dst = packet[IP].dst
+                size = len(packet)
                 self.packet_buffer.append({
                     'time': datetime.now(),
-                    'src': packet[IP].src,
-                    'dst': packet[IP].dst,
+                    'src': src,
+                    'dst': dst,
                     'proto': packet[IP].proto,
-                    'size': len(packet)
+                    'size': size
                 })
                 
-                # 保持缓冲区大小
-                if len(self.packet_buffer) > 1000:
-                    self.packet_buffer.pop(0)
+                if self.packet_observer:
+                    dst_port = None
+                    new_connection = False
+                    if TCP in packet:
+                        dst_port = packet[TCP].dport
+                        # 只有SYN、没有ACK：新建连接
+                        new_connection = (int(packet[TCP].flags) & 0x12) == 0x02
+                    elif UDP in packet:
+                        dst_port = packet[UDP].dport
+                    self.packet_observer(src, dst, dst_port, size, float(packet.time), new_connection)
         except Exception as e:
             self.logger.error(f"Failed to process packet: {str(e)}")
 
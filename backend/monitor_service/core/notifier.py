@@ -1,9 +1,40 @@
+import heapq
+import itertools
 import logging
+import queue
+import threading
+import time
 import yagmail
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 import json
 
+# 待发送通知队列容量，队列满时丢弃新通知而不是阻塞调用方
+QUEUE_SIZE = 10000
+# 同一告警键在该时间窗口（秒）内的重复通知合并为一封摘要邮件
+DIGEST_WINDOW = 300
+# 每分钟最多发送的邮件数
+RATE_LIMIT_PER_MINUTE = 20
+# 发送失败后的最大重试次数及首次重试等待（秒），之后按指数退避
+MAX_RETRIES = 3
+RETRY_BACKOFF = 2
+
+
+class EmailJob:
+    """一封待发送的邮件"""
+
+    __slots__ = ('key', 'subject', 'contents', 'recipients', 'attempts', 'created_at')
+
+    def __init__(self, key: Optional[str], subject: str, contents: str,
+                 recipients: Optional[List[str]] = None):
+        self.key = key
+        self.subject = subject
+        self.contents = contents
+        self.recipients = recipients
+        self.attempts = 0
+        self.created_at = time.time()
+
+
 class Notifier:
     def __init__(self, config: Optional[Dict] = None):
         self.logger = logging.getLogger(__name__)
@@ -14,18 +45,27 @@ class Notifier:
         """初始化通知配置"""
         # 邮件配置
         self.smtp_server = self.config.get('smtp_server', 'smtp.qq.com')
+        self.smtp_port = self.config.get('smtp_port')
         self.smtp_username = self.config.get('smtp_username', '')
         self.smtp_password = self.config.get('smtp_password', '')
         self.from_email = self.config.get('from_email', '')
         self.admin_emails = self.config.get('admin_emails', [])
+        # 本地SMTP测试服务器一般不需要SSL和登录
+        self.smtp_ssl = self.config.get('smtp_ssl', True)
+        self.smtp_starttls = self.config.get('smtp_starttls')
+        self.smtp_skip_login = self.config.get('smtp_skip_login', False)
 
         # 初始化邮件客户端
-        if self.smtp_username and self.smtp_password:
+        if (self.smtp_username and self.smtp_password) or self.smtp_skip_login:
             try:
                 self.yag = yagmail.SMTP(
-                    user=self.smtp_username,
-                    password=self.smtp_password,
-                    host=self.smtp_server
+                    user=self.smtp_username or self.from_email,
+                    password=self.smtp_password or None,
+                    host=self.smtp_server,
+                    port=self.smtp_port,
+                    smtp_ssl=self.smtp_ssl,
+                    smtp_starttls=self.smtp_starttls,
+                    smtp_skip_login=self.smtp_skip_login
                 )
                 self.logger.info("邮件客户端初始化成功")
             except Exception as e:
@@ -43,20 +83,47 @@ class Notifier:
             'WARNING': ['console', 'email']
         }
 
+        # 后台发送队列
+        self.digest_window = self.config.get('digest_window', DIGEST_WINDOW)
+        self.rate_limit = self.config.get('rate_limit_per_minute', RATE_LIMIT_PER_MINUTE)
+        self.max_retries = self.config.get('max_retries', MAX_RETRIES)
+        self._queue: "queue.Queue[EmailJob]" = queue.Queue(maxsize=self.config.get('queue_size', QUEUE_SIZE))
+        # (可发送时间, 序号, 邮件)
+        self._outbox: List = []
+        self._seq = itertools.count()
+        self._last_sent: Dict[str, float] = {}
+        self._digests: Dict[str, List[EmailJob]] = {}
+        self._tokens = float(self.rate_limit)
+        self._tokens_at = time.monotonic()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._start_lock = threading.Lock()
+        self.stats = {
+            'queued': 0,
+            'sent': 0,
+            'failed': 0,
+            'retried': 0,
+            'dropped': 0,
+            'coalesced': 0,
+            'digests': 0
+        }
+
     def notify(self, threat_event) -> bool:
-        """发送威胁事件通知"""
+        """发送威胁事件通知（邮件进入后台队列，不阻塞调用方）"""
         try:
             level = str(threat_event.level).split('.')[-1]  # 获取枚举值的名称
             channels = self.notification_levels.get(level, ['console'])
-            
+
             message = self._format_message(threat_event)
-            
+
             for channel in channels:
                 if channel == 'email':
                     self._send_email(threat_event, message)
                 elif channel == 'console':
                     self._log_console(threat_event, message)
-            
+
             return True
         except Exception as e:
             self.logger.error(f"发送通知失败: {str(e)}")
@@ -65,7 +132,7 @@ class Notifier:
     def _format_message(self, threat_event) -> str:
         """格式化通知消息"""
         details = json.dumps(threat_event.details, ensure_ascii=False, indent=2) if threat_event.details else "无"
-        
+
         return f"""
 威胁事件通知
 -------------------
@@ -81,21 +148,171 @@ class Notifier:
 """
 
     def _send_email(self, threat_event, message: str):
-        """发送邮件通知"""
-        if not self.yag or not self.admin_emails:
+        """威胁事件邮件，按 类型+来源IP 合并重复告警"""
+        subject = f"[威胁告警] {threat_event.type} - {threat_event.level}"
+        self.enqueue_email(subject, message, key=f"threat:{threat_event.type}:{threat_event.source_ip}")
+
+    def enqueue_email(self, subject: str, contents: str, key: Optional[str] = None,
+                      recipients: Optional[List[str]] = None) -> bool:
+        """把邮件放入后台发送队列
+
+        Args:
+            subject: 邮件主题
+            contents: 邮件内容
+            key: 告警键，相同键在摘要窗口内的重复邮件合并发送，None表示不合并
+            recipients: 收件人，默认发给管理员邮箱
+        """
+        if not self.yag or not (recipients or self.admin_emails):
             self.logger.warning("邮件客户端未初始化或管理员邮箱未配置，跳过邮件通知")
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(EmailJob(key, subject, contents, recipients))
+            # 先入队再清除空闲标记，否则后台线程可能在入队前判断队列为空，又把标记置位
+            self._idle.clear()
+            self.stats['queued'] += 1
+            return True
+        except queue.Full:
+            self.stats['dropped'] += 1
+            self.logger.error("通知队列已满，丢弃邮件通知")
+            return False
+
+    def _ensure_worker(self):
+        if self._worker and self._worker.is_alive():
             return
+        with self._start_lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._stopping.clear()
+            self._worker = threading.Thread(target=self._run, name="notifier-worker", daemon=True)
+            self._worker.start()
+
+    def _accept(self, job: EmailJob, now: float):
+        """新邮件：摘要窗口内已发过同键邮件的先暂存，否则直接进入发件箱"""
+        if job.key is not None:
+            if job.key in self._digests:
+                self._digests[job.key].append(job)
+                self.stats['coalesced'] += 1
+                return
+            last = self._last_sent.get(job.key)
+            if last is not None and now - last < self.digest_window:
+                self._digests[job.key] = [job]
+                self.stats['coalesced'] += 1
+                return
+            self._last_sent[job.key] = now
+        heapq.heappush(self._outbox, (now, next(self._seq), job))
 
+    def _flush_digests(self, now: float, force: bool = False):
+        """摘要窗口结束的告警键合并为一封邮件，force为True时不等窗口结束"""
+        for key in list(self._digests):
+            if not force and now - self._last_sent.get(key, 0) < self.digest_window:
+                continue
+            jobs = self._digests.pop(key)
+            self._last_sent[key] = now
+            if len(jobs) == 1:
+                job = jobs[0]
+            else:
+                body = "\n\n".join(
+                    f"[{datetime.fromtimestamp(item.created_at).strftime('%Y-%m-%d %H:%M:%S')}] {item.subject}\n{item.contents}"
+                    for item in jobs
+                )
+                job = EmailJob(
+                    key,
+                    f"[告警摘要] {jobs[-1].subject} 等{len(jobs)}条",
+                    f"最近{self.digest_window}秒内重复告警{len(jobs)}次：\n\n{body}",
+                    jobs[-1].recipients
+                )
+                self.stats['digests'] += 1
+            heapq.heappush(self._outbox, (now, next(self._seq), job))
+        # 清理早已过期的发送记录
+        if len(self._last_sent) > QUEUE_SIZE:
+            for key in [k for k, ts in self._last_sent.items() if now - ts >= self.digest_window]:
+                if key not in self._digests:
+                    del self._last_sent[key]
+
+    def _take_token(self) -> bool:
+        """令牌桶限速"""
+        now = time.monotonic()
+        self._tokens = min(float(self.rate_limit),
+                           self._tokens + (now - self._tokens_at) * self.rate_limit / 60)
+        self._tokens_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _deliver(self, job: EmailJob):
+        recipients = job.recipients or self.admin_emails
         try:
-            subject = f"[威胁告警] {threat_event.type} - {threat_event.level}"
-            self.yag.send(
-                to=self.admin_emails,
-                subject=subject,
-                contents=message
-            )
-            self.logger.info(f"邮件通知已发送至 {', '.join(self.admin_emails)}")
+            self.yag.send(to=recipients, subject=job.subject, contents=job.contents)
+            self.stats['sent'] += 1
+            self.logger.info(f"邮件通知已发送至 {', '.join(recipients)}")
         except Exception as e:
-            self.logger.error(f"发送邮件失败: {str(e)}")
+            job.attempts += 1
+            if job.attempts > self.max_retries:
+                self.stats['failed'] += 1
+                self.logger.error(f"发送邮件失败，已放弃: {str(e)}")
+                return
+            self.stats['retried'] += 1
+            delay = RETRY_BACKOFF * (2 ** (job.attempts - 1))
+            self.logger.warning(f"发送邮件失败，{delay}秒后第{job.attempts}次重试: {str(e)}")
+            heapq.heappush(self._outbox, (time.time() + delay, next(self._seq), job))
+
+    def _next_wait(self, now: float) -> float:
+        """距下一封邮件可以发送的时间：等待重试退避或限速令牌"""
+        if not self._outbox:
+            return 1.0
+        due_in = self._outbox[0][0] - now
+        if due_in <= 0:
+            due_in = (1 - self._tokens) * 60 / self.rate_limit
+        return min(1.0, max(0.01, due_in))
+
+    def _run(self):
+        """后台发送线程"""
+        while True:
+            stopping = self._stopping.is_set()
+            wait = 0.01 if stopping else self._next_wait(time.time())
+            try:
+                self._accept(self._queue.get(timeout=wait), time.time())
+                # 一次取完已到达的邮件
+                while True:
+                    self._accept(self._queue.get_nowait(), time.time())
+            except queue.Empty:
+                pass
+
+            now = time.time()
+            # 停止时暂存的摘要也立即合并进发件箱
+            self._flush_digests(now, force=stopping)
+            while self._outbox and self._outbox[0][0] <= now and self._take_token():
+                _, _, job = heapq.heappop(self._outbox)
+                self._deliver(job)
+
+            if self._queue.empty() and not self._outbox:
+                self._idle.set()
+            # 停止时发送完已到期且有令牌的邮件即退出，不再等待限速和重试
+            if stopping and self._queue.empty():
+                self._drop_pending(len(self._outbox))
+                self._outbox.clear()
+                self._idle.set()
+                break
+
+    def _drop_pending(self, count: int):
+        if count:
+            self.stats['dropped'] += count
+            self.logger.warning(f"通知服务停止，{count}封邮件未发送")
+
+    def flush(self, timeout: float = 30) -> bool:
+        """等待已入队的邮件发送完毕（摘要窗口中暂存的不计）"""
+        if not self._worker:
+            return True
+        return self._idle.wait(timeout)
+
+    def get_stats(self) -> Dict:
+        return dict(
+            self.stats,
+            pending=self._queue.qsize() + len(self._outbox),
+            digest_keys=len(self._digests)
+        )
 
     def _log_console(self, threat_event, message: str):
         """输出控制台日志"""
@@ -107,10 +324,35 @@ class Notifier:
         else:
             self.logger.info(message)
 
+    def close(self, timeout: float = 10):
+        """停止后台线程，尽量发送完已入队的邮件
+
+        摘要窗口中暂存的邮件会立即合并发送；受限速或等待重试而未发出的邮件计入dropped
+        """
+        if self._worker and self._worker.is_alive():
+            self._stopping.set()
+            self._worker.join(timeout)
+        if self._worker and not self._worker.is_alive():
+            # 线程退出后才入队的邮件不会再发送
+            remaining = 0
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                remaining += 1
+            self._drop_pending(remaining)
+        if self.yag:
+            try:
+                self.yag.close()
+            except Exception:
+                pass
+            self.yag = None
+
     def __del__(self):
         """清理资源"""
         if hasattr(self, 'yag') and self.yag:
             try:
                 self.yag.close()
             except:
-                pass 
\ No newline at end of file
+                pass
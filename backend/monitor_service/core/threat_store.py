@@ -0,0 +1,453 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+# 单个段文件的最大字节数与最长跨度（秒），超过后封存并新建段
+SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+SEGMENT_MAX_SECONDS = 3600
+# 每隔多少条事件记录一个稀疏偏移索引
+INDEX_INTERVAL = 256
+# 默认保留策略
+RETENTION_DAYS = 30
+RETENTION_MAX_BYTES = 512 * 1024 * 1024
+
+SEGMENT_PREFIX = 'threats-'
+SEGMENT_SUFFIX = '.jsonl'
+INDEX_SUFFIX = '.idx'
+# 段文件名中序号的位数，定宽保证按文件名排序即按创建顺序
+SEGMENT_SEQ_DIGITS = 15
+
+
+def _event_time(event: Dict) -> float:
+    """事件时间戳转为epoch秒，缺失或无法解析时使用当前时间"""
+    value = event.get('timestamp')
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def _segment_sequence(path: str) -> int:
+    """段文件名中的序号，无法解析时返回-1"""
+    name = os.path.basename(path)
+    try:
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+    except ValueError:
+        return -1
+
+
+def _to_epoch(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class Segment:
+    """一个段文件及其索引
+
+    索引包含事件数、时间范围、按类型/级别的计数，以及稀疏偏移表。
+    偏移表记录的是"截至该偏移之前所有事件的最大时间"，因此即使事件时间
+    略有乱序，按时间定位起点也不会漏读。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.size = 0
+        self.min_ts: Optional[float] = None
+        self.max_ts: Optional[float] = None
+        self.types: Dict[str, int] = {}
+        self.levels: Dict[str, int] = {}
+        # [(此偏移之前事件的最大时间, 偏移)]
+        self.sparse: List[List[float]] = []
+
+    @property
+    def index_path(self) -> str:
+        return self.path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+
+    def add(self, event: Dict, ts: float, offset: int, length: int):
+        if self.count % INDEX_INTERVAL == 0:
+            self.sparse.append([self.max_ts if self.max_ts is not None else ts, offset])
+        self.count += 1
+        self.size = offset + length
+        self.min_ts = ts if self.min_ts is None else min(self.min_ts, ts)
+        self.max_ts = ts if self.max_ts is None else max(self.max_ts, ts)
+        event_type = event.get('type', 'unknown')
+        level = event.get('level', 'unknown')
+        self.types[event_type] = self.types.get(event_type, 0) + 1
+        self.levels[level] = self.levels.get(level, 0) + 1
+
+    def start_offset(self, start: Optional[float]) -> int:
+        """时间不早于start的事件不会出现在返回偏移之前"""
+        if start is None or not self.sparse:
+            return 0
+        keys = [entry[0] for entry in self.sparse]
+        i = bisect_left(keys, start) - 1
+        return int(self.sparse[i][1]) if i >= 0 else 0
+
+    def overlaps(self, start: Optional[float], end: Optional[float]) -> bool:
+        if self.count == 0:
+            return False
+        if start is not None and self.max_ts < start:
+            return False
+        if end is not None and self.min_ts > end:
+            return False
+        return True
+
+    def rebuild(self, repair: bool = False):
+        """扫描段文件重建索引；repair时截掉崩溃留下的半行"""
+        self._reset()
+        valid_end = 0
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                length = len(line)
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break
+                self.add(event, _event_time(event), offset, length)
+                offset += length
+                valid_end = offset
+        if repair and os.path.getsize(self.path) > valid_end:
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_end)
+                f.flush()
+                os.fsync(f.fileno())
+        self.size = valid_end
+
+    def save_index(self):
+        """写入索引文件（先写临时文件再原子替换）"""
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'count': self.count,
+                'size': self.size,
+                'min_ts': self.min_ts,
+                'max_ts': self.max_ts,
+                'types': self.types,
+                'levels': self.levels,
+                'sparse': self.sparse
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    def load_index(self) -> bool:
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            if data['size'] != os.path.getsize(self.path):
+                return False
+            self.count = data['count']
+            self.size = data['size']
+            self.min_ts = data['min_ts']
+            self.max_ts = data['max_ts']
+            self.types = data['types']
+            self.levels = data['levels']
+            self.sparse = data['sparse']
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def read(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Dict]:
+        """按时间范围读取段内事件"""
+        with open(self.path, 'rb') as f:
+            f.seek(self.start_offset(start))
+            remaining = self.size - f.tell()
+            for line in f:
+                remaining -= len(line)
+                if remaining < 0:
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                ts = _event_time(event)
+                if start is not None and ts < start:
+                    continue
+                if end is not None and ts > end:
+                    continue
+                yield event
+
+
+class ThreatEventStore:
+    """只追加、分段存储的威胁事件库
+
+    - 每条事件一行JSON追加写入当前段，写入后flush并fsync，不再整文件重写
+    - 段按大小或时间跨度滚动，封存时持久化索引；启动时修复末尾半行并重建活动段索引
+    - 每段维护时间范围、类型/级别计数和稀疏偏移表，范围查询只读取相关段的相关部分
+    - 按保留天数和总大小删除最旧的段；段封存时执行一次，长时间不滚动时需由调用方
+      定期调用 enforce_retention
+    - 段文件名使用单调递增的序号，与事件时间无关，乱序或补录的旧事件不会打乱段的顺序
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = SEGMENT_MAX_BYTES,
+        segment_max_seconds: int = SEGMENT_MAX_SECONDS,
+        retention_days: float = RETENTION_DAYS,
+        retention_max_bytes: int = RETENTION_MAX_BYTES,
+        fsync: bool = True,
+        read_only: bool = False
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.retention_days = retention_days
+        self.retention_max_bytes = retention_max_bytes
+        self.fsync = fsync
+        # 只读模式用于其他进程查看：不修复、不写索引，避免与写入进程冲突
+        self.read_only = read_only
+        self.segments: List[Segment] = []
+        self._active_file = None
+        self._active_started = 0.0
+        self._next_sequence = 0
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    def _segment_files(self) -> List[str]:
+        names = [
+            name for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        ]
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def _open(self):
+        files = self._segment_files()
+        self._next_sequence = max((_segment_sequence(path) for path in files), default=-1) + 1
+        for i, path in enumerate(files):
+            segment = Segment(path)
+            is_active = i == len(files) - 1
+            if is_active or not segment.load_index():
+                segment.rebuild(repair=is_active and not self.read_only)
+                if not is_active and not self.read_only:
+                    segment.save_index()
+            self.segments.append(segment)
+        if self.segments and not self.read_only:
+            active = self.segments[-1]
+            self._active_started = active.min_ts if active.min_ts is not None else time.time()
+            self._active_file = open(active.path, 'ab')
+        if not self.read_only:
+            self._apply_retention()
+
+    def _new_segment(self, ts: float):
+        if self._active_file:
+            self._seal_active()
+        while True:
+            name = f"{SEGMENT_PREFIX}{self._next_sequence:0{SEGMENT_SEQ_DIGITS}d}{SEGMENT_SUFFIX}"
+            path = os.path.join(self.directory, name)
+            self._next_sequence += 1
+            if not os.path.exists(path):
+                break
+        self._active_file = open(path, 'ab')
+        self._active_started = ts
+        self.segments.append(Segment(path))
+
+    def _seal_active(self):
+        self._active_file.flush()
+        os.fsync(self._active_file.fileno())
+        self._active_file.close()
+        self._active_file = None
+        self.segments[-1].save_index()
+        self._apply_retention()
+
+    def _should_roll(self, ts: float) -> bool:
+        if self._active_file is None:
+            return True
+        active = self.segments[-1]
+        return (active.size >= self.segment_max_bytes or
+                (active.count and ts - self._active_started >= self.segment_max_seconds))
+
+    def append(self, event: Dict):
+        """追加一条威胁事件"""
+        self.append_many([event])
+
+    def append_many(self, events: List[Dict]):
+        """批量追加威胁事件，一次写入、一次fsync"""
+        if not events:
+            return
+        if self.read_only:
+            raise RuntimeError("Threat store is opened read-only")
+        with self._lock:
+            for event in events:
+                ts = _event_time(event)
+                if self._should_roll(ts):
+                    self._new_segment(ts)
+                line = (json.dumps(event, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+                segment = self.segments[-1]
+                offset = segment.size
+                self._active_file.write(line)
+                segment.add(event, ts, offset, len(line))
+            self._active_file.flush()
+            if self.fsync:
+                os.fsync(self._active_file.fileno())
+
+    def _apply_retention(self):
+        """删除超过保留期或超出总大小限制的已封存段"""
+        cutoff = time.time() - self.retention_days * 86400 if self.retention_days else None
+        total = sum(segment.size for segment in self.segments)
+        # 活动段永远保留
+        while len(self.segments) > 1:
+            oldest = self.segments[0]
+            expired = cutoff is not None and (oldest.max_ts is None or oldest.max_ts < cutoff)
+            oversize = self.retention_max_bytes and total > self.retention_max_bytes
+            if not (expired or oversize):
+                break
+            for path in (oldest.path, oldest.index_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= oldest.size
+            self.segments.pop(0)
+            self.logger.info(f"Threat segment removed by retention: {os.path.basename(oldest.path)}")
+
+    def enforce_retention(self):
+        """立即执行保留策略，由服务定期调用"""
+        with self._lock:
+            self._apply_retention()
+
+    def _candidate_segments(self, start, end, types, levels) -> List[Segment]:
+        with self._lock:
+            segments = list(self.segments)
+        result = []
+        for segment in segments:
+            if not segment.overlaps(start, end):
+                continue
+            if types and not any(t in segment.types for t in types):
+                continue
+            if levels and not any(level in segment.levels for level in levels):
+                continue
+            result.append(segment)
+        return result
+
+    def query(
+        self,
+        start=None,
+        end=None,
+        types: Optional[List[str]] = None,
+        levels: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[Dict]:
+        """按时间范围、类型、级别查询事件
+
+        Args:
+            start/end: datetime、ISO字符串或epoch秒，为None表示不限
+            types: 威胁类型过滤
+            levels: 威胁级别过滤
+            limit: 最多返回条数
+            newest_first: 为True时从最新的事件开始返回
+        """
+        start, end = _to_epoch(start), _to_epoch(end)
+        types = set(types) if types else None
+        levels = set(level.lower() for level in levels) if levels else None
+        segments = self._candidate_segments(start, end, types, levels)
+        if newest_first:
+            segments.reverse()
+
+        results: List[Dict] = []
+        for segment in segments:
+            matched = [
+                event for event in segment.read(start, end)
+                if (types is None or event.get('type') in types) and
+                   (levels is None or str(event.get('level', '')).lower() in levels)
+            ]
+            if newest_first:
+                matched.reverse()
+            results.extend(matched)
+            if limit is not None and len(results) >= limit:
+                return results[:limit]
+        return results
+
+    def summarize(self, start=None, end=None, recent_high: int = 5) -> Dict:
+        """统计时间窗口内的威胁
+
+        完全落在窗口内的段直接使用索引中的计数，只有跨越窗口边界的段需要读取。
+        """
+        start_ts, end_ts = _to_epoch(start), _to_epoch(end)
+        level_counts = {'high': 0, 'medium': 0, 'low': 0, 'warning': 0}
+        type_counts: Dict[str, int] = {}
+        total = 0
+        for segment in self._candidate_segments(start_ts, end_ts, None, None):
+            inside = ((start_ts is None or segment.min_ts >= start_ts) and
+                      (end_ts is None or segment.max_ts <= end_ts))
+            if inside:
+                total += segment.count
+                for level, count in segment.levels.items():
+                    level_counts[level] = level_counts.get(level, 0) + count
+                for event_type, count in segment.types.items():
+                    type_counts[event_type] = type_counts.get(event_type, 0) + count
+                continue
+            for event in segment.read(start_ts, end_ts):
+                total += 1
+                level = event.get('level', 'unknown')
+                event_type = event.get('type', 'unknown')
+                level_counts[level] = level_counts.get(level, 0) + 1
+                type_counts[event_type] = type_counts.get(event_type, 0) + 1
+
+        return {
+            'total_alerts': total,
+            'alerts_by_level': level_counts,
+            'alerts_by_type': type_counts,
+            'recent_high_threats': self.query(
+                start_ts, end_ts, levels=['high'], limit=recent_high, newest_first=True
+            ),
+            'window_start': datetime.fromtimestamp(start_ts).isoformat() if start_ts else None,
+            'window_end': datetime.fromtimestamp(end_ts).isoformat() if end_ts else None,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def import_legacy_json(self, path: str) -> int:
+        """导入旧版threats.json，导入后重命名为 .migrated"""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, 'r') as f:
+                events = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Failed to load legacy threats file: {str(e)}")
+            return 0
+        events.sort(key=_event_time)
+        self.append_many(events)
+        os.replace(path, path + '.migrated')
+        self.logger.info(f"Imported {len(events)} threats from {path}")
+        return len(events)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'segments': len(self.segments),
+                'events': sum(segment.count for segment in self.segments),
+                'bytes': sum(segment.size for segment in self.segments),
+                'oldest': datetime.fromtimestamp(self.segments[0].min_ts).isoformat()
+                if self.segments and self.segments[0].min_ts else None
+            }
+
+    def close(self):
+        with self._lock:
+            if self._active_file:
+                self._active_file.flush()
+                os.fsync(self._active_file.fileno())
+                self._active_file.close()
+                self._active_file = None
@@ -1,8 +1,11 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.orm import sessionmaker
 from core.config import settings
 from routes import monitor
 from database import Base, engine
+from services.alert_dispatcher import alert_dispatcher
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
@@ -25,6 +28,17 @@ app.add_middleware(
 # 注册路由
 app.include_router(monitor.router, prefix="/api")
 
+@app.on_event("startup")
+async def startup_event():
+    # 启动时绑定预警分发器的数据库会话，提交后仍需读取预警内容发送通知
+    alert_dispatcher.configure(sessionmaker(bind=engine, expire_on_commit=False))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # 写完队列中的预警并发出待发通知后再退出
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, alert_dispatcher.close)
+
 @app.get("/")
 async def root():
     return {
@@ -1,21 +1,32 @@
 import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, List
 import json
 import os
 
 from .collector.network_collector import NetworkCollector
 from .analyzer.threat_analyzer import ThreatAnalyzer
+from .core.threat_store import ThreatEventStore
 
 class MonitorService:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self._setup_logging()
         self.network_collector = NetworkCollector()
-        self.threat_analyzer = ThreatAnalyzer()
+        self.threat_analyzer = ThreatAnalyzer(self.network_collector.host_ip)
+        # 抓包线程中的每个数据包直接送入流式检测器
+        self.network_collector.packet_observer = self.threat_analyzer.observe_packet
         self.is_running = False
         self.monitoring_interval = 30  # 监控间隔（秒）
+        self.summary_window_hours = 24  # 威胁摘要统计窗口（小时）
+        self.retention_interval = 3600  # 威胁事件保留策略执行间隔（秒）
+        self._retention_task = None
+        
+        # 威胁事件存储，首次启动时导入旧版threats.json
+        data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.threat_store = ThreatEventStore(os.path.join(data_dir, 'threats'))
+        self.threat_store.import_legacy_json(os.path.join(data_dir, 'threats.json'))
         
     def _setup_logging(self):
         """设置日志记录"""
@@ -60,6 +71,9 @@ class MonitorService:
             # 启动数据包捕获
             asyncio.create_task(self._start_packet_capture())
             
+            # 定期执行保留策略；段只在滚动时封存，写入量小时不能只依赖封存触发
+            self._retention_task = asyncio.create_task(self._retention_loop())
+            
             # 主监控循环
             while self.is_running:
                 try:
@@ -74,7 +88,7 @@ class MonitorService:
                         await self._handle_threats(threats)
                     
                     # 获取并保存威胁摘要
-                    summary = self.threat_analyzer.get_threat_summary()
+                    summary = await self.get_threat_summary(self.summary_window_hours)
                     await self._save_threat_summary(summary)
                     
                     # 等待下一个监控周期
@@ -93,6 +107,10 @@ class MonitorService:
         try:
             self.logger.info("Stopping monitor service...")
             self.is_running = False
+            if self._retention_task:
+                self._retention_task.cancel()
+                self._retention_task = None
+            self.threat_store.close()
         except Exception as e:
             self.logger.error(f"Failed to stop monitor service: {str(e)}")
             raise
@@ -106,16 +124,26 @@ class MonitorService:
         except Exception as e:
             self.logger.error(f"Failed to start packet capture: {str(e)}")
 
+    async def _retention_loop(self):
+        """定期删除超过保留期或超出总大小限制的威胁事件段"""
+        loop = asyncio.get_event_loop()
+        while self.is_running:
+            try:
+                await loop.run_in_executor(None, self.threat_store.enforce_retention)
+            except Exception as e:
+                self.logger.error(f"Failed to enforce threat retention: {str(e)}")
+            await asyncio.sleep(self.retention_interval)
+
     async def _handle_threats(self, threats: List[Dict]):
         """处理检测到的威胁"""
         try:
+            # 本轮检测到的威胁一次写入
+            await self._save_threats(threats)
+            
             for threat in threats:
                 # 记录威胁
                 self.logger.warning(f"Threat detected: {json.dumps(threat, indent=2)}")
                 
-                # 保存威胁记录
-                await self._save_threat(threat)
-                
                 # 根据威胁级别采取相应措施
                 if threat['level'] == 'high':
                     await self._handle_high_threat(threat)
@@ -128,36 +156,31 @@ class MonitorService:
 
     async def _save_threat(self, threat: Dict):
         """保存威胁记录"""
+        await self._save_threats([threat])
+
+    async def _save_threats(self, threats: List[Dict]):
+        """批量追加威胁记录到事件存储"""
         try:
-            # 确保目录存在
-            data_dir = os.path.join(os.path.dirname(__file__), 'data')
-            os.makedirs(data_dir, exist_ok=True)
-            
-            # 保存到文件
-            threats_file = os.path.join(data_dir, 'threats.json')
-            
-            # 读取现有威胁
-            threats = []
-            if os.path.exists(threats_file):
-                try:
-                    with open(threats_file, 'r') as f:
-                        threats = json.load(f)
-                except json.JSONDecodeError:
-                    self.logger.warning("Failed to load existing threats file")
-            
-            # 添加新威胁
-            threats.append(threat)
-            
-            # 只保留最近1000条记录
-            if len(threats) > 1000:
-                threats = threats[-1000:]
-            
-            # 保存更新后的威胁列表
-            with open(threats_file, 'w') as f:
-                json.dump(threats, f, indent=2)
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.threat_store.append_many, threats)
         except Exception as e:
             self.logger.error(f"Failed to save threat: {str(e)}")
 
+    async def get_threat_summary(self, hours: float = 24) -> Dict:
+        """统计最近一段时间的威胁摘要"""
+        try:
+            loop = asyncio.get_event_loop()
+            summary = await loop.run_in_executor(
+                None,
+                self.threat_store.summarize,
+                datetime.now() - timedelta(hours=hours)
+            )
+            summary['known_malicious_ips'] = len(self.threat_analyzer.known_malicious_ips)
+            return summary
+        except Exception as e:
+            self.logger.error(f"Failed to get threat summary: {str(e)}")
+            return {}
+
     async def _save_threat_summary(self, summary: Dict):
         """保存威胁摘要"""
         try:
@@ -214,6 +237,7 @@ class MonitorService:
             return {
                 'is_running': self.is_running,
                 'monitoring_interval': self.monitoring_interval,
+                'threat_store': self.threat_store.get_stats(),
                 'last_update': datetime.now().isoformat()
             }
         except Exception as e:
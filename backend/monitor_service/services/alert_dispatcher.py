@@ -0,0 +1,232 @@
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from ..models.alert_rules import AlertRule
+from ..models.monitor import MonitorAlert, AlertStatus
+from ..core.notification import send_notification
+from ..core.notifier import Notifier
+from ..config.notification import SMTP_CONFIG
+
+# 每批最多写入的预警数，以及凑批的最长等待时间（秒）
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+# 待处理预警队列容量，队列满时丢弃新预警而不是阻塞评估
+QUEUE_SIZE = 20000
+
+
+class PendingAlert:
+    """评估器产生、尚未落库的预警"""
+
+    __slots__ = ('rule_id', 'user_id', 'level', 'title', 'content', 'notify_methods', 'triggered_at')
+
+    def __init__(self, rule_id: int, user_id: int, level, title: str, content: str,
+                 notify_methods: List[str], triggered_at: datetime):
+        self.rule_id = rule_id
+        self.user_id = user_id
+        self.level = level
+        self.title = title
+        self.content = content
+        self.notify_methods = notify_methods
+        self.triggered_at = triggered_at
+
+
+class AlertDispatcher:
+    """异步预警分发
+
+    评估器只把预警放入队列即返回；后台线程按批处理：
+    - 同一批中同一规则的多次触发合并为一条预警，内容注明重复次数
+    - 一个事务内写入整批预警并批量更新规则的最后触发时间
+    - 邮件交给 Notifier 的发送队列（合并摘要、重试、限速），其他通知方式在后台线程中发送
+
+    服务启动时调用 configure 绑定数据库，关闭时调用 close；
+    configure之前提交的预警留在队列中，配置后再写入
+    """
+
+    def __init__(
+        self,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        queue_size: int = QUEUE_SIZE,
+        notifier: Optional[Notifier] = None
+    ):
+        self.logger = logging.getLogger(__name__)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.session_factory: Optional[Callable] = None
+        self._configured = threading.Event()
+        self._notifier = notifier
+        self._queue: "queue.Queue[PendingAlert]" = queue.Queue(maxsize=queue_size)
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.stats = {
+            'submitted': 0,
+            'dropped': 0,
+            'persisted': 0,
+            'coalesced': 0,
+            'batches': 0,
+            'failed_batches': 0
+        }
+
+    @property
+    def notifier(self) -> Notifier:
+        if self._notifier is None:
+            self._notifier = Notifier(SMTP_CONFIG)
+        return self._notifier
+
+    def configure(self, session_factory: Callable):
+        """设置后台线程使用的数据库会话工厂
+
+        会话需设置 expire_on_commit=False，提交后仍要读取预警内容发送通知
+        """
+        self.session_factory = session_factory
+        self._configured.set()
+
+    def submit(self, alert: PendingAlert) -> bool:
+        """提交预警，不阻塞调用方"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(alert)
+            self.stats['submitted'] += 1
+            return True
+        except queue.Full:
+            self.stats['dropped'] += 1
+            self.logger.error(f"预警队列已满，丢弃预警: {alert.title}")
+            return False
+
+    def _ensure_worker(self):
+        if self._worker and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._stopping.clear()
+            self._worker = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+            self._worker.start()
+
+    def _next_batch(self) -> List[PendingAlert]:
+        """阻塞等待第一条预警，然后在flush_interval内凑满一批"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                remaining = 0
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _coalesce(self, batch: List[PendingAlert]) -> List[Dict[str, Any]]:
+        """同一规则的重复触发合并为一条"""
+        grouped: Dict[int, Dict[str, Any]] = {}
+        for alert in batch:
+            entry = grouped.get(alert.rule_id)
+            if entry is None:
+                grouped[alert.rule_id] = {'alert': alert, 'count': 1, 'first': alert.triggered_at}
+            else:
+                entry['alert'] = alert
+                entry['count'] += 1
+                self.stats['coalesced'] += 1
+        return list(grouped.values())
+
+    def _persist(self, entries: List[Dict[str, Any]]) -> List[MonitorAlert]:
+        """一个事务内写入整批预警"""
+        session = self.session_factory()
+        try:
+            rows = []
+            for entry in entries:
+                alert = entry['alert']
+                content = alert.content
+                if entry['count'] > 1:
+                    content += (f"\n\n{entry['first'].strftime('%Y-%m-%d %H:%M:%S')} 起"
+                                f"共触发 {entry['count']} 次，以上为最近一次")
+                rows.append(MonitorAlert(
+                    user_id=alert.user_id,
+                    rule_id=alert.rule_id,
+                    level=alert.level,
+                    title=alert.title,
+                    content=content,
+                    status=AlertStatus.NEW
+                ))
+            session.add_all(rows)
+
+            # 按触发时间批量更新规则的最后触发时间
+            latest: Dict[datetime, List[int]] = {}
+            for entry in entries:
+                latest.setdefault(entry['alert'].triggered_at, []).append(entry['alert'].rule_id)
+            for triggered_at, rule_ids in latest.items():
+                session.query(AlertRule).filter(AlertRule.id.in_(rule_ids)).update(
+                    {"last_triggered": triggered_at}, synchronize_session=False
+                )
+
+            session.commit()
+            return rows
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _notify(self, entries: List[Dict[str, Any]], rows: List[MonitorAlert]):
+        for entry, row in zip(entries, rows):
+            alert = entry['alert']
+            for method in alert.notify_methods:
+                try:
+                    if method == "email":
+                        self.notifier.enqueue_email(
+                            f"[{row.level}] {row.title}",
+                            row.content,
+                            key=f"rule:{alert.rule_id}"
+                        )
+                    else:
+                        send_notification(method, row)
+                except Exception as e:
+                    self.logger.error(f"Failed to send notification via {method}: {str(e)}")
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            if not self._configured.wait(self.flush_interval):
+                if self._stopping.is_set():
+                    # 直到关闭都没有配置数据库会话，剩余预警无法落库
+                    pending = self._queue.qsize()
+                    self.stats['dropped'] += pending
+                    self.logger.error(f"预警分发器未配置数据库会话，丢弃 {pending} 条预警")
+                    return
+                continue
+            batch = self._next_batch()
+            if not batch:
+                continue
+            entries = self._coalesce(batch)
+            try:
+                rows = self._persist(entries)
+            except Exception as e:
+                self.stats['failed_batches'] += 1
+                self.logger.error(f"批量写入预警失败: {str(e)}")
+                continue
+            self.stats['batches'] += 1
+            self.stats['persisted'] += len(rows)
+            self._notify(entries, rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, pending=self._queue.qsize())
+
+    def close(self, timeout: float = 10):
+        """处理完队列中的预警后停止"""
+        if self._worker and self._worker.is_alive():
+            self._stopping.set()
+            self._worker.join(timeout)
+        if self._notifier:
+            self._notifier.close(timeout)
+
+
+# 创建预警分发器实例
+alert_dispatcher = AlertDispatcher()
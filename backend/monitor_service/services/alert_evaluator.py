@@ -1,75 +1,201 @@
-from datetime import datetime, timedelta
+import operator
+import threading
+import time
+from datetime import datetime
 from sqlalchemy.orm import Session
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from ..models.alert_rules import AlertRule, MetricType
-from ..models.monitor import MonitorAlert, AlertLevel, AlertStatus
-from . import alert_rules
-from ..core.notification import send_notification
+from ..models.monitor import AlertLevel
+from .alert_dispatcher import AlertDispatcher, PendingAlert, alert_dispatcher
+
+# 规则索引的最长有效期（秒），用于发现其他进程对规则的修改
+RULE_INDEX_MAX_AGE = 60
+# 预警恢复的回差：指标需要越过阈值的该比例才算恢复，避免在阈值附近反复触发
+HYSTERESIS_RATIO = 0.05
+
+_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne
+}
+
+
+def _enum_value(value):
+    return getattr(value, 'value', value)
+
+
+class CompiledRule:
+    """编译后的预警规则：比较函数、阈值和持续时间都已解析好"""
+
+    __slots__ = (
+        'id', 'user_id', 'name', 'metric_type', 'operator', 'threshold',
+        'duration', 'cooldown', 'notify_methods', 'compare', 'clear_threshold'
+    )
+
+    def __init__(self, rule):
+        self.id = rule.id
+        self.user_id = rule.user_id
+        self.name = rule.name
+        self.metric_type = rule.metric_type
+        self.operator = rule.operator
+        self.threshold = rule.threshold
+        self.duration = rule.duration or 0
+        self.cooldown = rule.cooldown or 0
+        self.notify_methods = rule.notify_methods or []
+        self.compare = _OPERATORS.get(_enum_value(rule.operator))
+        # 恢复阈值：大于类规则需降到阈值以下一定幅度，小于类规则需升到阈值以上一定幅度
+        margin = abs(rule.threshold) * HYSTERESIS_RATIO
+        op = _enum_value(rule.operator)
+        if op in (">", ">="):
+            self.clear_threshold = rule.threshold - margin
+        elif op in ("<", "<="):
+            self.clear_threshold = rule.threshold + margin
+        else:
+            self.clear_threshold = None
+
+    def is_cleared(self, value: float) -> bool:
+        """已触发的规则是否恢复正常"""
+        if self.clear_threshold is None:
+            return not self.compare(value, self.threshold)
+        op = _enum_value(self.operator)
+        if op in (">", ">="):
+            return value < self.clear_threshold
+        return value > self.clear_threshold
+
+
+class RuleState:
+    """规则在内存中的评估状态"""
+
+    __slots__ = ('breach_since', 'firing', 'last_triggered')
+
+    def __init__(self, last_triggered: Optional[float] = None):
+        self.breach_since: Optional[float] = None
+        self.firing = False
+        self.last_triggered = last_triggered
+
+
+class RuleIndex:
+    """启用规则的内存索引：指标类型 -> 用户ID -> 规则列表
+
+    规则增删改时调用 invalidate 重建；评估一个指标只需字典查找和比较。
+    持续时间、回差和冷却状态按规则ID保存在内存中，重建索引时保留。
+    """
+
+    def __init__(self, max_age: int = RULE_INDEX_MAX_AGE):
+        self.max_age = max_age
+        self.by_metric: Dict[str, Dict[int, List[CompiledRule]]] = {}
+        self.states: Dict[int, RuleState] = {}
+        self.loaded_at = 0.0
+        self._lock = threading.RLock()
+
+    def ensure_loaded(self, db: Session):
+        if self.loaded_at and time.time() - self.loaded_at < self.max_age:
+            return
+        with self._lock:
+            if self.loaded_at and time.time() - self.loaded_at < self.max_age:
+                return
+            self.load_rules(db.query(AlertRule).filter(AlertRule.enabled == True).all())
+
+    def load_rules(self, rules):
+        """用一组规则重建索引"""
+        by_metric: Dict[str, Dict[int, List[CompiledRule]]] = {}
+        states: Dict[int, RuleState] = {}
+        for rule in rules:
+            if not rule.enabled:
+                continue
+            compiled = CompiledRule(rule)
+            if compiled.compare is None:
+                continue
+            by_metric.setdefault(_enum_value(rule.metric_type), {}) \
+                .setdefault(rule.user_id, []).append(compiled)
+            state = self.states.get(rule.id)
+            if state is None:
+                last = rule.last_triggered
+                state = RuleState(
+                    (last - datetime(1970, 1, 1)).total_seconds() if last else None
+                )
+            states[rule.id] = state
+        with self._lock:
+            self.by_metric = by_metric
+            self.states = states
+            self.loaded_at = time.time()
+
+    def invalidate(self):
+        """规则变更后调用，下次评估时重新加载"""
+        self.loaded_at = 0.0
+
+    def rules_for(self, metric_type: str, user_id: Optional[int] = None) -> List[CompiledRule]:
+        users = self.by_metric.get(_enum_value(metric_type))
+        if not users:
+            return []
+        if user_id is None:
+            return [rule for rules in users.values() for rule in rules]
+        return users.get(user_id, [])
+
+    def evaluate(self, metric_type: str, value: float, user_id: Optional[int] = None,
+                 now: Optional[float] = None) -> List[CompiledRule]:
+        """评估一个指标样本，返回需要触发预警的规则"""
+        rules = self.rules_for(metric_type, user_id)
+        if not rules:
+            return []
+        now = time.time() if now is None else now
+        triggered = []
+        for rule in rules:
+            state = self.states[rule.id]
+            if state.firing:
+                # 已触发：越过回差后才恢复，恢复后才能再次触发
+                if rule.is_cleared(value):
+                    state.firing = False
+                    state.breach_since = None
+                continue
+            if not rule.compare(value, rule.threshold):
+                state.breach_since = None
+                continue
+            if state.breach_since is None:
+                state.breach_since = now
+            # 持续时间未满足
+            if now - state.breach_since < rule.duration:
+                continue
+            # 冷却时间内
+            if state.last_triggered is not None and now - state.last_triggered < rule.cooldown:
+                continue
+            state.firing = True
+            state.last_triggered = now
+            triggered.append(rule)
+        return triggered
+
+
+# 创建规则索引实例
+rule_index = RuleIndex()
+
 
 class AlertEvaluator:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, index: RuleIndex = rule_index,
+                 dispatcher: AlertDispatcher = alert_dispatcher):
         self.db = db
-        self.metric_cache: Dict[str, List[Dict[str, Any]]] = {}
+        self.index = index
+        self.dispatcher = dispatcher
         
     def evaluate_metric(self, metric_type: str, value: float, user_id: int, context: Dict[str, Any] = None):
         """评估单个指标是否触发预警"""
-        # 获取该指标类型的所有活动规则
-        rules = alert_rules.get_user_rules_by_metric(self.db, user_id, metric_type)
-        
-        for rule in rules:
-            if not rule.enabled:
-                continue
-                
-            # 检查冷却时间
-            if rule.last_triggered:
-                cooldown_end = rule.last_triggered + timedelta(seconds=rule.cooldown)
-                if datetime.utcnow() < cooldown_end:
-                    continue
-            
-            # 评估规则
-            if self._evaluate_rule(rule, value):
-                self._trigger_alert(rule, value, context)
-    
-    def _evaluate_rule(self, rule: AlertRule, value: float) -> bool:
-        """评估单个规则"""
-        if rule.operator == ">":
-            return value > rule.threshold
-        elif rule.operator == ">=":
-            return value >= rule.threshold
-        elif rule.operator == "<":
-            return value < rule.threshold
-        elif rule.operator == "<=":
-            return value <= rule.threshold
-        elif rule.operator == "==":
-            return value == rule.threshold
-        elif rule.operator == "!=":
-            return value != rule.threshold
-        return False
+        self.index.ensure_loaded(self.db)
+        for rule in self.index.evaluate(metric_type, value, user_id):
+            self._trigger_alert(rule, value, context)
     
-    def _trigger_alert(self, rule: AlertRule, value: float, context: Dict[str, Any] = None):
-        """触发预警"""
-        # 更新规则的最后触发时间
-        alert_rules.update_rule_last_triggered(self.db, rule.id)
-        
-        # 创建预警记录
-        alert = MonitorAlert(
-            user_id=rule.user_id,
+    def _trigger_alert(self, rule: CompiledRule, value: float, context: Dict[str, Any] = None):
+        """触发预警：放入分发队列，落库和通知在后台批量完成"""
+        self.dispatcher.submit(PendingAlert(
             rule_id=rule.id,
+            user_id=rule.user_id,
             level=self._determine_alert_level(rule.metric_type, value),
             title=f"{rule.name} 触发预警",
             content=self._generate_alert_content(rule, value, context),
-            status=AlertStatus.NEW
-        )
-        
-        self.db.add(alert)
-        self.db.commit()
-        
-        # 发送通知
-        for method in rule.notify_methods:
-            try:
-                send_notification(method, alert)
-            except Exception as e:
-                print(f"Failed to send notification via {method}: {str(e)}")
+            notify_methods=rule.notify_methods,
+            triggered_at=datetime.utcnow()
+        ))
     
     def _determine_alert_level(self, metric_type: MetricType, value: float) -> AlertLevel:
         """确定预警级别"""
@@ -99,7 +225,7 @@ class AlertEvaluator:
             return AlertLevel.INFO
         return AlertLevel.INFO
     
-    def _generate_alert_content(self, rule: AlertRule, value: float, context: Dict[str, Any] = None) -> str:
+    def _generate_alert_content(self, rule: CompiledRule, value: float, context: Dict[str, Any] = None) -> str:
         """生成预警内容"""
         content = f"监控指标 {rule.metric_type} 当前值为 {value}，"
         content += f"触发条件：{rule.metric_type} {rule.operator} {rule.threshold}"
@@ -5,6 +5,11 @@ from datetime import datetime
 from ..models.alert_rules import AlertRule
 from ..schemas.alert_rules import AlertRuleCreate, AlertRuleUpdate
 
+def _invalidate_rule_index():
+    """规则变更后让评估器重建内存索引"""
+    from .alert_evaluator import rule_index
+    rule_index.invalidate()
+
 def create_alert_rule(db: Session, user_id: int, rule: AlertRuleCreate) -> AlertRule:
     """创建预警规则"""
     db_rule = AlertRule(
@@ -14,6 +19,7 @@ def create_alert_rule(db: Session, user_id: int, rule: AlertRuleCreate) -> Alert
     db.add(db_rule)
     db.commit()
     db.refresh(db_rule)
+    _invalidate_rule_index()
     return db_rule
 
 def get_alert_rule(db: Session, rule_id: int) -> Optional[AlertRule]:
@@ -62,6 +68,7 @@ def update_alert_rule(
     db_rule.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_rule)
+    _invalidate_rule_index()
     return db_rule
 
 def delete_alert_rule(db: Session, rule_id: int, user_id: int) -> bool:
@@ -71,6 +78,7 @@ def delete_alert_rule(db: Session, rule_id: int, user_id: int) -> bool:
         AlertRule.user_id == user_id
     ).delete()
     db.commit()
+    _invalidate_rule_index()
     return result > 0
 
 def update_rule_last_triggered(db: Session, rule_id: int) -> None:
@@ -1,7 +1,7 @@
 import os
 import json
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 import click
 from typing import Dict, List
 import pandas as pd
@@ -9,6 +9,13 @@ from tabulate import tabulate
 import colorama
 from colorama import Fore, Style
 
+try:
+    from ..core.threat_store import ThreatEventStore
+except ImportError:
+    # 作为脚本直接运行时
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from core.threat_store import ThreatEventStore
+
 # 初始化colorama
 colorama.init()
 
@@ -16,39 +23,53 @@ class ThreatSummaryViewer:
     def __init__(self):
         self.data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
         self.summary_file = os.path.join(self.data_dir, 'threat_summary.json')
-        self.threats_file = os.path.join(self.data_dir, 'threats.json')
+        self.threat_store = ThreatEventStore(os.path.join(self.data_dir, 'threats'), read_only=True)
+
+    @staticmethod
+    def _window_start(hours: float = None):
+        return datetime.now() - timedelta(hours=hours) if hours else None
 
-    def load_summary(self) -> Dict:
-        """加载威胁摘要"""
+    def load_summary(self, hours: float = 24) -> Dict:
+        """加载威胁摘要
+
+        按时间窗口从威胁事件存储统计，已知恶意IP数取自服务保存的摘要文件
+        """
         try:
+            summary = self.threat_store.summarize(self._window_start(hours))
             if os.path.exists(self.summary_file):
                 with open(self.summary_file, 'r') as f:
-                    return json.load(f)
-            return {}
+                    saved = json.load(f)
+                summary['known_malicious_ips'] = saved.get('known_malicious_ips', 0)
+            return summary
         except Exception as e:
             print(f"Error loading summary: {str(e)}")
             return {}
 
-    def load_threats(self) -> List[Dict]:
-        """加载威胁记录"""
+    def load_threats(self, hours: float = None, level: str = None, limit: int = None) -> List[Dict]:
+        """加载时间窗口内的威胁记录，按时间先后排列"""
         try:
-            if os.path.exists(self.threats_file):
-                with open(self.threats_file, 'r') as f:
-                    return json.load(f)
-            return []
+            threats = self.threat_store.query(
+                self._window_start(hours),
+                levels=[level] if level else None,
+                limit=limit,
+                newest_first=True
+            )
+            threats.reverse()
+            return threats
         except Exception as e:
             print(f"Error loading threats: {str(e)}")
             return []
 
-    def display_summary(self):
+    def display_summary(self, hours: float = 24):
         """显示威胁摘要"""
-        summary = self.load_summary()
-        if not summary:
+        summary = self.load_summary(hours)
+        if not summary or not summary.get('total_alerts'):
             print(f"{Fore.YELLOW}No threat summary available{Style.RESET_ALL}")
             return
 
         print(f"\n{Fore.CYAN}=== Threat Summary ==={Style.RESET_ALL}")
         print(f"Last updated: {summary.get('timestamp', 'Unknown')}")
+        print(f"Window: {summary.get('window_start') or 'all'} - now")
         print(f"Total alerts: {summary.get('total_alerts', 0)}")
         print(f"Known malicious IPs: {summary.get('known_malicious_ips', 0)}")
 
@@ -87,20 +108,13 @@ class ThreatSummaryViewer:
                          headers=['Timestamp', 'Type', 'Description', 'Source IP'],
                          tablefmt='grid'))
 
-    def display_threats(self, level: str = None, limit: int = 10):
+    def display_threats(self, level: str = None, limit: int = 10, hours: float = None):
         """显示威胁记录"""
-        threats = self.load_threats()
+        threats = self.load_threats(hours, level, limit)
         if not threats:
             print(f"{Fore.YELLOW}No threats recorded{Style.RESET_ALL}")
             return
 
-        # 过滤威胁
-        if level:
-            threats = [t for t in threats if t.get('level', '').lower() == level.lower()]
-
-        # 限制显示数量
-        threats = threats[-limit:]
-
         print(f"\n{Fore.CYAN}=== Recent Threats {'(' + level.upper() + ')' if level else ''} ==={Style.RESET_ALL}")
         
         threats_data = []
@@ -124,9 +138,9 @@ class ThreatSummaryViewer:
                       headers=['Timestamp', 'Level', 'Type', 'Description', 'Source IP'],
                       tablefmt='grid'))
 
-    def export_to_csv(self, output_file: str):
+    def export_to_csv(self, output_file: str, hours: float = None):
         """导出威胁记录到CSV文件"""
-        threats = self.load_threats()
+        threats = self.load_threats(hours)
         if not threats:
             print(f"{Fore.YELLOW}No threats to export{Style.RESET_ALL}")
             return
@@ -144,26 +158,29 @@ def cli():
     pass
 
 @cli.command()
-def summary():
+@click.option('--hours', type=float, default=24, help='Summary window in hours')
+def summary(hours):
     """显示威胁摘要"""
     viewer = ThreatSummaryViewer()
-    viewer.display_summary()
+    viewer.display_summary(hours)
 
 @cli.command()
 @click.option('--level', type=click.Choice(['high', 'medium', 'low', 'warning'], case_sensitive=False),
               help='Filter threats by level')
 @click.option('--limit', type=int, default=10, help='Number of threats to display')
-def threats(level, limit):
+@click.option('--hours', type=float, default=None, help='Only show threats from the last N hours')
+def threats(level, limit, hours):
     """显示威胁记录"""
     viewer = ThreatSummaryViewer()
-    viewer.display_threats(level, limit)
+    viewer.display_threats(level, limit, hours)
 
 @cli.command()
 @click.argument('output_file', type=click.Path())
-def export(output_file):
+@click.option('--hours', type=float, default=None, help='Only export threats from the last N hours')
+def export(output_file, hours):
     """导出威胁记录到CSV文件"""
     viewer = ThreatSummaryViewer()
-    viewer.export_to_csv(output_file)
+    viewer.export_to_csv(output_file, hours)
 
 if __name__ == '__main__':
     try:
@@ -7,7 +7,12 @@ from jose import JWTError, jwt
 from backend.core.database import get_db
 from backend.models.user import User
 from backend.core.config import ACCESS_TOKEN_EXPIRE_MINUTES
-from backend.core.security import create_access_token, verify_password, get_password_hash
+from backend.core.security import (
+    create_access_token,
+    verify_password_async,
+    get_password_hash_async,
+    PasswordHasherBusy
+)
 from backend.core.deps import get_current_user
 from pydantic import BaseModel
 import logging
@@ -43,10 +48,19 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
             )
         
         # 创建新用户
+        try:
+            hashed_password = await get_password_hash_async(request.password)
+        except PasswordHasherBusy:
+            logger.warning("Password hasher busy, rejecting registration")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="注册请求过多，请稍后重试",
+                headers={"Retry-After": "1"},
+            )
         user = User(
             username=request.username,
             email=request.email,
-            hashed_password=get_password_hash(request.password),
+            hashed_password=hashed_password,
             role="student",
             status="active",
             created_at=datetime.now()
@@ -93,7 +107,16 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             )
             
         # 验证密码
-        if not verify_password(form_data.password, user.hashed_password):
+        try:
+            password_ok = await verify_password_async(form_data.password, user.hashed_password)
+        except PasswordHasherBusy:
+            logger.warning("Password hasher busy, rejecting login")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="登录请求过多，请稍后重试",
+                headers={"Retry-After": "1"},
+            )
+        if not password_ok:
             logger.warning(f"Invalid password for user: {form_data.username}")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
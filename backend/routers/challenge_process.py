@@ -2,8 +2,9 @@
 靶场进程管理路由
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+import json
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Dict, Optional, List
 
@@ -11,6 +12,7 @@ from ..dependencies import get_db, get_current_user
 from ..models.user import User
 from ..models.challenge import Challenge
 from ..core.process_manager import ProcessManager
+from ..core.log_collector import LogFilter
 
 router = APIRouter(
     prefix="/api/challenges",
@@ -126,4 +128,137 @@ async def download_log_file(
         log_file,
         filename=f"challenge_{challenge_id}.log",
         media_type="text/plain"
-    )
\ No newline at end of file
+    )
+
+def _build_log_filter(level: Optional[str], stream: Optional[str], pattern: Optional[str]) -> LogFilter:
+    """构建实时日志过滤条件，参数无效时返回400"""
+    try:
+        return LogFilter(level=level, stream=stream, pattern=pattern)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _format_sse(batch: Dict) -> str:
+    """把一批日志转换为SSE事件，事件id为下次续传的游标"""
+    if not batch["lines"] and not batch["skipped"]:
+        return ": keep-alive\n\n"
+
+    events = []
+    if batch["skipped"]:
+        events.append(
+            f"event: gap\ndata: {json.dumps({'skipped': batch['skipped']})}\n\n"
+        )
+    for item in batch["lines"]:
+        events.append(
+            f"id: {item['offset'] + 1}\ndata: {json.dumps(item, ensure_ascii=False)}\n\n"
+        )
+    if not batch["lines"]:
+        events.append(f"id: {batch['cursor']}\n\n")
+    return "".join(events)
+
+@router.get("/{challenge_id}/logs/stream")
+async def stream_process_logs(
+    challenge_id: int,
+    request: Request,
+    cursor: Optional[int] = None,
+    backlog: int = 100,
+    level: Optional[str] = None,
+    stream: Optional[str] = None,
+    pattern: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> StreamingResponse:
+    """以SSE方式实时推送进程日志
+
+    cursor 为日志偏移量，断线重连时浏览器自动携带的 Last-Event-ID 优先；
+    可按最低级别(level)、输出流(stream)和关键字(pattern，不区分大小写的子串)在服务端过滤
+    """
+    challenge = db.query(Challenge).get(challenge_id)
+    if not challenge:
+        raise HTTPException(status_code=404, detail="Challenge not found")
+    # 推送期间不占用数据库连接
+    db.close()
+
+    log_filter = _build_log_filter(level, stream, pattern)
+    if last_event_id and last_event_id.isdigit():
+        cursor = int(last_event_id)
+
+    collector = process_manager.log_collector
+    if challenge_id not in collector.log_buffers:
+        raise HTTPException(status_code=404, detail="Log stream not found")
+
+    async def event_source():
+        async for batch in collector.follow_logs(
+            challenge_id,
+            cursor=cursor,
+            backlog=backlog,
+            log_filter=None if log_filter.is_empty else log_filter
+        ):
+            if await request.is_disconnected():
+                break
+            yield _format_sse(batch)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@router.websocket("/{challenge_id}/logs/ws")
+async def websocket_process_logs(
+    websocket: WebSocket,
+    challenge_id: int,
+    token: str,
+    cursor: Optional[int] = None,
+    backlog: int = 100,
+    level: Optional[str] = None,
+    stream: Optional[str] = None,
+    pattern: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """以WebSocket方式实时推送进程日志
+
+    每条消息是一批日志 {"lines": [...], "cursor": n, "skipped": k}，
+    没有新日志时定期发送空批次作为心跳；重连时传入最后收到的cursor即可续传
+    """
+    try:
+        await get_current_user(token, db)
+        challenge = db.query(Challenge).get(challenge_id)
+    except HTTPException:
+        await websocket.close(code=4001)
+        return
+    finally:
+        db.close()
+
+    if not challenge:
+        await websocket.close(code=4004)
+        return
+
+    try:
+        log_filter = LogFilter(level=level, stream=stream, pattern=pattern)
+    except ValueError:
+        await websocket.close(code=4000)
+        return
+
+    collector = process_manager.log_collector
+    if challenge_id not in collector.log_buffers:
+        await websocket.close(code=4004)
+        return
+
+    await websocket.accept()
+    try:
+        async for batch in collector.follow_logs(
+            challenge_id,
+            cursor=cursor,
+            backlog=backlog,
+            log_filter=None if log_filter.is_empty else log_filter
+        ):
+            await websocket.send_text(json.dumps(batch, ensure_ascii=False))
+        # 停止收集日志后正常关闭
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        # 客户端已断开
+        pass
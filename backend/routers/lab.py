@@ -141,7 +141,7 @@ async def start_lab(
         if existing_instance:
             # 返回已存在的实例信息
             try:
-                status = challenge_manager.get_challenge_status(lab_id)
+                status = challenge_manager.get_challenge_status(lab_id, current_user.id)
                 if status['status'] == 'running':
                     return {
                         "status": "running",
@@ -160,10 +160,18 @@ async def start_lab(
 
         # 启动靶场
         try:
-            result = challenge_manager.start_challenge(lab_id)
+            result = await challenge_manager.start_challenge(lab_id, current_user.id)
         except Exception as e:
             logger.error(f"启动靶场失败: {str(e)}")
             raise HTTPException(status_code=500, detail=f"启动靶场失败: {str(e)}")
+
+        # 名额已满时返回排队信息，前端再次调用本接口即可查询排队进度
+        if result['status'] != 'running':
+            return {
+                "status": result['status'],
+                "position": result.get('position'),
+                "eta": result.get('eta')
+            }
         
         # 创建新实例
         instance = LabInstance(
@@ -202,11 +210,16 @@ async def stop_lab(
             LabInstance.end_time.is_(None)
         ).first()
         
+        # 停止靶场；排队中的启动请求还没有实例记录，同样在这里取消
+        result = await challenge_manager.stop_challenge(lab_id, current_user.id)
+        
         if not instance:
-            raise HTTPException(status_code=404, detail="没有找到运行中的实例")
-
-        # 停止靶场
-        result = challenge_manager.stop_challenge(lab_id)
+            if result['status'] != 'stopped':
+                raise HTTPException(status_code=404, detail="没有找到运行中的实例")
+            return {
+                "status": "stopped",
+                "instance_id": None
+            }
         
         # 更新实例状态
         instance.end_time = datetime.now()
@@ -216,6 +229,8 @@ async def stop_lab(
             "status": "stopped",
             "instance_id": instance.id
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"停止靶场失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"停止靶场失败: {str(e)}")
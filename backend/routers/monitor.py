@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Body
-from backend.core.deps import get_current_user
+from backend.core.deps import get_current_user, get_current_admin_user
+from backend.core.cache import user_cache
 from backend.models.user import User
 from typing import List, Dict, Any
 import random
@@ -219,6 +220,29 @@ async def get_system_metrics(current_user: User = Depends(get_current_user)) ->
     """获取系统指标数据"""
     return generate_mock_metrics()
 
+@router.get("/auth-cache")
+async def get_auth_cache_stats(current_user: User = Depends(get_current_admin_user)) -> Dict[str, Any]:
+    """获取认证用户缓存命中情况"""
+    return user_cache.get_stats()
+
+@router.get("/container-pool")
+async def get_container_pool_metrics(current_user: User = Depends(get_current_admin_user)) -> Dict[str, Any]:
+    """获取预热容器池命中率、补充耗时和空闲容器占用"""
+    from backend.core.lab.pool import container_pool
+    return await container_pool.get_metrics()
+
+@router.get("/lab-reaper")
+async def get_lab_reaper_metrics(current_user: User = Depends(get_current_admin_user)) -> Dict[str, Any]:
+    """获取过期实例回收器的积压数和回收吞吐"""
+    from backend.core.lab.reaper import lab_reaper
+    return lab_reaper.get_metrics()
+
+@router.get("/lab-db-pool")
+async def get_lab_db_pool_metrics(current_user: User = Depends(get_current_admin_user)) -> Dict[str, Any]:
+    """获取靶场数据库连接池的使用情况和等待时间"""
+    from backend.core.lab.db import lab_db_pool
+    return lab_db_pool.get_metrics()
+
 @router.get("/trends")
 async def get_alert_trends(
     current_user: User = Depends(get_current_user),
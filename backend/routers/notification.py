@@ -58,6 +58,5 @@ async def clear_notifications(
     user: User = Depends(get_current_user)
 ):
     """清空通知历史"""
-    if user.id in notification_service.notification_history:
-        notification_service.notification_history[user.id] = []
+    notification_service.clear_history(user.id)
     return {"status": "success"} 
\ No newline at end of file
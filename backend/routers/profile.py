@@ -20,6 +20,7 @@ from ..utils.auth import get_current_user
 from ..utils.storage import upload_file
 from ..utils.email import send_verification_code
 from ..utils.security import get_password_hash
+from ..core.lab.ranking import lab_ranking
 
 router = APIRouter(prefix="/api/profile", tags=["profile"])
 
@@ -39,6 +40,8 @@ async def update_profile(
         setattr(current_user, key, value)
     
     db.commit()
+    # 排行榜缓存了用户名和头像
+    lab_ranking.invalidate_user_profile(current_user.id)
     db.refresh(current_user)
     return current_user
 
@@ -64,6 +67,7 @@ async def upload_avatar(
     # 更新用户头像
     current_user.avatar = file_url
     db.commit()
+    lab_ranking.invalidate_user_profile(current_user.id)
     
     return {"url": file_url}
 
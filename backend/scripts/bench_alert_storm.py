@@ -0,0 +1,114 @@
+"""预警风暴通知测试
+
+在本机启动一个只记录邮件的SMTP服务器，让 Notifier 连接它，
+短时间内投递大量重复告警，统计实际发出的邮件数、合并数和发送耗时，
+用于验证通知队列的合并摘要、限速和重试行为，不会发出真实邮件。
+
+用法:
+    python scripts/bench_alert_storm.py --alerts 2000 --keys 20 --digest-window 5
+"""
+import argparse
+import os
+import socketserver
+import sys
+import threading
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(backend_dir)
+sys.path.append(os.path.dirname(backend_dir))
+
+from backend.monitor_service.core.notifier import Notifier
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """最简SMTP会话：接受所有命令，DATA内容只计数不投递"""
+
+    def reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self.reply("220 sink ESMTP")
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            text = line.decode(errors="replace").rstrip("\r\n")
+            if in_data:
+                if text == ".":
+                    in_data = False
+                    self.server.received.append(time.time())
+                    self.reply("250 OK")
+                continue
+            command = text[:4].upper()
+            if command == "EHLO":
+                self.reply("250 sink")
+            elif command == "DATA":
+                in_data = True
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, SinkHandler)
+        self.received = []
+
+
+def main(args):
+    server = SinkServer(("127.0.0.1", args.port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    notifier = Notifier({
+        'smtp_server': '127.0.0.1',
+        'smtp_port': port,
+        'smtp_ssl': False,
+        'smtp_starttls': False,
+        'smtp_skip_login': True,
+        'from_email': 'monitor@localhost',
+        'admin_emails': ['admin@localhost'],
+        'digest_window': args.digest_window,
+        'rate_limit_per_minute': args.rate_limit
+    })
+
+    begin = time.perf_counter()
+    for i in range(args.alerts):
+        notifier.enqueue_email(
+            f"[CRITICAL] rule-{i % args.keys} 触发预警",
+            f"第 {i} 次触发",
+            key=f"rule:{i % args.keys}"
+        )
+    enqueue_elapsed = time.perf_counter() - begin
+
+    notifier.flush(args.timeout)
+    # 等待摘要窗口结束，让暂存的重复告警合并发出
+    time.sleep(args.digest_window + 1.5)
+    notifier.flush(args.timeout)
+    total_elapsed = time.perf_counter() - begin
+
+    print(f"投递 {args.alerts} 条告警（{args.keys} 个告警键），入队耗时 {enqueue_elapsed * 1000:.1f}ms")
+    print(f"SMTP服务器收到 {len(server.received)} 封邮件，总耗时 {total_elapsed:.2f}s")
+    print(f"通知统计: {notifier.get_stats()}")
+
+    notifier.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='预警风暴通知测试')
+    parser.add_argument('--alerts', type=int, default=2000, help='投递的告警数')
+    parser.add_argument('--keys', type=int, default=20, help='不同告警键的数量')
+    parser.add_argument('--digest-window', type=float, default=5, help='摘要合并窗口(秒)')
+    parser.add_argument('--rate-limit', type=int, default=600, help='每分钟最多发送的邮件数')
+    parser.add_argument('--port', type=int, default=0, help='本地SMTP服务器端口，0表示随机')
+    parser.add_argument('--timeout', type=float, default=60, help='等待发送完成的最长时间(秒)')
+    main(parser.parse_args())
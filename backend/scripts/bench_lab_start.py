@@ -0,0 +1,103 @@
+"""靶场并发启动基准测试
+
+在同一个事件循环里并发启动N个靶场容器，同时以固定间隔模拟普通API请求，
+统计这些请求的调度延迟(p50/p99/max)。如果容器生命周期中存在阻塞调用，
+p99会直接暴露出来。
+
+create_container 的健康检查会在容器内执行 curl http://localhost:8080/，
+默认先在本地构建一个装有curl、用busybox httpd监听8080端口的测试镜像，
+这样健康检查能真正通过；使用 --image 指定其他镜像时，它需要满足同样的条件。
+
+用法:
+    python scripts/bench_lab_start.py --labs 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(backend_dir))
+
+from backend.core.docker import docker_manager
+from bench_utils import probe_api_latency, format_latency
+
+BENCH_IMAGE = 'lab-bench:latest'
+BENCH_DOCKERFILE = """FROM alpine:3.19
+RUN apk add --no-cache curl && mkdir -p /www && echo ok > /www/index.html
+EXPOSE 8080
+CMD ["httpd", "-f", "-p", "8080", "-h", "/www"]
+"""
+
+
+def build_bench_image():
+    """构建测试镜像：busybox httpd监听8080，并带有健康检查需要的curl"""
+    result = subprocess.run(
+        ['docker', 'build', '-t', BENCH_IMAGE, '-'],
+        input=BENCH_DOCKERFILE,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"构建测试镜像失败: {result.stderr}")
+
+
+async def start_lab(image: str, port: int, container_port: int, results: list, created: list):
+    """启动单个靶场并记录耗时"""
+    begin = time.perf_counter()
+    try:
+        container_id, _ = await docker_manager.create_container(
+            image=image,
+            port_mapping=f"{port}:{container_port}"
+        )
+        created.append(container_id)
+        results.append(('ok', time.perf_counter() - begin))
+    except Exception as e:
+        results.append(('error', time.perf_counter() - begin))
+        print(f"启动失败: {str(e)}")
+
+
+async def main(args):
+    image = args.image
+    if image is None:
+        build_bench_image()
+        image = BENCH_IMAGE
+
+    stop = asyncio.Event()
+    samples, results, created = [], [], []
+
+    prober = asyncio.create_task(probe_api_latency(stop, args.interval / 1000, samples))
+    begin = time.perf_counter()
+    await asyncio.gather(*(
+        start_lab(image, args.base_port + i, args.container_port, results, created)
+        for i in range(args.labs)
+    ))
+    elapsed = time.perf_counter() - begin
+    stop.set()
+    await prober
+
+    ok = [t for status, t in results if status == 'ok']
+    print(f"\n并发启动 {args.labs} 个靶场，总耗时 {elapsed:.2f}s，成功 {len(ok)} 个")
+    if ok:
+        print(f"单个启动耗时: 平均 {statistics.mean(ok):.2f}s, 最大 {max(ok):.2f}s")
+    print(f"API调度延迟({len(samples)}个样本): {format_latency(samples)}")
+
+    if not args.keep:
+        await asyncio.gather(
+            *(docker_manager.stop_container(cid) for cid in created),
+            return_exceptions=True
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='靶场并发启动基准测试')
+    parser.add_argument('--labs', type=int, default=50, help='并发启动的靶场数量')
+    parser.add_argument('--image', default=None, help='测试使用的镜像，默认构建本地测试镜像')
+    parser.add_argument('--container-port', type=int, default=8080, help='容器内服务端口')
+    parser.add_argument('--base-port', type=int, default=20000, help='起始宿主机端口')
+    parser.add_argument('--interval', type=float, default=10, help='模拟API请求间隔(毫秒)')
+    parser.add_argument('--keep', action='store_true', help='测试结束后保留容器')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""靶场日志写入与读取基准测试
+
+对比每行重新打开文件追加与 BufferedLogWriter 批量写盘的吞吐，
+以及在不同大小的日志文件上用 readlines() 与向后查找读取最后N行的耗时。
+测试文件写在临时目录中，结束后删除。
+
+用法:
+    python scripts/bench_log_writer.py --lines 200000 --sizes 1024,104857600 --tail 100
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(backend_dir)
+sys.path.append(os.path.dirname(backend_dir))
+
+from backend.core.log_collector import BufferedLogWriter, tail_lines
+
+
+def bench_write(directory: str, lines: int):
+    line = "[2024-01-01 00:00:00] [STDOUT] GET /index.php?id=1 HTTP/1.1 200"
+
+    path = os.path.join(directory, "reopen.log")
+    begin = time.perf_counter()
+    for _ in range(lines):
+        with open(path, "a") as f:
+            f.write(line + "\n")
+    reopen = time.perf_counter() - begin
+
+    writer = BufferedLogWriter(os.path.join(directory, "buffered.log"), max_bytes=0)
+    begin = time.perf_counter()
+    for _ in range(lines):
+        writer.write(line)
+    writer.close()
+    buffered = time.perf_counter() - begin
+
+    print(f"写入 {lines} 行: 每行打开文件 {lines / reopen:,.0f} 行/秒，"
+          f"缓冲写入 {lines / buffered:,.0f} 行/秒（写盘 {writer.stats['flushes']} 次）")
+
+
+def bench_tail(directory: str, size: int, tail: int):
+    path = os.path.join(directory, f"tail_{size}.log")
+    row = b"[2024-01-01 00:00:00] [STDOUT] some challenge output line\n"
+    with open(path, "wb") as f:
+        chunk = row * max(1, (1024 * 1024) // len(row))
+        written = 0
+        while written < size:
+            data = chunk[:size - written]
+            f.write(data)
+            written += len(data)
+
+    begin = time.perf_counter()
+    with open(path, "r") as f:
+        full = f.readlines()[-tail:]
+    readlines_ms = (time.perf_counter() - begin) * 1000
+
+    begin = time.perf_counter()
+    seek = tail_lines(path, tail)
+    tail_ms = (time.perf_counter() - begin) * 1000
+
+    assert seek == full, "tail_lines 结果与 readlines 不一致"
+    print(f"文件 {size:,} 字节，读取最后 {tail} 行: readlines {readlines_ms:.2f}ms，向后查找 {tail_ms:.3f}ms")
+
+
+def main(args):
+    directory = tempfile.mkdtemp(prefix="bench_log_")
+    try:
+        bench_write(directory, args.lines)
+        for size in args.sizes.split(","):
+            bench_tail(directory, int(size), args.tail)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='靶场日志写入与读取基准测试')
+    parser.add_argument('--lines', type=int, default=200000, help='写入测试的行数')
+    parser.add_argument('--sizes', default='1024,104857600', help='读取测试的文件大小(字节)，逗号分隔')
+    parser.add_argument('--tail', type=int, default=100, help='读取末尾的行数')
+    main(parser.parse_args())
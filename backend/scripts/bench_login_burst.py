@@ -0,0 +1,92 @@
+"""登录洪峰基准测试
+
+在同一个事件循环里以固定速率发起密码校验（模拟登录），同时以固定间隔模拟
+普通API请求，统计普通请求的调度延迟(p50/p99/max)以及登录的成功/拒绝数。
+使用 --sync 对比在事件循环内直接执行bcrypt时的表现。
+
+用法:
+    python scripts/bench_login_burst.py --rate 200 --duration 10
+    python scripts/bench_login_burst.py --rate 200 --duration 10 --sync
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(backend_dir)
+sys.path.append(os.path.dirname(backend_dir))
+
+from backend.core.security import (
+    get_password_hash,
+    verify_password,
+    verify_password_async,
+    password_hasher,
+    PasswordHasherBusy
+)
+from bench_utils import probe_api_latency, format_latency
+
+
+async def login(hashed: str, sync: bool, stats: dict):
+    try:
+        if sync:
+            verify_password("benchmark-password", hashed)
+        else:
+            await verify_password_async("benchmark-password", hashed)
+        stats['ok'] += 1
+    except PasswordHasherBusy:
+        stats['rejected'] += 1
+
+
+def report(title: str, samples: list):
+    print(f"{title}({len(samples)}个样本): {format_latency(samples)}")
+
+
+async def main(args):
+    hashed = get_password_hash("benchmark-password")
+    interval = args.interval / 1000
+
+    # 基线：无登录负载
+    stop = asyncio.Event()
+    baseline = []
+    prober = asyncio.create_task(probe_api_latency(stop, interval, baseline))
+    await asyncio.sleep(min(args.duration, 2))
+    stop.set()
+    await prober
+
+    # 登录洪峰
+    stop = asyncio.Event()
+    samples = []
+    stats = {'ok': 0, 'rejected': 0}
+    prober = asyncio.create_task(probe_api_latency(stop, interval, samples))
+    tasks = []
+    loop = asyncio.get_running_loop()
+    begin = loop.time()
+    sent = 0
+    while loop.time() - begin < args.duration:
+        due = int((loop.time() - begin) * args.rate)
+        while sent < due:
+            tasks.append(asyncio.create_task(login(hashed, args.sync, stats)))
+            sent += 1
+        await asyncio.sleep(0.005)
+    await asyncio.gather(*tasks)
+    stop.set()
+    await prober
+
+    mode = "事件循环内同步执行" if args.sync else "密码哈希线程池"
+    print(f"\n模式: {mode}，速率 {args.rate}/s，持续 {args.duration}s")
+    print(f"登录: 成功 {stats['ok']}，被拒绝 {stats['rejected']}")
+    report("普通请求延迟(无负载)", baseline)
+    report("普通请求延迟(登录洪峰)", samples)
+    if not args.sync:
+        print(f"线程池统计: {password_hasher.get_stats()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='登录洪峰基准测试')
+    parser.add_argument('--rate', type=int, default=200, help='每秒登录请求数')
+    parser.add_argument('--duration', type=float, default=10, help='持续时间(秒)')
+    parser.add_argument('--interval', type=float, default=10, help='模拟API请求间隔(毫秒)')
+    parser.add_argument('--sync', action='store_true', help='在事件循环内直接执行bcrypt作为对照')
+    asyncio.run(main(parser.parse_args()))
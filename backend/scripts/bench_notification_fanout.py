@@ -0,0 +1,88 @@
+"""通知广播基准测试
+
+在进程内创建N个模拟WebSocket连接（可设置一部分为慢客户端），
+连续广播若干条通知，统计每条消息从广播到写入各连接的延迟(p50/p99/max)
+以及被断开的慢消费者数量。模拟连接的发送耗时用 asyncio.sleep 表示网络写入。
+
+用法:
+    python scripts/bench_notification_fanout.py --sockets 10000 --messages 20 --slow 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(backend_dir)
+sys.path.append(os.path.dirname(backend_dir))
+
+from backend.services.notification_service import NotificationService
+from bench_utils import format_latency
+
+
+class FakeWebSocket:
+    """模拟WebSocket：记录每条消息的到达延迟"""
+
+    def __init__(self, send_delay: float, latencies: list):
+        self.send_delay = send_delay
+        self.latencies = latencies
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        sent_at = json.loads(data)["message"]
+        self.latencies.append((time.perf_counter() - float(sent_at)) * 1000)
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+
+async def main(args):
+    service = NotificationService(queue_size=args.queue_size, send_timeout=args.send_timeout)
+    latencies = []
+    sockets = []
+    slow = set(random.sample(range(args.sockets), min(args.slow, args.sockets)))
+    for i in range(args.sockets):
+        delay = args.slow_delay if i in slow else args.delay
+        ws = FakeWebSocket(delay, latencies)
+        sockets.append(ws)
+        await service.connect(ws, user_id=i % args.users)
+
+    begin = time.perf_counter()
+    for _ in range(args.messages):
+        broadcast_begin = time.perf_counter()
+        await service.broadcast("benchmark", str(time.perf_counter()), "info")
+        enqueue_ms = (time.perf_counter() - broadcast_begin) * 1000
+        await asyncio.sleep(args.interval)
+    # 等待正常连接全部发送完毕
+    expected = (args.sockets - len(slow)) * args.messages
+    deadline = time.perf_counter() + 60
+    while len(latencies) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - begin
+
+    print(f"\n连接数 {args.sockets}（慢客户端 {len(slow)}），广播 {args.messages} 条，总耗时 {elapsed:.2f}s")
+    print(f"单次广播入队耗时(最后一次): {enqueue_ms:.2f}ms")
+    print(f"送达 {len(latencies)} 条，延迟: {format_latency(latencies)}")
+    print(f"服务统计: {service.get_stats()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='通知广播基准测试')
+    parser.add_argument('--sockets', type=int, default=10000, help='连接数')
+    parser.add_argument('--users', type=int, default=5000, help='用户数（连接平均分配）')
+    parser.add_argument('--messages', type=int, default=20, help='广播的消息数')
+    parser.add_argument('--interval', type=float, default=0.05, help='两次广播间隔(秒)')
+    parser.add_argument('--delay', type=float, default=0.0005, help='正常连接单次发送耗时(秒)')
+    parser.add_argument('--slow', type=int, default=50, help='慢客户端数量')
+    parser.add_argument('--slow-delay', type=float, default=30, help='慢客户端单次发送耗时(秒)')
+    parser.add_argument('--queue-size', type=int, default=8, help='每个连接的发送队列长度')
+    parser.add_argument('--send-timeout', type=float, default=2, help='单条消息发送超时(秒)')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,26 @@
+"""基准测试脚本共用的工具函数"""
+import asyncio
+
+
+async def probe_api_latency(stop: asyncio.Event, interval: float, samples: list):
+    """模拟API请求：记录每次请求从计划执行到实际被处理之间的延迟"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append((loop.time() - expected) * 1000)
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def format_latency(values: list) -> str:
+    """格式化为 p50/p99/max（毫秒）"""
+    return (f"p50={percentile(values, 50):.2f}ms "
+            f"p99={percentile(values, 99):.2f}ms "
+            f"max={max(values, default=0):.2f}ms")
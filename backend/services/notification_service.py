@@ -3,34 +3,164 @@
 负责处理系统通知、告警等
 """
 
+import asyncio
+import json
 import logging
-from typing import Dict, Optional, List
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, List, Set
 from datetime import datetime
 from sqlalchemy.orm import Session
 from fastapi import WebSocket
 
 logger = logging.getLogger(__name__)
 
+# 每个连接的待发送消息上限，积压超过上限视为慢消费者并断开
+SEND_QUEUE_SIZE = 256
+# 单条消息的发送超时（秒），超时同样视为慢消费者
+SEND_TIMEOUT = 10
+# 每个用户保留的通知历史条数
+HISTORY_SIZE = 100
+# 断开慢消费者时使用的关闭码（1013: Try Again Later）
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+def _serialize(notification: Dict) -> str:
+    """与 WebSocket.send_json 相同的序列化方式"""
+    return json.dumps(notification, separators=(",", ":"), ensure_ascii=False)
+
+
+class ClientConnection:
+    """一个WebSocket连接及其独立的发送队列
+
+    消息入队不等待网络，由连接自己的发送任务依次写出；
+    一个连接变慢只会让它自己的队列积压，不影响其他连接。
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: int, service: "NotificationService",
+                 queue_size: int = SEND_QUEUE_SIZE, send_timeout: float = SEND_TIMEOUT):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.service = service
+        self.send_timeout = send_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # 当前这次发送的开始时间，由服务的巡检任务判断是否超时
+        self.send_started: Optional[float] = None
+        self.sent = 0
+        self.closed = False
+        self._task = asyncio.create_task(self._sender())
+
+    def enqueue(self, payload: str) -> bool:
+        """放入发送队列；队列已满说明客户端跟不上，断开它"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            self.service._evict(self, "send queue full")
+            return False
+
+    async def _sender(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                payload = await self.queue.get()
+                self.send_started = loop.time()
+                await self.websocket.send_text(payload)
+                self.send_started = None
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending notification to user {self.user_id}: {str(e)}")
+            self.service._evict(self, "send error", close=False)
+
+    def stop(self):
+        self.closed = True
+        if not self._task.done():
+            self._task.cancel()
+
+
 class NotificationService:
-    def __init__(self):
-        self.websocket_connections: Dict[int, List[WebSocket]] = {}  # user_id -> websockets
-        self.notification_history: Dict[int, List[Dict]] = {}  # user_id -> notifications
+    def __init__(self, history_size: int = HISTORY_SIZE, queue_size: int = SEND_QUEUE_SIZE,
+                 send_timeout: float = SEND_TIMEOUT):
+        self.history_size = history_size
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.connections: Dict[int, Set[ClientConnection]] = {}  # user_id -> connections
+        self._by_socket: Dict[int, ClientConnection] = {}  # id(websocket) -> connection
+        self.notification_history: Dict[int, Deque[Dict]] = {}  # user_id -> 最近的通知
+        self.delivered = 0
+        self.evicted = 0
+        self._watchdog: Optional[asyncio.Task] = None
     
     async def connect(self, websocket: WebSocket, user_id: int):
         """建立WebSocket连接"""
         await websocket.accept()
-        if user_id not in self.websocket_connections:
-            self.websocket_connections[user_id] = []
-        self.websocket_connections[user_id].append(websocket)
+        conn = ClientConnection(websocket, user_id, self, self.queue_size, self.send_timeout)
+        self.connections.setdefault(user_id, set()).add(conn)
+        self._by_socket[id(websocket)] = conn
+        if self._watchdog is None or self._watchdog.done():
+            self._watchdog = asyncio.create_task(self._watch_send_timeouts())
         logger.info(f"User {user_id} connected to notification service")
     
     def disconnect(self, websocket: WebSocket, user_id: int):
         """断开WebSocket连接"""
-        if user_id in self.websocket_connections:
-            self.websocket_connections[user_id].remove(websocket)
-            if not self.websocket_connections[user_id]:
-                del self.websocket_connections[user_id]
+        conn = self._by_socket.pop(id(websocket), None)
+        if conn is None:
+            return
+        conn.stop()
+        user_conns = self.connections.get(user_id)
+        if user_conns is not None:
+            user_conns.discard(conn)
+            if not user_conns:
+                del self.connections[user_id]
         logger.info(f"User {user_id} disconnected from notification service")
+
+    def _evict(self, conn: ClientConnection, reason: str, close: bool = True):
+        """断开慢消费者或已失效的连接"""
+        if conn.closed:
+            return
+        self.evicted += 1
+        logger.warning(f"Evicting notification connection of user {conn.user_id}: {reason}")
+        self.disconnect(conn.websocket, conn.user_id)
+        if close:
+            asyncio.create_task(self._close_quietly(conn.websocket))
+
+    async def _watch_send_timeouts(self):
+        """定期巡检，断开单条消息发送超时的连接
+
+        用一个巡检任务代替为每次发送设置超时，广播时不会为每个连接额外创建定时器。
+        """
+        loop = asyncio.get_running_loop()
+        while self._by_socket:
+            await asyncio.sleep(self.send_timeout / 2)
+            now = loop.time()
+            for conn in list(self._by_socket.values()):
+                if conn.send_started is not None and now - conn.send_started > self.send_timeout:
+                    self._evict(conn, "send timeout")
+
+    async def _close_quietly(self, websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=SLOW_CONSUMER_CLOSE_CODE), self.send_timeout)
+        except Exception:
+            pass
+
+    def _remember(self, user_id: int, notification: Dict):
+        history = self.notification_history.get(user_id)
+        if history is None:
+            history = self.notification_history[user_id] = deque(maxlen=self.history_size)
+        history.append(notification)
+
+    def _deliver(self, user_ids: Iterable[int], payload: str) -> int:
+        """把已序列化的消息放入这些用户所有连接的发送队列"""
+        queued = 0
+        for user_id in user_ids:
+            for conn in list(self.connections.get(user_id, ())):
+                if conn.enqueue(payload):
+                    queued += 1
+        self.delivered += queued
+        return queued
     
     async def send_notification(
         self,
@@ -50,22 +180,37 @@ class NotificationService:
         }
         
         # 保存通知历史
-        if user_id not in self.notification_history:
-            self.notification_history[user_id] = []
-        self.notification_history[user_id].append(notification)
+        self._remember(user_id, notification)
         
-        # 限制历史记录数量
-        if len(self.notification_history[user_id]) > 100:
-            self.notification_history[user_id] = self.notification_history[user_id][-100:]
-        
-        # 发送WebSocket消息
-        if user_id in self.websocket_connections:
-            for websocket in self.websocket_connections[user_id]:
-                try:
-                    await websocket.send_json(notification)
-                except Exception as e:
-                    logger.error(f"Error sending notification to user {user_id}: {str(e)}")
-                    await self.disconnect(websocket, user_id)
+        # 放入该用户各连接的发送队列，由各连接并发发送
+        self._deliver((user_id,), _serialize(notification))
+
+    async def broadcast(
+        self,
+        title: str,
+        message: str,
+        type: str = "info",
+        user_ids: Optional[Iterable[int]] = None
+    ) -> int:
+        """向多个用户广播通知，消息只序列化一次
+
+        Args:
+            user_ids: 接收的用户，默认所有在线用户
+
+        Returns:
+            放入发送队列的连接数
+        """
+        notification = {
+            "title": title,
+            "message": message,
+            "type": type,
+            "challenge_id": None,
+            "timestamp": datetime.now().isoformat()
+        }
+        targets = list(self.connections) if user_ids is None else list(user_ids)
+        for user_id in targets:
+            self._remember(user_id, notification)
+        return self._deliver(targets, _serialize(notification))
     
     async def send_timeout_warning(
         self,
@@ -135,9 +280,26 @@ class NotificationService:
     
     def get_notification_history(self, user_id: int, limit: int = 50) -> List[Dict]:
         """获取通知历史"""
-        if user_id not in self.notification_history:
+        history = self.notification_history.get(user_id)
+        if not history or limit <= 0:
             return []
-        return self.notification_history[user_id][-limit:]
+        return list(history)[-limit:]
+
+    def clear_history(self, user_id: int):
+        """清空通知历史"""
+        self.notification_history.pop(user_id, None)
+
+    def get_stats(self) -> Dict:
+        """连接数、积压和慢消费者统计"""
+        conns = list(self._by_socket.values())
+        return {
+            "users": len(self.connections),
+            "connections": len(conns),
+            "queued_messages": sum(conn.queue.qsize() for conn in conns),
+            "max_backlog": max((conn.queue.qsize() for conn in conns), default=0),
+            "delivered": self.delivered,
+            "evicted": self.evicted
+        }
 
 # 创建全局通知服务实例
-notification_service = NotificationService() 
\ No newline at end of file
+notification_service = NotificationService()
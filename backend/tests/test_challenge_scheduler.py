@@ -0,0 +1,218 @@
+import asyncio
+import time
+
+import pytest
+
+from challenges.scheduler import DEFAULT_STARTUP_SECONDS, InstanceScheduler
+
+
+class FakeRuntime:
+    """记录启动/停止调用的假launcher和stopper"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.launched = []
+        self.stopped = []
+
+    async def launch(self, instance):
+        self.launched.append(instance.key)
+        if instance.challenge_id in self.fail:
+            raise RuntimeError("launch failed")
+        instance.port = 10000 + len(self.launched)
+
+    async def stop(self, instance):
+        self.stopped.append(instance.key)
+
+
+def make_scheduler(runtime, **kwargs):
+    return InstanceScheduler(runtime.launch, runtime.stop, **kwargs)
+
+
+async def settle():
+    """让排队后被调度的启动任务跑完"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_submit_starts_until_capacity_then_queues():
+    async def scenario():
+        runtime = FakeRuntime()
+        scheduler = make_scheduler(runtime, max_instances=2)
+
+        first = await scheduler.submit(1, 'a', 60)
+        second = await scheduler.submit(2, 'b', 60)
+        third = await scheduler.submit(3, 'c', 60)
+
+        assert first.status == 'running'
+        assert second.status == 'running'
+        assert third.status == 'queued'
+        assert runtime.launched == [(1, 'a'), (2, 'b')]
+        assert scheduler.queue_position(third) == 1
+        assert scheduler.get_stats()['waiting'] == 1
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_submit_returns_existing_instance():
+    async def scenario():
+        runtime = FakeRuntime()
+        scheduler = make_scheduler(runtime)
+
+        first = await scheduler.submit(1, 'a', 60)
+        again = await scheduler.submit(1, 'a', 60)
+
+        assert again is first
+        assert runtime.launched == [(1, 'a')]
+        assert scheduler.stats['submitted'] == 1
+
+    asyncio.run(scenario())
+
+
+def test_per_user_cap_counts_queued_instances():
+    async def scenario():
+        runtime = FakeRuntime()
+        scheduler = make_scheduler(runtime, max_instances=1, max_per_user=2)
+
+        await scheduler.submit(1, 'a', 60)
+        queued = await scheduler.submit(1, 'b', 60)
+        assert queued.status == 'queued'
+
+        with pytest.raises(RuntimeError):
+            await scheduler.submit(1, 'c', 60)
+        assert scheduler.stats['rejected'] == 1
+
+        # 其他用户不受影响
+        other = await scheduler.submit(2, 'a', 60)
+        assert other.status == 'queued'
+
+    asyncio.run(scenario())
+
+
+def test_exit_starts_next_queued_instance():
+    async def scenario():
+        runtime = FakeRuntime()
+        scheduler = make_scheduler(runtime, max_instances=1)
+
+        running = await scheduler.submit(1, 'a', 60)
+        queued = await scheduler.submit(2, 'b', 60)
+
+        scheduler.on_exit(running)
+        await settle()
+
+        assert running.status == 'stopped'
+        assert queued.status == 'running'
+        assert scheduler.get(1, 'a') is None
+        assert scheduler.running_count == 1
+
+    asyncio.run(scenario())
+
+
+def test_stop_cancels_queued_instance():
+    async def scenario():
+        runtime = FakeRuntime()
+        scheduler = make_scheduler(runtime, max_instances=1, max_per_user=1)
+
+        await scheduler.submit(1, 'a', 60)
+        queued = await scheduler.submit(2, 'b', 60)
+
+        assert await scheduler.stop(2, 'b') is True
+        assert queued.status == 'stopped'
+        assert queued.ready.done()
+        assert scheduler.get_stats()['waiting'] == 0
+        assert runtime.launched == [(1, 'a')]
+        assert await scheduler.stop(2, 'b') is False
+
+        # 取消后用户名额已释放，可以重新提交
+        again = await scheduler.submit(2, 'b', 60)
+        assert again.status == 'queued'
+
+    asyncio.run(scenario())
+
+
+def test_stop_running_instance_calls_stopper_and_releases():
+    async def scenario():
+        runtime = FakeRuntime()
+        scheduler = make_scheduler(runtime, max_instances=1)
+
+        await scheduler.submit(1, 'a', 60)
+        queued = await scheduler.submit(2, 'b', 60)
+
+        assert await scheduler.stop(1, 'a') is True
+        await settle()
+
+        assert runtime.stopped == [(1, 'a')]
+        assert queued.status == 'running'
+
+    asyncio.run(scenario())
+
+
+def test_launcher_failure_releases_slot_and_dispatches_queue():
+    async def scenario():
+        runtime = FakeRuntime(fail={'broken'})
+        scheduler = make_scheduler(runtime, max_instances=1, max_per_user=1)
+
+        failed = await scheduler.submit(1, 'broken', 60)
+        assert failed.status == 'failed'
+        assert failed.error == 'launch failed'
+        assert scheduler.running_count == 0
+        assert scheduler.get(1, 'broken') is None
+        assert scheduler.stats['failed'] == 1
+
+        # 失败的实例不再占用用户名额
+        retry = await scheduler.submit(1, 'a', 60)
+        assert retry.status == 'running'
+
+    asyncio.run(scenario())
+
+
+def test_launcher_failure_starts_queued_instance():
+    async def scenario():
+        runtime = FakeRuntime(fail={'broken'})
+        scheduler = make_scheduler(runtime, max_instances=1)
+
+        async def launch_slowly(instance):
+            await asyncio.sleep(0)
+            await runtime.launch(instance)
+
+        scheduler.launcher = launch_slowly
+        submit = asyncio.create_task(scheduler.submit(1, 'broken', 60))
+        await asyncio.sleep(0)
+        queued = await scheduler.submit(2, 'b', 60)
+        assert queued.status == 'queued'
+
+        failed = await submit
+        await settle()
+
+        assert failed.status == 'failed'
+        assert queued.status == 'running'
+
+    asyncio.run(scenario())
+
+
+def test_estimate_wait_uses_earliest_running_end():
+    async def scenario():
+        runtime = FakeRuntime()
+        scheduler = make_scheduler(runtime, max_instances=2)
+
+        # 没有运行中的实例时只剩启动耗时
+        assert scheduler.estimate_wait(1) == DEFAULT_STARTUP_SECONDS
+
+        first = await scheduler.submit(1, 'a', 100)
+        second = await scheduler.submit(2, 'b', 300)
+        now = time.time()
+        first.started_at = now
+        second.started_at = now
+        queued = await scheduler.submit(3, 'c', 60)
+
+        startup = scheduler._avg_startup
+        assert scheduler.estimate_wait(1) == pytest.approx(100 + startup, abs=1)
+        assert scheduler.estimate_wait(2) == pytest.approx(300 + startup, abs=1)
+        # 排队数超过运行数时按轮次累加
+        assert scheduler.estimate_wait(3) == pytest.approx(100 + 300 + startup, abs=1)
+
+        described = scheduler.describe(queued)
+        assert described['status'] == 'queued'
+        assert described['position'] == 1
+        assert described['eta'] == round(scheduler.estimate_wait(1))
+
+    asyncio.run(scenario())
@@ -1,87 +1,164 @@
 """分析器模块"""
 import logging
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from challenge_analysis.config import Config
 from challenge_analysis.data.storage import DatabaseUtils
+from challenge_analysis.core.recommender import ChallengeRecommender
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 难度分析在sync_watermarks表中的水位名
+DIFFICULTY_WATERMARK = 'difficulty_analysis'
+
 class ChallengeAnalyzer:
     """靶场分析器"""
     
     def __init__(self):
         """初始化分析器"""
         self.db_utils = DatabaseUtils(Config.SQLITE_DB_PATH)
+        self.recommender = ChallengeRecommender(self.db_utils.db)
         
-    def analyze_challenge_difficulty(self, challenge_id: int) -> Optional[float]:
-        """分析题目难度
+    def _challenge_filter(self, challenge_ids: Optional[List[int]] = None,
+                          since: Optional[str] = None) -> Tuple[str, tuple]:
+        """构造限定分析范围的条件
         
         Args:
-            challenge_id: 靶场ID
+            challenge_ids: 只分析这些靶场
+            since: 只分析该时间之后有新尝试记录的靶场
+        """
+        if challenge_ids is not None:
+            placeholders = ','.join('?' * len(challenge_ids)) or 'NULL'
+            return f"challenge_id IN ({placeholders})", tuple(challenge_ids)
+        if since is not None:
+            return """challenge_id IN (
+                SELECT DISTINCT challenge_id FROM user_challenges WHERE updated_at > ?
+            )""", (since,)
+        return "1 = 1", ()
+        
+    @staticmethod
+    def _percentile(ordered: List[float], pct: float) -> float:
+        """已排序序列的百分位数（线性插值）"""
+        position = (len(ordered) - 1) * pct / 100
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+        
+    def collect_difficulty_stats(self, challenge_ids: Optional[List[int]] = None,
+                                 since: Optional[str] = None) -> Dict[int, Dict[str, Any]]:
+        """一次聚合统计靶场难度指标
+        
+        所有靶场共用三条查询：尝试记录聚合、反馈聚合、按靶场排序的解题耗时。
+        
+        Args:
+            challenge_ids: 只统计这些靶场，默认统计全部
+            since: 只统计该时间之后有新尝试记录的靶场
             
         Returns:
-            难度分数，如果分析失败则返回None
+            {靶场ID: 统计数据}
         """
-        try:
-            # 获取题目统计数据
-            stats = self.db_utils.execute_query("""
+        condition, params = self._challenge_filter(challenge_ids, since)
+        db = self.db_utils.db
+        
+        stats = {
+            row['challenge_id']: row
+            for row in db.execute(f"""
                 SELECT 
+                    challenge_id,
                     COUNT(*) as total_attempts,
                     SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as successful_attempts,
-                    AVG(CASE 
-                        WHEN status = 'completed' 
-                        THEN CAST((julianday(completion_time) - julianday(start_time)) * 24 * 60 * 60 AS INTEGER)
-                        ELSE NULL 
-                    END) as avg_completion_time,
-                    AVG(hints_used) as avg_hints_used,
-                    (SELECT AVG(difficulty_rating) FROM challenge_feedback WHERE challenge_id = ?) as avg_difficulty_rating
+                    AVG(attempts) as avg_attempts
                 FROM user_challenges
-                WHERE challenge_id = ?
-            """, (challenge_id, challenge_id))
+                WHERE {condition}
+                GROUP BY challenge_id
+            """, params)
+        }
+        if not stats:
+            return {}
             
-            if not stats or not stats[0]['total_attempts']:
-                return None
+        for row in db.execute(f"""
+            SELECT challenge_id, AVG(difficulty_rating) as avg_difficulty_rating
+            FROM challenge_feedback
+            WHERE {condition}
+            GROUP BY challenge_id
+        """, params):
+            if row['challenge_id'] in stats:
+                stats[row['challenge_id']]['avg_difficulty_rating'] = row['avg_difficulty_rating']
                 
-            stats = stats[0]
+        # 解题耗时按靶场、耗时排序，逐组计算百分位数
+        solve_times: Dict[int, List[float]] = {}
+        for row in db.execute(f"""
+            SELECT 
+                challenge_id,
+                (julianday(completion_time) - julianday(start_time)) * 24 * 60 * 60 as solve_seconds
+            FROM user_challenges
+            WHERE {condition} AND status = 'completed' AND completion_time IS NOT NULL
+            ORDER BY challenge_id, solve_seconds
+        """, params):
+            if row['solve_seconds'] is not None:
+                solve_times.setdefault(row['challenge_id'], []).append(row['solve_seconds'])
                 
-            # 计算难度分数
-            difficulty_score = 0.0
-            weights = 0.0
+        for challenge_id, row in stats.items():
+            row['success_rate'] = row['successful_attempts'] / row['total_attempts']
+            row.setdefault('avg_difficulty_rating', None)
+            ordered = solve_times.get(challenge_id)
+            row['solve_time_p50'] = self._percentile(ordered, 50) if ordered else None
+            row['solve_time_p90'] = self._percentile(ordered, 90) if ordered else None
             
-            # 1. 完成率权重 40%
-            completion_rate = stats['successful_attempts'] / stats['total_attempts']
-            difficulty_score += (1 - completion_rate) * 0.4
-            weights += 0.4
-                
-            # 2. 平均完成时间权重 30%
-            if stats['avg_completion_time']:
-                # 假设超过2小时算最难
-                time_score = min(stats['avg_completion_time'] / 7200, 1)
-                difficulty_score += time_score * 0.3
-                weights += 0.3
-                
-            # 3. 平均使用提示数权重 20%
-            if stats['avg_hints_used'] is not None:
-                # 假设使用5个以上提示算最难
-                hint_score = min(stats['avg_hints_used'] / 5, 1)
-                difficulty_score += hint_score * 0.2
-                weights += 0.2
-                
-            # 4. 用户反馈难度权重 10%
-            if stats['avg_difficulty_rating']:
-                # 难度评分是1-5，转换为0-1
-                feedback_score = (stats['avg_difficulty_rating'] - 1) / 4
-                difficulty_score += feedback_score * 0.1
-                weights += 0.1
-                
-            # 根据实际权重调整分数
-            if weights > 0:
-                difficulty_score = difficulty_score / weights
-                
-            return difficulty_score
+        return stats
+        
+    def _difficulty_score(self, stats: Dict[str, Any]) -> float:
+        """由统计数据计算0-1的难度分数"""
+        difficulty_score = 0.0
+        weights = 0.0
+        
+        # 1. 完成率权重 40%
+        difficulty_score += (1 - stats['success_rate']) * 0.4
+        weights += 0.4
+            
+        # 2. 解题耗时中位数权重 30%
+        if stats['solve_time_p50']:
+            # 假设超过2小时算最难
+            time_score = min(stats['solve_time_p50'] / 7200, 1)
+            difficulty_score += time_score * 0.3
+            weights += 0.3
+            
+        # 3. 平均尝试次数权重 20%
+        if stats['avg_attempts'] is not None:
+            # 假设平均尝试5次以上算最难
+            attempt_score = min(stats['avg_attempts'] / 5, 1)
+            difficulty_score += attempt_score * 0.2
+            weights += 0.2
+            
+        # 4. 用户反馈难度权重 10%
+        if stats['avg_difficulty_rating']:
+            # 难度评分是1-5，转换为0-1
+            feedback_score = (stats['avg_difficulty_rating'] - 1) / 4
+            difficulty_score += feedback_score * 0.1
+            weights += 0.1
+            
+        # 根据实际权重调整分数
+        if weights > 0:
+            difficulty_score = difficulty_score / weights
+            
+        return difficulty_score
+        
+    def analyze_challenge_difficulty(self, challenge_id: int) -> Optional[float]:
+        """分析题目难度
+        
+        Args:
+            challenge_id: 靶场ID
+            
+        Returns:
+            难度分数，如果分析失败则返回None
+        """
+        try:
+            stats = self.collect_difficulty_stats([challenge_id]).get(challenge_id)
+            if not stats or not stats['total_attempts']:
+                return None
+            return self._difficulty_score(stats)
             
         except Exception as e:
             logger.error(f"分析题目难度失败: {str(e)}")
@@ -191,52 +268,30 @@ class ChallengeAnalyzer:
             推荐列表
         """
         try:
-            # 获取用户表现数据
-            performance = self.analyze_user_performance(user_id)
-            if not performance:
-                return []
-                
-            # 获取用户已完成的题目
-            completed = self.db_utils.execute_query("""
-                SELECT challenge_id
-                FROM user_progress
-                WHERE user_id = ? AND completed = 1
-            """, (user_id,))
-            completed_ids = [c['challenge_id'] for c in completed]
-            
-            # 获取所有可用题目
-            challenges = self.db_utils.execute_query("""
-                SELECT *
-                FROM challenges
-                WHERE id NOT IN ({})
-            """.format(','.join('?' * len(completed_ids)) if completed_ids else '0'),
-                completed_ids)
-                
-            recommendations = []
-            for challenge in challenges:
-                # 计算推荐分数
-                score = self._calculate_recommendation_score(challenge, performance)
-                if score > 0:
-                    recommendations.append({
-                        'challenge_id': challenge['id'],
-                        'score': score,
-                        'reason': self._get_recommendation_reason(challenge, performance)
-                    })
-                    
-            # 按分数排序
-            recommendations.sort(key=lambda x: x['score'], reverse=True)
-            
-            # 更新推荐
-            self.db_utils.update_user_recommendations(user_id, recommendations)
-            
-            return recommendations
-            
+            return self.recommender.refresh([user_id]).get(user_id, [])
         except Exception as e:
             logger.error(f"生成推荐失败: {str(e)}")
             return []
             
+    def generate_all_recommendations(self, user_ids: Optional[List[int]] = None) -> int:
+        """批量生成推荐
+        
+        一次加载用户技能和题目特征，向量化为所有用户打分后批量写回
+        
+        Args:
+            user_ids: 用户ID列表，为None时处理所有用户
+            
+        Returns:
+            处理的用户数
+        """
+        try:
+            return len(self.recommender.refresh(user_ids))
+        except Exception as e:
+            logger.error(f"批量生成推荐失败: {str(e)}")
+            return 0
+            
     def _calculate_recommendation_score(self, challenge: Dict[str, Any], performance: Dict[str, Any]) -> float:
-        """计算推荐分数"""
+        """计算推荐分数（单题版本，批量打分见 ChallengeRecommender._score_block）"""
         score = 0.0
         
         # 1. 难度匹配度 (40%)
@@ -266,37 +321,56 @@ class ChallengeAnalyzer:
         else:
             return "这是一个具有挑战性的题目，可以尝试挑战"
             
-    def update_challenge_pool(self) -> bool:
+    def _get_analysis_watermark(self) -> Optional[str]:
+        """上次难度分析覆盖到的尝试记录updated_at（sync_watermarks表由init_db创建）"""
+        rows = self.db_utils.db.execute(
+            "SELECT watermark FROM sync_watermarks WHERE table_name = ?", (DIFFICULTY_WATERMARK,)
+        )
+        return rows[0]['watermark'] if rows else None
+        
+    def update_challenge_pool(self, incremental: bool = False) -> bool:
         """更新题目池
         
-        更新所有题目的难度和其他统计数据
+        一次聚合计算所有题目的难度，并在一个事务内批量写回
         
+        Args:
+            incremental: 只重新计算上次分析之后有新尝试记录的题目
+            
         Returns:
             是否更新成功
         """
         try:
-            # 获取所有题目
-            challenges = self.db_utils.execute_query("SELECT id FROM challenges")
+            since = self._get_analysis_watermark() if incremental else None
+            # 先取水位再统计，统计期间新写入的记录留给下一轮
+            latest = self.db_utils.db.execute(
+                "SELECT MAX(updated_at) as latest FROM user_challenges"
+            )[0]['latest']
             
-            for challenge in challenges:
-                # 分析难度
-                difficulty = self.analyze_challenge_difficulty(challenge['id'])
-                if difficulty is not None:
-                    # 将0-1的难度分数转换为1-5的难度等级
-                    difficulty_level = int(difficulty * 4) + 1
-                    
-                    # 更新难度分数
-                    self.db_utils.execute_query("""
-                        UPDATE challenges
-                        SET difficulty = ?,
-                            updated_at = ?
-                        WHERE id = ?
-                    """, (
-                        difficulty_level,
-                        datetime.now().isoformat(),
-                        challenge['id']
-                    ))
+            stats = self.collect_difficulty_stats(since=since)
+            now = datetime.now().isoformat()
+            updates = []
+            for challenge_id, row in stats.items():
+                if not row['total_attempts']:
+                    continue
+                # 将0-1的难度分数转换为1-5的难度等级
+                difficulty_level = min(int(self._difficulty_score(row) * 4) + 1, 5)
+                updates.append((difficulty_level, now, challenge_id))
+                
+            with self.db_utils.db.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.executemany("""
+                    UPDATE challenges
+                    SET difficulty = ?,
+                        updated_at = ?
+                    WHERE id = ?
+                """, updates)
+                if latest:
+                    cursor.execute("""
+                        INSERT OR REPLACE INTO sync_watermarks (table_name, watermark, updated_at)
+                        VALUES (?, ?, ?)
+                    """, (DIFFICULTY_WATERMARK, latest, now))
                     
+            logger.info(f"更新题目池: 分析 {len(stats)} 个题目，更新 {len(updates)} 个")
             return True
             
         except Exception as e:
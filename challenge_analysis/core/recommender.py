@@ -1,4 +1,220 @@
 """推荐系统模块"""
+import logging
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from challenge_analysis.config import Config
+from challenge_analysis.utils.db import Database
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 每批打分的用户数，控制 用户数 × 题目数 中间矩阵的内存占用
+SCORE_BLOCK_SIZE = 2000
+
+# 推荐原因，下标与 _reason_codes 的返回值对应
+RECOMMENDATION_REASONS = (
+    "基于你当前的技能水平，这个挑战适合你",
+    "这个挑战稍有难度，可以帮助你提升技能",
+    "这是一个具有挑战性的题目，可以尝试挑战"
+)
+
 
 class ChallengeRecommender:
-    pass
+    """向量化推荐引擎
+
+    每轮推荐只查询一次数据库，构建:
+        - 题目特征: 类别下标、难度
+        - 用户技能矩阵: 用户 × 类别 的技能等级及是否掌握该类别
+        - 用户已完成题目数，以及已完成的 (用户, 题目) 对
+    然后按块对 用户 × 题目 一次性打分，取每个用户分数最高的若干题目批量写回。
+    打分公式与 ChallengeAnalyzer._calculate_recommendation_score 一致。
+    """
+
+    def __init__(self, db: Database, max_recommendations: int = Config.MAX_RECOMMENDATIONS,
+                 block_size: int = SCORE_BLOCK_SIZE):
+        self.db = db
+        self.max_recommendations = max_recommendations
+        self.block_size = block_size
+        self.last_stats: Dict[str, Any] = {}
+
+    def _load_challenges(self):
+        rows = self.db.execute("SELECT id, category, difficulty FROM challenges ORDER BY id")
+        categories = sorted({row['category'] for row in rows if row['category'] is not None})
+        category_index = {category: i for i, category in enumerate(categories)}
+        challenge_ids = np.array([row['id'] for row in rows], dtype=np.int64)
+        # 没有类别的题目映射到额外的一列，该列技能始终为0
+        challenge_category = np.array(
+            [category_index.get(row['category'], len(categories)) for row in rows],
+            dtype=np.int64
+        )
+        challenge_difficulty = np.array([row['difficulty'] or 0 for row in rows], dtype=np.float32)
+        return challenge_ids, challenge_category, challenge_difficulty, category_index
+
+    def _load_users(self, user_ids: List[int], category_index: Dict[str, int]):
+        user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+        shape = (len(user_ids), len(category_index) + 1)
+        skill_level = np.zeros(shape, dtype=np.float32)
+        has_skill = np.zeros(shape, dtype=bool)
+        for row in self.db.execute("SELECT user_id, skill_type, skill_level FROM user_skills"):
+            u = user_index.get(row['user_id'])
+            c = category_index.get(row['skill_type'])
+            if u is None or c is None:
+                continue
+            skill_level[u, c] = row['skill_level'] or 0
+            has_skill[u, c] = True
+
+        completed_count = np.zeros(len(user_ids), dtype=np.float32)
+        for row in self.db.execute("""
+            SELECT user_id, COUNT(*) as completed_challenges
+            FROM user_challenges
+            WHERE status = 'completed'
+            GROUP BY user_id
+        """):
+            u = user_index.get(row['user_id'])
+            if u is not None:
+                completed_count[u] = row['completed_challenges']
+
+        return user_index, skill_level, has_skill, completed_count
+
+    def _load_completed_pairs(self, user_index: Dict[int, int], challenge_ids: np.ndarray):
+        """已完成的 (用户下标, 题目下标)，按用户下标排序以便按块切片"""
+        rows = self.db.execute("""
+            SELECT user_id, challenge_id
+            FROM user_progress
+            WHERE completed = 1
+        """)
+        users, challenges = [], []
+        for row in rows:
+            u = user_index.get(row['user_id'])
+            if u is not None:
+                users.append(u)
+                challenges.append(row['challenge_id'])
+        users = np.array(users, dtype=np.int64)
+        challenges = np.array(challenges, dtype=np.int64)
+        # challenge_ids 已按id排序，可直接二分定位题目下标
+        positions = np.searchsorted(challenge_ids, challenges)
+        valid = positions < len(challenge_ids)
+        valid[valid] &= challenge_ids[positions[valid]] == challenges[valid]
+        users, positions = users[valid], positions[valid]
+        order = np.argsort(users, kind='stable')
+        return users[order], positions[order]
+
+    @staticmethod
+    def _reason_codes(difficulty_diff: np.ndarray) -> np.ndarray:
+        """难度与技能等级之差 -> 推荐原因下标"""
+        return np.select([difficulty_diff <= 0, difficulty_diff == 1], [0, 1], default=2)
+
+    def _score_block(self, level, has, progress, done_users, done_challenges,
+                     challenge_category, challenge_difficulty):
+        """为一块用户打分，返回每个用户的 (题目下标, 分数, 原因下标)"""
+        # 1. 难度匹配度 (40%)
+        user_level = level[:, challenge_category]
+        difficulty_diff = challenge_difficulty[None, :] - user_level
+        scores = np.maximum(0, 1 - np.abs(difficulty_diff) / 3) * 0.4
+        # 2. 类别匹配度 (30%)
+        scores += has[:, challenge_category] * np.float32(0.3)
+        # 3. 进度匹配度 (30%)
+        scores += progress[:, None]
+        # 排除已完成的题目
+        scores[done_users, done_challenges] = 0
+
+        k = min(self.max_recommendations, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in range(scores.shape[0])]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        top_reasons = self._reason_codes(np.take_along_axis(difficulty_diff, top, axis=1))
+
+        results = []
+        for row_top, row_scores, row_reasons in zip(top, top_scores, top_reasons):
+            keep = row_scores > 0
+            results.append((row_top[keep], row_scores[keep], row_reasons[keep]))
+        return results
+
+    def _write_block(self, block_user_ids: List[int], rows: List[tuple]):
+        """一个事务内替换这批用户的推荐"""
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "DELETE FROM user_recommendations WHERE user_id = ?",
+                [(user_id,) for user_id in block_user_ids]
+            )
+            cursor.executemany("""
+                INSERT INTO user_recommendations (user_id, challenge_id, score, reason, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+
+    def refresh(self, user_ids: Optional[List[int]] = None, write: bool = True) -> Dict[int, List[Dict[str, Any]]]:
+        """为一批用户重新生成推荐
+
+        Args:
+            user_ids: 用户ID列表，为None时处理所有用户
+            write: 是否写回user_recommendations表
+
+        Returns:
+            {用户ID: 推荐列表}，推荐按分数从高到低排列
+        """
+        begin = time.perf_counter()
+        if user_ids is None:
+            user_ids = [row['id'] for row in self.db.execute("SELECT id FROM users")]
+        user_ids = list(dict.fromkeys(user_ids))
+
+        challenge_ids, challenge_category, challenge_difficulty, category_index = self._load_challenges()
+        user_index, skill_level, has_skill, completed_count = self._load_users(user_ids, category_index)
+        done_users, done_challenges = self._load_completed_pairs(user_index, challenge_ids)
+        progress = np.minimum(completed_count / 10, 1) * np.float32(0.3)  # 假设完成10题为满分
+        loaded = time.perf_counter()
+
+        created_at = datetime.now().isoformat()
+        recommendations: Dict[int, List[Dict[str, Any]]] = {}
+        total_rows = 0
+        for start in range(0, len(user_ids), self.block_size):
+            end = min(start + self.block_size, len(user_ids))
+            lo, hi = np.searchsorted(done_users, [start, end])
+            block = self._score_block(
+                skill_level[start:end],
+                has_skill[start:end],
+                progress[start:end],
+                done_users[lo:hi] - start,
+                done_challenges[lo:hi],
+                challenge_category,
+                challenge_difficulty
+            )
+
+            rows = []
+            block_user_ids = user_ids[start:end]
+            for user_id, (top, top_scores, top_reasons) in zip(block_user_ids, block):
+                items = [
+                    {
+                        'challenge_id': int(challenge_ids[c]),
+                        'score': float(score),
+                        'reason': RECOMMENDATION_REASONS[reason]
+                    }
+                    for c, score, reason in zip(top, top_scores, top_reasons)
+                ]
+                recommendations[user_id] = items
+                rows.extend(
+                    (user_id, item['challenge_id'], item['score'], item['reason'], created_at)
+                    for item in items
+                )
+            if write:
+                self._write_block(block_user_ids, rows)
+            total_rows += len(rows)
+
+        self.last_stats = {
+            'users': len(user_ids),
+            'challenges': len(challenge_ids),
+            'recommendations': total_rows,
+            'load_seconds': round(loaded - begin, 3),
+            'total_seconds': round(time.perf_counter() - begin, 3)
+        }
+        logger.info(f"推荐生成统计: {self.last_stats}")
+        return recommendations
@@ -2,7 +2,7 @@
 import logging
 import mysql.connector
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from challenge_analysis.config import Config
 from challenge_analysis.data.storage import DatabaseUtils
 
@@ -10,6 +10,13 @@ from challenge_analysis.data.storage import DatabaseUtils
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 每批从MySQL拉取并写入SQLite的记录数
+SYNC_BATCH_SIZE = 5000
+
+def _to_text(value) -> str:
+    """把MySQL返回的时间转换为水位使用的字符串"""
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
 class DataCollector:
     """数据收集类"""
     
@@ -36,87 +43,154 @@ class DataCollector:
         if hasattr(self, 'mysql_conn'):
             self.mysql_conn.close()
             
-    def sync_user_data(self) -> bool:
+    def _get_watermark(self, table: str) -> Optional[str]:
+        """获取表的同步水位（已同步记录的最大updated_at）"""
+        rows = self.db_utils.db.execute(
+            "SELECT watermark FROM sync_watermarks WHERE table_name = ?", (table,)
+        )
+        return rows[0]['watermark'] if rows else None
+        
+    def _set_watermark(self, table: str, watermark: str):
+        self.db_utils.db.execute("""
+            INSERT OR REPLACE INTO sync_watermarks (table_name, watermark, updated_at)
+            VALUES (?, ?, ?)
+        """, (table, watermark, datetime.now().isoformat()))
+        
+    def _sync_table(
+        self,
+        table: str,
+        select_sql: str,
+        insert_sql: str,
+        to_params: Callable[[Dict[str, Any]], tuple],
+        full: bool = False
+    ) -> int:
+        """流式同步一张表
+        
+        按updated_at顺序用非缓冲游标从MySQL分批读取，每批通过
+        Database.execute_many在一个事务中写入SQLite，并推进同步水位，
+        中断后下次从水位处继续。
+        
+        水位条件是 updated_at >= 水位，与水位同一时刻写入的记录不会漏掉；
+        水位处的记录会被重复读取，因此写入语句必须是按主键/唯一键的upsert。
+        sync_watermarks表由init_db创建。
+        
+        Args:
+            table: 水位记录使用的表名
+            select_sql: MySQL查询，需包含 updated_at >= %s 条件并按updated_at排序
+            insert_sql: SQLite upsert语句
+            to_params: 把MySQL行转换为写入参数
+            full: 是否忽略水位全量同步
+            
+        Returns:
+            水位之后变更的记录数（不含重复读取的水位处记录）
+        """
+        watermark = None if full else self._get_watermark(table)
+        
+        # 非缓冲游标：结果集留在服务端，按批拉取，内存占用与总行数无关
+        cursor = self.mysql_conn.cursor(dictionary=True, buffered=False)
+        total = 0
+        try:
+            cursor.execute(select_sql, (watermark or '1970-01-01',))
+            while True:
+                rows = cursor.fetchmany(SYNC_BATCH_SIZE)
+                if not rows:
+                    break
+                if not self.db_utils.db.execute_many(insert_sql, [to_params(row) for row in rows]):
+                    raise Exception(f"批量写入{table}失败")
+                total += sum(1 for row in rows if _to_text(row['updated_at']) != watermark)
+                self._set_watermark(table, _to_text(rows[-1]['updated_at']))
+        finally:
+            cursor.close()
+        return total
+            
+    def sync_user_data(self, full: bool = False) -> bool:
         """同步用户数据
         
         从MySQL同步用户数据到SQLite
         
+        Args:
+            full: 是否全量同步，默认只同步上次水位之后变更的记录
+        
         Returns:
             是否同步成功
         """
         try:
-            # 获取MySQL中的用户数据
-            self.mysql_cursor.execute("""
+            count = self._sync_table(
+                'users',
+                """
                 SELECT id, username, created_at, updated_at
                 FROM users
-                WHERE updated_at > (
-                    SELECT COALESCE(MAX(updated_at), '1970-01-01')
-                    FROM users_sync_log
-                )
-            """)
-            users = self.mysql_cursor.fetchall()
-            
-            if not users:
-                return True
-                
-            # 更新SQLite
-            for user in users:
-                self.db_utils.execute_query("""
-                    INSERT OR REPLACE INTO users (
-                        id, username, created_at, updated_at
-                    ) VALUES (?, ?, ?, ?)
-                """, (
+                WHERE updated_at >= %s
+                ORDER BY updated_at
+                """,
+                """
+                INSERT INTO users (
+                    id, username, created_at, updated_at
+                ) VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    username = excluded.username,
+                    created_at = excluded.created_at,
+                    updated_at = excluded.updated_at
+                """,
+                lambda user: (
                     user['id'],
                     user['username'],
                     user['created_at'],
                     user['updated_at']
-                ))
+                ),
+                full
+            )
+            
+            if not count:
+                return True
                 
             # 记录同步时间
-            self.db_utils.execute_query("""
+            self.db_utils.db.execute("""
                 INSERT INTO users_sync_log (sync_time)
                 VALUES (?)
             """, (datetime.now().isoformat(),))
                 
-            logger.info(f"同步用户数据成功: {len(users)}条记录")
+            logger.info(f"同步用户数据成功: {count}条记录")
             return True
             
         except Exception as e:
             logger.error(f"同步用户数据失败: {str(e)}")
             return False
             
-    def sync_challenge_data(self) -> bool:
+    def sync_challenge_data(self, full: bool = False) -> bool:
         """同步靶场数据
         
         从MySQL同步靶场数据到SQLite
         
+        Args:
+            full: 是否全量同步，默认只同步上次水位之后变更的记录
+        
         Returns:
             是否同步成功
         """
         try:
-            # 获取MySQL中的靶场数据
-            self.mysql_cursor.execute("""
+            count = self._sync_table(
+                'challenges',
+                """
                 SELECT id, title, category, difficulty, points, created_at, updated_at
                 FROM challenges
-                WHERE updated_at > (
-                    SELECT COALESCE(MAX(sync_time), '1970-01-01')
-                    FROM challenges_sync_log
-                )
-            """)
-            challenges = self.mysql_cursor.fetchall()
-            
-            if not challenges:
-                logger.info("没有新的靶场数据需要同步")
-                return True
-                
-            # 更新SQLite
-            for challenge in challenges:
-                self.db_utils.execute_query("""
-                    INSERT OR REPLACE INTO challenges (
-                        id, title, category, difficulty, points,
-                        created_at, updated_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
+                WHERE updated_at >= %s
+                ORDER BY updated_at
+                """,
+                """
+                INSERT INTO challenges (
+                    id, title, category, difficulty, points,
+                    created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    title = excluded.title,
+                    category = excluded.category,
+                    difficulty = excluded.difficulty,
+                    points = excluded.points,
+                    created_at = excluded.created_at,
+                    updated_at = excluded.updated_at
+                """,
+                lambda challenge: (
                     challenge['id'],
                     challenge['title'],
                     challenge['category'],
@@ -124,25 +198,31 @@ class DataCollector:
                     challenge['points'],
                     challenge['created_at'],
                     challenge['updated_at']
-                ))
+                ),
+                full
+            )
+            
+            if not count:
+                logger.info("没有新的靶场数据需要同步")
+                return True
                 
             # 记录同步时间
-            self.db_utils.execute_query("""
+            self.db_utils.db.execute("""
                 INSERT INTO challenges_sync_log (sync_time, status, message)
                 VALUES (?, ?, ?)
             """, (
                 datetime.now().isoformat(),
                 'success',
-                f'同步了{len(challenges)}条记录'
+                f'同步了{count}条记录'
             ))
                 
-            logger.info(f"同步靶场数据成功: {len(challenges)}条记录")
+            logger.info(f"同步靶场数据成功: {count}条记录")
             return True
             
         except Exception as e:
             logger.error(f"同步靶场数据失败: {str(e)}")
             # 记录失败日志
-            self.db_utils.execute_query("""
+            self.db_utils.db.execute("""
                 INSERT INTO challenges_sync_log (sync_time, status, message)
                 VALUES (?, ?, ?)
             """, (
@@ -152,11 +232,12 @@ class DataCollector:
             ))
             return False
             
-    def sync_user_progress(self):
+    def sync_user_progress(self, full: bool = False):
         """同步用户进度数据"""
         try:
-            # 从MySQL获取用户进度数据
-            self.mysql_cursor.execute("""
+            count = self._sync_table(
+                'user_challenges',
+                """
                 SELECT 
                     uc.user_id,
                     uc.challenge_id,
@@ -167,25 +248,23 @@ class DataCollector:
                     uc.status,
                     uc.updated_at
                 FROM user_challenges uc
-                WHERE uc.updated_at > (
-                    SELECT COALESCE(MAX(sync_time), '1970-01-01')
-                    FROM user_progress_sync_log
-                )
-            """)
-            progress_data = self.mysql_cursor.fetchall()
-            
-            if not progress_data:
-                logger.info("没有新的用户进度数据需要同步")
-                return True
-                
-            # 更新进度数据
-            for progress in progress_data:
-                self.db_utils.execute_query("""
-                    INSERT OR REPLACE INTO user_challenges (
-                        user_id, challenge_id, start_time, completion_time,
-                        attempts, hints_used, status, updated_at, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+                WHERE uc.updated_at >= %s
+                ORDER BY uc.updated_at
+                """,
+                """
+                INSERT INTO user_challenges (
+                    user_id, challenge_id, start_time, completion_time,
+                    attempts, hints_used, status, updated_at, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id, challenge_id) DO UPDATE SET
+                    start_time = excluded.start_time,
+                    completion_time = excluded.completion_time,
+                    attempts = excluded.attempts,
+                    hints_used = excluded.hints_used,
+                    status = excluded.status,
+                    updated_at = excluded.updated_at
+                """,
+                lambda progress: (
                     progress['user_id'],
                     progress['challenge_id'],
                     progress['start_time'],
@@ -195,25 +274,31 @@ class DataCollector:
                     progress['status'],
                     progress['updated_at'],
                     progress['start_time']  # 使用start_time作为created_at
-                ))
+                ),
+                full
+            )
+            
+            if not count:
+                logger.info("没有新的用户进度数据需要同步")
+                return True
                 
             # 记录同步时间
-            self.db_utils.execute_query("""
+            self.db_utils.db.execute("""
                 INSERT INTO user_progress_sync_log (sync_time, status, message)
                 VALUES (?, ?, ?)
             """, (
                 datetime.now().isoformat(),
                 'success',
-                f'同步了{len(progress_data)}条记录'
+                f'同步了{count}条记录'
             ))
             
-            logger.info(f"同步用户进度数据成功: {len(progress_data)}条记录")
+            logger.info(f"同步用户进度数据成功: {count}条记录")
             return True
             
         except Exception as e:
             logger.error(f"同步用户进度数据失败: {str(e)}")
             # 记录失败日志
-            self.db_utils.execute_query("""
+            self.db_utils.db.execute("""
                 INSERT INTO user_progress_sync_log (sync_time, status, message)
                 VALUES (?, ?, ?)
             """, (
@@ -351,6 +436,12 @@ class DataCollector:
                     start_time, completion_time, hints_used, attempts,
                     created_at, updated_at
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id, challenge_id) DO UPDATE SET
+                    status = excluded.status,
+                    completion_time = excluded.completion_time,
+                    hints_used = excluded.hints_used,
+                    attempts = excluded.attempts,
+                    updated_at = excluded.updated_at
             """, (
                 user_id,
                 challenge_id,
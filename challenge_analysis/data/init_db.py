@@ -12,12 +12,22 @@ def init_db(db_path: str) -> bool:
     """
     db = Database(db_path)
     
-    # 创建挑战表
+    # 创建用户表（从MySQL同步）
+    users_table = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL,
+        created_at TEXT,
+        updated_at TEXT NOT NULL
+    )
+    """
+    
+    # 创建挑战表；同步时不带描述，描述可为空
     challenges_table = """
     CREATE TABLE IF NOT EXISTS challenges (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         title TEXT NOT NULL,
-        description TEXT NOT NULL,
+        description TEXT,
         category TEXT NOT NULL,
         difficulty INTEGER NOT NULL,
         points INTEGER NOT NULL,
@@ -36,6 +46,7 @@ def init_db(db_path: str) -> bool:
         start_time TEXT NOT NULL,
         completion_time TEXT,
         attempts INTEGER NOT NULL DEFAULT 0,
+        hints_used INTEGER NOT NULL DEFAULT 0,
         created_at TEXT NOT NULL,
         updated_at TEXT NOT NULL,
         FOREIGN KEY (challenge_id) REFERENCES challenges (id)
@@ -69,6 +80,14 @@ def init_db(db_path: str) -> bool:
     )
     """
     
+    # 创建用户同步日志表
+    users_sync_log_table = """
+    CREATE TABLE IF NOT EXISTS users_sync_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sync_time TEXT NOT NULL
+    )
+    """
+    
     # 创建挑战同步日志表
     challenges_sync_log_table = """
     CREATE TABLE IF NOT EXISTS challenges_sync_log (
@@ -89,8 +108,18 @@ def init_db(db_path: str) -> bool:
     )
     """
     
-    # 创建索引
+    # 创建同步水位表
+    sync_watermarks_table = """
+    CREATE TABLE IF NOT EXISTS sync_watermarks (
+        table_name TEXT PRIMARY KEY,
+        watermark TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    """
+    
+    # 创建索引；(user_id, challenge_id)唯一，同步时按此键更新
     indexes = [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_challenges_user_challenge ON user_challenges(user_id, challenge_id)",
         "CREATE INDEX IF NOT EXISTS idx_user_challenges_user ON user_challenges(user_id)",
         "CREATE INDEX IF NOT EXISTS idx_user_challenges_challenge ON user_challenges(challenge_id)",
         "CREATE INDEX IF NOT EXISTS idx_challenge_feedback_user ON challenge_feedback(user_id)",
@@ -101,12 +130,15 @@ def init_db(db_path: str) -> bool:
     
     # 执行建表语句
     tables = [
+        users_table,
         challenges_table,
         user_challenges_table,
         challenge_feedback_table,
         user_recommendations_table,
+        users_sync_log_table,
         challenges_sync_log_table,
-        user_progress_sync_log_table
+        user_progress_sync_log_table,
+        sync_watermarks_table
     ]
     
     try:
@@ -115,6 +147,8 @@ def init_db(db_path: str) -> bool:
             for table in tables:
                 db.execute_script(table)
                 
+            _migrate(db, challenges_table)
+                
             # 创建索引
             for index in indexes:
                 db.execute_script(index)
@@ -127,6 +161,37 @@ def init_db(db_path: str) -> bool:
     finally:
         db.close()
         
+def _migrate(db: Database, challenges_table: str):
+    """把旧版本数据库迁移到与同步字段一致的结构
+    
+    Args:
+        db: 数据库连接
+        challenges_table: 当前版本的挑战表建表语句
+    """
+    conn = db._get_connection()
+    # 旧版本description为NOT NULL，同步不带描述；SQLite不能修改约束，只能重建表
+    columns = {row['name']: row for row in conn.execute("PRAGMA table_info(challenges)")}
+    if columns.get('description') is not None and columns['description']['notnull']:
+        conn.execute(challenges_table.replace('IF NOT EXISTS challenges ', 'challenges_new '))
+        conn.execute("""
+            INSERT INTO challenges_new
+            SELECT id, title, description, category, difficulty, points, created_at, updated_at
+            FROM challenges
+        """)
+        conn.execute("DROP TABLE challenges")
+        conn.execute("ALTER TABLE challenges_new RENAME TO challenges")
+        
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(user_challenges)")}
+    if 'hints_used' not in columns:
+        conn.execute("ALTER TABLE user_challenges ADD COLUMN hints_used INTEGER NOT NULL DEFAULT 0")
+    # 旧版本同步会重复插入，建唯一索引前每个(user_id, challenge_id)只保留最新一条
+    conn.execute("""
+        DELETE FROM user_challenges
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM user_challenges GROUP BY user_id, challenge_id
+        )
+    """)
+    
 def reset_db(db_path: str) -> bool:
     """重置数据库
     
@@ -140,12 +205,15 @@ def reset_db(db_path: str) -> bool:
     
     # 删除所有表
     tables = [
+        'sync_watermarks',
         'user_progress_sync_log',
         'challenges_sync_log',
+        'users_sync_log',
         'user_recommendations',
         'challenge_feedback',
         'user_challenges',
-        'challenges'
+        'challenges',
+        'users'
     ]
     
     try:
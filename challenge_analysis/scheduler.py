@@ -106,13 +106,12 @@ class TaskScheduler:
         # 获取需要分析的靶场
         challenges = self.get_challenges_for_analysis()
         
-        # 分析每个靶场
+        # 收集每个靶场的分析数据
         for challenge in challenges:
-            # 收集分析数据
             self.collector.collect_challenge_analytics(challenge['id'])
             
-            # 分析难度
-            self.analyzer.analyze_challenge_difficulty(challenge['id'])
+        # 增量重算有新尝试记录的靶场难度，一次聚合、批量写回
+        self.analyzer.update_challenge_pool(incremental=True)
             
         # 分析用户表现
         users = self.get_active_users()
@@ -124,9 +123,9 @@ class TaskScheduler:
         # 获取活跃用户
         users = self.get_active_users()
         
-        # 为每个用户生成推荐
-        for user in users:
-            self.analyzer.generate_recommendations(user['id'])
+        # 所有用户一次向量化打分并批量写回
+        if users:
+            self.analyzer.generate_all_recommendations([user['id'] for user in users])
             
     def get_challenges_for_analysis(self) -> List[Dict[str, Any]]:
         """获取需要分析的靶场
@@ -4,14 +4,18 @@ Challenge Manager for CTF Platform
 
 import os
 import sys
-import json
-import subprocess
-import psutil
+import shutil
+import asyncio
+import tempfile
 import time
 from pathlib import Path
 import logging
 import traceback
 
+from .catalog import ChallengeCatalog
+from .ports import PortAllocator
+from .scheduler import ChallengeInstance, InstanceScheduler
+
 # 配置日志
 logging.basicConfig(
     level=logging.DEBUG,
@@ -19,69 +23,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-__all__ = ['ChallengeManager']
+__all__ = ['ChallengeManager', 'ChallengeCatalog', 'PortAllocator', 'InstanceScheduler']
+
+# 等待实例端口可连接的最长时间（秒）及检查间隔
+STARTUP_TIMEOUT = 15.0
+STARTUP_POLL_INTERVAL = 0.1
+# 停止实例时等待进程退出的时间（秒），超时后强制结束
+STOP_TIMEOUT = 5.0
+# 配置中未指定时实例的最长运行时间（秒）
+DEFAULT_INSTANCE_TIMEOUT = 3600
 
 class ChallengeManager:
     def __init__(self):
         self.base_path = Path(__file__).parent
-        self.processes = {}
         self.id_mapping = {
             1: "sql-injection",  # SQL注入基础训练
             2: "xss",           # XSS跨站脚本攻击训练
             3: "file-upload",   # 文件上传漏洞训练
             4: "linux-priv"     # Linux提权训练
         }
+        # 靶场目录索引和端口分配器，查询和分配端口都不再扫描磁盘或系统进程
+        self.catalog = ChallengeCatalog(self.base_path)
+        self.ports = PortAllocator()
+        # 每个 用户+靶场 一个独立实例，受全局和每台主机的并发上限约束
+        self.scheduler = InstanceScheduler(self._launch_instance, self._stop_instance)
         logger.info(f"ChallengeManager initialized with base_path: {self.base_path}")
-        logger.debug(f"Available challenges: {list(os.listdir(self.base_path))}")
+        logger.debug(f"Catalog stats: {self.catalog.get_stats()}")
 
     def get_challenge_id(self, lab_id):
         """将数字ID转换为字符串ID"""
-        logger.debug(f"Converting lab_id: {lab_id} (type: {type(lab_id)})")
-        
         # 如果是字符串ID，检查是否是数字字符串
         if isinstance(lab_id, str):
             if lab_id.isdigit():
                 lab_id = int(lab_id)
-                logger.debug(f"Converted string lab_id to int: {lab_id}")
             else:
                 # 如果是字符串ID，检查是否是有效的目录名
-                dir_path = self.base_path / lab_id
-                logger.debug(f"Checking directory: {dir_path}")
-                if dir_path.is_dir():
-                    logger.info(f"Found directory for string lab_id: {lab_id}")
+                if self.catalog.has_dir(lab_id):
                     return lab_id
                 logger.warning(f"Directory not found for string lab_id: {lab_id}")
                 return None
-        
+
         # 如果是数字ID，尝试从映射中获取
         str_id = self.id_mapping.get(lab_id)
         if str_id:
-            logger.info(f"Found mapping for lab_id {lab_id}: {str_id}")
-            # 检查目录是否存在
-            dir_path = self.base_path / str_id
-            logger.debug(f"Checking directory for mapped id: {dir_path}")
-            if dir_path.is_dir():
+            if self.catalog.has_dir(str_id):
                 return str_id
             logger.warning(f"Directory not found for mapped id: {str_id}")
-        
-        # 如果找不到映射，检查是否有对应的目录
-        logger.debug(f"Searching directories for lab_id {lab_id}")
-        for dir_name in os.listdir(self.base_path):
-            dir_path = self.base_path / dir_name
-            if dir_path.is_dir():
-                config_path = dir_path / 'config.json'
-                logger.debug(f"Checking config file: {config_path}")
-                if config_path.exists():
-                    try:
-                        with open(config_path, 'r', encoding='utf-8') as f:
-                            config = json.load(f)
-                            logger.debug(f"Config content: {config}")
-                            if str(lab_id) == str(config.get('id')):
-                                logger.info(f"Found matching config in directory: {dir_name}")
-                                return dir_name
-                    except Exception as e:
-                        logger.error(f"Error reading config file {config_path}: {str(e)}")
-                        continue
+
+        # 如果找不到映射，按配置文件中的id查找
+        dir_name = self.catalog.find_by_config_id(lab_id)
+        if dir_name:
+            return dir_name
         logger.warning(f"No matching challenge found for lab_id {lab_id}")
         return None
 
@@ -90,154 +82,187 @@ class ChallengeManager:
         if not challenge_id:
             raise ValueError(f"Challenge {lab_id} not found")
 
-        config_path = self.base_path / challenge_id / 'config.json'
-        logger.info(f"Loading config from: {config_path}")
-        if not config_path.exists():
+        config = self.catalog.get_config(challenge_id)
+        if config is None:
             raise ValueError(f"Challenge {challenge_id} config not found")
-        
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-            logger.info(f"Loaded config: {config}")
-            return config
+        return config
 
     def is_port_in_use(self, port):
-        for proc in psutil.process_iter(['pid', 'name', 'connections']):
-            try:
-                for conn in proc.connections():
-                    if conn.laddr.port == port:
-                        return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        return False
+        return self.ports.is_port_in_use(port)
+
+    async def start_challenge(self, lab_id, user_id=None):
+        """为用户启动靶场实例
 
-    def start_challenge(self, lab_id):
-        """启动靶场"""
+        有空闲名额时等待实例就绪后返回运行信息；名额已满时排队，
+        返回 status=queued 以及排队位置(position)和预计等待秒数(eta)
+        """
         try:
-            logger.info(f"Starting challenge with ID: {lab_id}")
-            
+            logger.info(f"Starting challenge {lab_id} for user {user_id}")
+
             # 获取靶场ID
             challenge_id = self.get_challenge_id(lab_id)
             if not challenge_id:
                 raise ValueError(f"Challenge {lab_id} not found")
-            
+
             # 加载配置
             config = self.load_challenge_config(lab_id)
-            challenge_port = config['port']
-            logger.info(f"Challenge port: {challenge_port}")
-
-            # 检查端口
-            if self.is_port_in_use(challenge_port):
-                raise RuntimeError(f"Port {challenge_port} is already in use")
-
-            # 准备启动脚本
-            src_path = self.base_path / challenge_id / 'src'
-            run_script = src_path / 'run.py'
-            logger.info(f"Run script path: {run_script}")
-
-            if not run_script.exists():
-                raise ValueError(f"Run script not found: {run_script}")
-
-            # 启动进程
-            logger.info(f"Starting process with python: {sys.executable}")
-            logger.info(f"Working directory: {src_path}")
-            
-            process = subprocess.Popen(
-                [sys.executable, str(run_script), str(challenge_port)],
-                cwd=str(src_path),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
+            timeout = config.get('timeout') or DEFAULT_INSTANCE_TIMEOUT
 
-            # 等待进程启动
-            time.sleep(2)
-            if process.poll() is not None:
-                stdout, stderr = process.communicate()
-                error_msg = f"Process failed to start:\nSTDOUT:\n{stdout}\nSTDERR:\n{stderr}"
-                logger.error(error_msg)
-                raise RuntimeError(error_msg)
-
-            # 保存进程信息
-            self.processes[challenge_id] = {
-                'process': process,
-                'port': challenge_port
-            }
-
-            # 启动输出监控线程
-            def print_output(process):
-                while True:
-                    stdout = process.stdout.readline()
-                    if stdout:
-                        logger.info(f"[{challenge_id}] {stdout.strip()}")
-                    stderr = process.stderr.readline()
-                    if stderr:
-                        logger.error(f"[{challenge_id} ERROR] {stderr.strip()}")
-                    if process.poll() is not None:
-                        break
-
-            import threading
-            output_thread = threading.Thread(target=print_output, args=(process,))
-            output_thread.daemon = True
-            output_thread.start()
-
-            logger.info(f"Challenge {challenge_id} started successfully")
-            return {
-                'status': 'running',
-                'port': challenge_port,
-                'url': f'http://localhost:{challenge_port}'
-            }
+            instance = await self.scheduler.submit(user_id, challenge_id, timeout)
+            if instance.status == 'failed':
+                raise RuntimeError(instance.error)
+            return self._describe(instance)
 
         except Exception as e:
             error_msg = f"Failed to start challenge: {str(e)}\n{traceback.format_exc()}"
             logger.error(error_msg)
             raise RuntimeError(error_msg)
 
-    def stop_challenge(self, lab_id):
+    async def _launch_instance(self, instance: ChallengeInstance):
+        """启动实例进程并等待端口可连接"""
+        config = self.catalog.get_config(instance.challenge_id) or {}
+
+        # 准备启动脚本
+        src_path = self.base_path / instance.challenge_id / 'src'
+        run_script = src_path / 'run.py'
+        if not run_script.exists():
+            raise ValueError(f"Run script not found: {run_script}")
+
+        try:
+            # 每个实例单独分配端口；多用户实例不能共用配置中的固定端口
+            owner = f"{instance.challenge_id}:{instance.user_id}"
+            fixed_port = config.get('port')
+            if instance.user_id is None and fixed_port and self.ports.reserve(fixed_port, owner):
+                instance.port = fixed_port
+            else:
+                instance.port = self.ports.allocate(owner)
+
+            # 实例私有的数据目录，靶场程序可通过环境变量使用，避免不同用户的状态混在一起
+            instance.workdir = tempfile.mkdtemp(prefix=f"{instance.challenge_id}_{instance.user_id}_")
+            env = dict(
+                os.environ,
+                CHALLENGE_PORT=str(instance.port),
+                CHALLENGE_USER_ID=str(instance.user_id),
+                CHALLENGE_INSTANCE_DIR=instance.workdir
+            )
+
+            logger.info(f"Starting {run_script} on port {instance.port} for user {instance.user_id}")
+            instance.process = await asyncio.create_subprocess_exec(
+                sys.executable, str(run_script), str(instance.port),
+                cwd=str(src_path),
+                env=env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+
+            # 异步读取输出，不再为每个进程创建线程
+            label = f"{instance.challenge_id}:{instance.user_id}"
+            instance.tasks.append(asyncio.create_task(
+                self._pipe_output(instance, instance.process.stdout, label, logging.INFO)))
+            instance.tasks.append(asyncio.create_task(
+                self._pipe_output(instance, instance.process.stderr, f"{label} ERROR", logging.ERROR)))
+
+            await self._wait_until_ready(instance)
+        except Exception:
+            await self._stop_instance(instance)
+            raise
+
+        instance.tasks.append(asyncio.create_task(self._watch_instance(instance)))
+
+    async def _pipe_output(self, instance: ChallengeInstance, stream, label: str, level: int):
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            text = line.decode(errors="replace").rstrip()
+            instance.recent_output.append(text)
+            logger.log(level, f"[{label}] {text}")
+
+    async def _wait_until_ready(self, instance: ChallengeInstance):
+        """等待端口可连接；进程提前退出或超时则视为启动失败"""
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if instance.process.returncode is not None:
+                break
+            try:
+                _, writer = await asyncio.open_connection('127.0.0.1', instance.port)
+                writer.close()
+                return
+            except OSError:
+                pass
+            try:
+                await asyncio.wait_for(instance.process.wait(), STARTUP_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        # 等待输出读取完毕，错误信息中附带最近的输出
+        if instance.process.returncode is not None:
+            readers = [task for task in instance.tasks if task is not asyncio.current_task()]
+            if readers:
+                await asyncio.wait(readers, timeout=1)
+        output = "\n".join(instance.recent_output)
+        if instance.process.returncode is not None:
+            raise RuntimeError(
+                f"Process exited with code {instance.process.returncode} during startup:\n{output}")
+        raise RuntimeError(f"Process did not listen on port {instance.port} "
+                           f"within {STARTUP_TIMEOUT}s:\n{output}")
+
+    async def _watch_instance(self, instance: ChallengeInstance):
+        """等待实例进程退出，超过运行时间上限时停止"""
+        try:
+            await asyncio.wait_for(instance.process.wait(), instance.timeout)
+        except asyncio.TimeoutError:
+            logger.info(f"Challenge {instance.challenge_id} for user {instance.user_id} "
+                        f"reached timeout {instance.timeout}s, stopping")
+            await self._stop_instance(instance)
+        self._cleanup_instance(instance)
+        self.scheduler.on_exit(instance)
+
+    async def _stop_instance(self, instance: ChallengeInstance):
+        """结束实例进程并释放端口和数据目录"""
+        process = instance.process
+        if process and process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+        self._cleanup_instance(instance)
+
+    def _cleanup_instance(self, instance: ChallengeInstance):
+        if instance.port is not None:
+            self.ports.release(instance.port)
+            instance.port = None
+        if instance.workdir:
+            shutil.rmtree(instance.workdir, ignore_errors=True)
+            instance.workdir = None
+
+    def _describe(self, instance: ChallengeInstance):
+        result = self.scheduler.describe(instance)
+        if instance.status == 'running':
+            result['url'] = f"http://{instance.host}:{instance.port}"
+        return result
+
+    async def stop_challenge(self, lab_id, user_id=None):
         challenge_id = self.get_challenge_id(lab_id)
         if not challenge_id:
             raise ValueError(f"Challenge {lab_id} not found")
 
-        if challenge_id not in self.processes:
+        if not await self.scheduler.stop(user_id, challenge_id):
             return {'status': 'not_running'}
-
-        process_info = self.processes[challenge_id]
-        process_info['process'].terminate()
-        process_info['process'].wait()
-        
-        # 获取最终输出
-        stdout, stderr = process_info['process'].communicate()
-        if stdout:
-            print(f"Final output from {challenge_id}:\n{stdout}")
-        if stderr:
-            print(f"Final errors from {challenge_id}:\n{stderr}")
-            
-        del self.processes[challenge_id]
         return {'status': 'stopped'}
 
-    def get_challenge_status(self, lab_id):
+    def get_challenge_status(self, lab_id, user_id=None):
         challenge_id = self.get_challenge_id(lab_id)
         if not challenge_id:
             raise ValueError(f"Challenge {lab_id} not found")
 
-        if challenge_id not in self.processes:
+        instance = self.scheduler.get(user_id, challenge_id)
+        if not instance or not instance.active:
             return {'status': 'not_running'}
+        return self._describe(instance)
 
-        process_info = self.processes[challenge_id]
-        if process_info['process'].poll() is None:
-            return {
-                'status': 'running',
-                'port': process_info['port'],
-                'url': f'http://localhost:{process_info["port"]}'
-            }
-        else:
-            # 获取最终输出
-            stdout, stderr = process_info['process'].communicate()
-            if stdout:
-                print(f"Final output from {challenge_id}:\n{stdout}")
-            if stderr:
-                print(f"Final errors from {challenge_id}:\n{stderr}")
-            
-            del self.processes[challenge_id]
-            return {'status': 'stopped'} 
\ No newline at end of file
+    def get_scheduler_stats(self):
+        """实例调度统计"""
+        return dict(self.scheduler.get_stats(), ports=self.ports.get_stats())
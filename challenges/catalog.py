@@ -0,0 +1,114 @@
+"""
+靶场目录索引
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 两次检查靶场目录是否变化的最小间隔（秒）
+CHECK_INTERVAL = 2.0
+
+
+class ChallengeCatalog:
+    """靶场目录索引
+
+    启动时扫描一次各靶场目录和 config.json，建立 目录名/配置id -> 目录名 的索引并缓存配置；
+    之后查询只读内存。每隔check_interval秒最多检查一次根目录和各配置文件的修改时间，
+    有变化时重建索引，新增、删除靶场或修改配置无需重启。
+    """
+
+    def __init__(self, base_path: Path, check_interval: float = CHECK_INTERVAL):
+        self.base_path = Path(base_path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._dirs: set = set()
+        self._by_config_id: Dict[str, str] = {}
+        self._configs: Dict[str, dict] = {}
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self.stats = {'rebuilds': 0, 'checks': 0}
+        self.refresh(force=True)
+
+    def _scan_signature(self) -> Tuple:
+        """根目录及各 config.json 的修改时间，任一变化说明需要重建"""
+        entries = []
+        with os.scandir(self.base_path) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue
+                try:
+                    config_mtime = os.stat(os.path.join(entry.path, 'config.json')).st_mtime_ns
+                except OSError:
+                    config_mtime = None
+                entries.append((entry.name, config_mtime))
+        entries.sort()
+        return (os.stat(self.base_path).st_mtime_ns, tuple(entries))
+
+    def _rebuild(self, signature: Tuple):
+        dirs = set()
+        by_config_id = {}
+        configs = {}
+        for dir_name, config_mtime in signature[1]:
+            dirs.add(dir_name)
+            if config_mtime is None:
+                continue
+            config_path = self.base_path / dir_name / 'config.json'
+            try:
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            except Exception as e:
+                logger.error(f"Error reading config file {config_path}: {str(e)}")
+                continue
+            configs[dir_name] = config
+            if config.get('id') is not None:
+                by_config_id.setdefault(str(config.get('id')), dir_name)
+
+        self._dirs = dirs
+        self._by_config_id = by_config_id
+        self._configs = configs
+        self._signature = signature
+        self.stats['rebuilds'] += 1
+        logger.info(f"Challenge catalog indexed {len(dirs)} directories, {len(configs)} configs")
+
+    def refresh(self, force: bool = False):
+        """目录有变化时重建索引；未到检查间隔时直接返回"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if not force and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            self.stats['checks'] += 1
+            try:
+                signature = self._scan_signature()
+            except OSError as e:
+                logger.error(f"Error scanning challenge directory {self.base_path}: {str(e)}")
+                return
+            if force or signature != self._signature:
+                self._rebuild(signature)
+
+    def has_dir(self, dir_name: str) -> bool:
+        self.refresh()
+        return dir_name in self._dirs
+
+    def find_by_config_id(self, lab_id) -> Optional[str]:
+        """按 config.json 中的id查找靶场目录"""
+        self.refresh()
+        return self._by_config_id.get(str(lab_id))
+
+    def get_config(self, dir_name: str) -> Optional[dict]:
+        """获取靶场配置的副本，没有配置文件时返回None"""
+        self.refresh()
+        config = self._configs.get(dir_name)
+        return dict(config) if config is not None else None
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, directories=len(self._dirs), configs=len(self._configs))
@@ -0,0 +1,100 @@
+"""
+靶场端口分配
+"""
+
+import errno
+import logging
+import socket
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 动态分配给靶场实例的端口范围（含两端）
+PORT_RANGE_START = 20000
+PORT_RANGE_END = 20999
+
+
+def is_port_bindable(port: int) -> bool:
+    """尝试绑定端口判断是否空闲，只需一次系统调用，不遍历系统进程"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        # 处于TIME_WAIT的端口可以重新监听，不算占用
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(("", port))
+        except OSError as e:
+            if e.errno in (errno.EADDRINUSE, errno.EACCES):
+                return False
+            raise
+    return True
+
+
+class PortAllocator:
+    """进程内端口分配器
+
+    空闲端口保存在队列中，分配时取队首、释放时放回队尾，都是O(1)；
+    分配前对该端口做一次绑定检查，被外部进程占用的端口放到队尾稍后再试。
+    配置中写死端口的靶场用 reserve 登记，避免与动态分配的端口冲突。
+    """
+
+    def __init__(self, start: int = PORT_RANGE_START, end: int = PORT_RANGE_END):
+        if start > end:
+            raise ValueError(f"Invalid port range: {start}-{end}")
+        self.start = start
+        self.end = end
+        self._free = deque(range(start, end + 1))
+        self._owners: Dict[int, str] = {}  # port -> owner
+        self._lock = threading.Lock()
+        self.stats = {'allocated': 0, 'released': 0, 'skipped_external': 0}
+
+    def _in_range(self, port: int) -> bool:
+        return self.start <= port <= self.end
+
+    def allocate(self, owner: str) -> int:
+        """分配一个空闲端口，范围内没有可用端口时抛出RuntimeError"""
+        with self._lock:
+            for _ in range(len(self._free)):
+                port = self._free.popleft()
+                if port in self._owners:
+                    # 已通过reserve登记的端口
+                    continue
+                if not is_port_bindable(port):
+                    self._free.append(port)
+                    self.stats['skipped_external'] += 1
+                    continue
+                self._owners[port] = owner
+                self.stats['allocated'] += 1
+                return port
+        raise RuntimeError(f"No free port in range {self.start}-{self.end}")
+
+    def reserve(self, port: int, owner: str) -> bool:
+        """登记指定端口，端口已被分配或被其他进程占用时返回False"""
+        with self._lock:
+            if port in self._owners or not is_port_bindable(port):
+                return False
+            self._owners[port] = owner
+            self.stats['allocated'] += 1
+            return True
+
+    def release(self, port: Optional[int]):
+        """释放端口，范围内的端口放回空闲队列"""
+        if port is None:
+            return
+        with self._lock:
+            if self._owners.pop(port, None) is None:
+                return
+            self.stats['released'] += 1
+            if self._in_range(port):
+                self._free.append(port)
+
+    def is_port_in_use(self, port: int) -> bool:
+        if port in self._owners:
+            return True
+        return not is_port_bindable(port)
+
+    def owner_of(self, port: int) -> Optional[str]:
+        return self._owners.get(port)
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats, in_use=len(self._owners), free=len(self._free))
@@ -0,0 +1,293 @@
+"""
+靶场实例调度
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 全局同时运行的实例数、每个用户最多的实例数（含排队中的）
+MAX_INSTANCES = 20
+MAX_PER_USER = 2
+# 没有历史数据时估算排队时间用的实例平均启动耗时（秒）
+DEFAULT_STARTUP_SECONDS = 5.0
+# 平均运行时长/启动耗时的平滑系数
+EWMA_ALPHA = 0.2
+
+
+class ChallengeInstance:
+    """一个用户的靶场实例"""
+
+    __slots__ = (
+        'user_id', 'challenge_id', 'status', 'host', 'port', 'process', 'timeout',
+        'queued_at', 'started_at', 'error', 'ready', 'tasks', 'recent_output', 'workdir'
+    )
+
+    def __init__(self, user_id, challenge_id: str, timeout: float):
+        self.user_id = user_id
+        self.challenge_id = challenge_id
+        # queued -> starting -> running -> stopped / failed
+        self.status = 'queued'
+        self.host: Optional[str] = None
+        self.port: Optional[int] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.timeout = timeout
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.ready: Optional[asyncio.Future] = None
+        self.tasks: List[asyncio.Task] = []
+        # 最近的输出，启动失败时用于错误信息
+        self.recent_output: Deque[str] = deque(maxlen=50)
+        self.workdir: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple:
+        return (self.user_id, self.challenge_id)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'starting', 'running')
+
+
+class InstanceScheduler:
+    """多用户靶场实例调度器
+
+    每个 用户+靶场 一个独立实例。实例数受全局上限、每台主机的容量和每个用户的上限约束；
+    容量不足时按提交顺序排队，实例退出后自动启动队首的实例，并根据正在运行的实例
+    预计结束时间估算排队位置对应的等待时间。
+
+    launcher(instance) 负责实际启动进程（分配端口、等待就绪），返回后实例即为运行中；
+    stopper(instance) 负责停止进程；进程退出后调用 on_exit 释放名额。
+    """
+
+    def __init__(
+        self,
+        launcher: Callable[[ChallengeInstance], Awaitable[None]],
+        stopper: Callable[[ChallengeInstance], Awaitable[None]],
+        max_instances: int = MAX_INSTANCES,
+        max_per_user: int = MAX_PER_USER,
+        hosts: Optional[Dict[str, int]] = None
+    ):
+        self.launcher = launcher
+        self.stopper = stopper
+        self.max_instances = max_instances
+        self.max_per_user = max_per_user
+        # 主机 -> 容量
+        self.hosts = dict(hosts or {'localhost': max_instances})
+        self._host_load: Dict[str, int] = {host: 0 for host in self.hosts}
+        self.instances: Dict[Tuple, ChallengeInstance] = {}
+        self._queue: Deque[ChallengeInstance] = deque()
+        self._user_counts: Dict = {}
+        self._avg_lifetime: Optional[float] = None
+        self._avg_startup = DEFAULT_STARTUP_SECONDS
+        self.stats = {
+            'submitted': 0,
+            'started': 0,
+            'failed': 0,
+            'queued': 0,
+            'rejected': 0
+        }
+
+    @property
+    def running_count(self) -> int:
+        return sum(self._host_load.values())
+
+    def get(self, user_id, challenge_id: str) -> Optional[ChallengeInstance]:
+        return self.instances.get((user_id, challenge_id))
+
+    def _pick_host(self) -> Optional[str]:
+        """选择剩余容量最多的主机，全局或所有主机已满时返回None"""
+        if self.running_count >= self.max_instances:
+            return None
+        best = None
+        best_free = 0
+        for host, capacity in self.hosts.items():
+            free = capacity - self._host_load[host]
+            if free > best_free:
+                best, best_free = host, free
+        return best
+
+    async def submit(self, user_id, challenge_id: str, timeout: float) -> ChallengeInstance:
+        """提交启动请求
+
+        有空闲名额时启动并等待实例就绪；否则排队并立即返回。
+        同一用户同一靶场重复提交返回已有实例
+        """
+        instance = self.get(user_id, challenge_id)
+        if instance and instance.active:
+            if instance.status == 'starting' and instance.ready:
+                await asyncio.shield(instance.ready)
+            return instance
+
+        if self._user_counts.get(user_id, 0) >= self.max_per_user:
+            self.stats['rejected'] += 1
+            raise RuntimeError(f"User {user_id} already has {self.max_per_user} active instances")
+
+        instance = ChallengeInstance(user_id, challenge_id, timeout)
+        instance.ready = asyncio.get_running_loop().create_future()
+        self.instances[instance.key] = instance
+        self._user_counts[user_id] = self._user_counts.get(user_id, 0) + 1
+        self.stats['submitted'] += 1
+
+        if self._queue:
+            # 已有排队的实例时不插队
+            self._enqueue(instance)
+            self._dispatch()
+            return instance
+
+        host = self._pick_host()
+        if host is None:
+            self._enqueue(instance)
+            return instance
+
+        self._start(instance, host)
+        await asyncio.shield(instance.ready)
+        return instance
+
+    def _enqueue(self, instance: ChallengeInstance):
+        self._queue.append(instance)
+        self.stats['queued'] += 1
+        logger.info(f"Queued challenge {instance.challenge_id} for user {instance.user_id}, "
+                    f"position {len(self._queue)}")
+
+    def _start(self, instance: ChallengeInstance, host: str):
+        instance.status = 'starting'
+        instance.host = host
+        self._host_load[host] += 1
+        task = asyncio.create_task(self._run_start(instance))
+        instance.tasks.append(task)
+
+    async def _run_start(self, instance: ChallengeInstance):
+        begin = time.monotonic()
+        try:
+            await self.launcher(instance)
+        except Exception as e:
+            instance.status = 'failed'
+            instance.error = str(e)
+            self.stats['failed'] += 1
+            logger.error(f"Failed to start challenge {instance.challenge_id} "
+                         f"for user {instance.user_id}: {str(e)}")
+            self._release(instance)
+        else:
+            instance.status = 'running'
+            instance.started_at = time.time()
+            self.stats['started'] += 1
+            self._avg_startup = self._ewma(self._avg_startup, time.monotonic() - begin)
+        finally:
+            if instance.ready and not instance.ready.done():
+                instance.ready.set_result(instance.status)
+
+    def _dispatch(self):
+        """按顺序启动排队的实例，直到没有空闲名额"""
+        while self._queue:
+            host = self._pick_host()
+            if host is None:
+                return
+            self._start(self._queue.popleft(), host)
+
+    def _release(self, instance: ChallengeInstance):
+        """实例结束：释放主机名额和用户名额，启动排队的实例"""
+        if instance.host is not None:
+            self._host_load[instance.host] -= 1
+            instance.host = None
+        count = self._user_counts.get(instance.user_id, 0) - 1
+        if count > 0:
+            self._user_counts[instance.user_id] = count
+        else:
+            self._user_counts.pop(instance.user_id, None)
+        if self.instances.get(instance.key) is instance:
+            del self.instances[instance.key]
+        self._dispatch()
+
+    def on_exit(self, instance: ChallengeInstance):
+        """运行中的实例进程退出后调用，重复调用无影响"""
+        if instance.status != 'running':
+            return
+        if instance.started_at:
+            self._avg_lifetime = self._ewma(self._avg_lifetime, time.time() - instance.started_at)
+        instance.status = 'stopped'
+        self._release(instance)
+
+    async def stop(self, user_id, challenge_id: str) -> bool:
+        """停止实例或取消排队，实例不存在时返回False"""
+        instance = self.get(user_id, challenge_id)
+        if not instance or not instance.active:
+            return False
+
+        if instance.status == 'queued':
+            self._queue.remove(instance)
+            instance.status = 'stopped'
+            if instance.ready and not instance.ready.done():
+                instance.ready.set_result(instance.status)
+            self._release(instance)
+            return True
+
+        if instance.status == 'starting' and instance.ready:
+            await asyncio.shield(instance.ready)
+        if instance.status == 'running':
+            await self.stopper(instance)
+            self.on_exit(instance)
+        return True
+
+    def queue_position(self, instance: ChallengeInstance) -> Optional[int]:
+        if instance.status != 'queued':
+            return None
+        for position, queued in enumerate(self._queue, 1):
+            if queued is instance:
+                return position
+        return None
+
+    def estimate_wait(self, position: int) -> float:
+        """估算排在position位的实例还需等待的秒数
+
+        第k个空出的名额来自预计第k早结束的运行中实例；排队数超过运行数时按轮次累加
+        """
+        now = time.time()
+        ends = []
+        for instance in self.instances.values():
+            if instance.status != 'running' or not instance.started_at:
+                continue
+            lifetime = instance.timeout
+            if self._avg_lifetime is not None:
+                lifetime = min(lifetime, self._avg_lifetime)
+            ends.append(max(now, instance.started_at + lifetime))
+        if not ends:
+            return self._avg_startup
+        ends.sort()
+        rounds, index = divmod(position - 1, len(ends))
+        round_length = self._avg_lifetime or max(ends[-1] - now, self._avg_startup)
+        return ends[index] - now + rounds * round_length + self._avg_startup
+
+    def describe(self, instance: ChallengeInstance) -> Dict:
+        result = {
+            'status': instance.status,
+            'host': instance.host,
+            'port': instance.port
+        }
+        position = self.queue_position(instance)
+        if position is not None:
+            result['position'] = position
+            result['eta'] = round(self.estimate_wait(position))
+        if instance.error:
+            result['error'] = instance.error
+        return result
+
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        return current + EWMA_ALPHA * (sample - current)
+
+    def get_stats(self) -> Dict:
+        return dict(
+            self.stats,
+            running=self.running_count,
+            waiting=len(self._queue),
+            host_load=dict(self._host_load),
+            avg_startup=round(self._avg_startup, 2),
+            avg_lifetime=round(self._avg_lifetime, 2) if self._avg_lifetime else None
+        )
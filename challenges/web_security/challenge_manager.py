@@ -5,6 +5,12 @@ import logging
 import json
 import time
 
+try:
+    from .container_config import CONTAINER_CONFIG
+except ImportError:
+    # 作为脚本直接运行时
+    from container_config import CONTAINER_CONFIG
+
 app = Flask(__name__)
 CORS(app)  # 启用CORS支持
 
@@ -12,20 +18,6 @@ CORS(app)  # 启用CORS支持
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 容器配置
-CONTAINER_CONFIG = {
-    'sql_injection_basic': {
-        'image': 'sql_injection_basic:latest',
-        'internal_port': 8081,
-        'prefix': 'sql_basic'
-    },
-    'sql_injection_advanced': {
-        'image': 'sql_injection_advanced:latest',
-        'internal_port': 8082,
-        'prefix': 'sql_adv'
-    }
-}
-
 def generate_container_name(challenge_type, user_id=None):
     """生成统一的容器名称"""
     prefix = CONTAINER_CONFIG[challenge_type]['prefix']
@@ -0,0 +1,17 @@
+"""Web安全题目的容器配置
+
+只包含数据，不依赖Flask等运行时组件，供题目管理服务和后端（如镜像预拉取）共同引用
+"""
+
+CONTAINER_CONFIG = {
+    'sql_injection_basic': {
+        'image': 'sql_injection_basic:latest',
+        'internal_port': 8081,
+        'prefix': 'sql_basic'
+    },
+    'sql_injection_advanced': {
+        'image': 'sql_injection_advanced:latest',
+        'internal_port': 8082,
+        'prefix': 'sql_adv'
+    }
+}